@@ -0,0 +1,326 @@
+"""
+Streaming anomaly detection on vehicle counts
+Flags readings that deviate sharply from their location/hour/weather
+profile, such as an accident on Hosur Road, in O(1) time per observation
+
+Each (location, hour, weather) key keeps an exponentially weighted mean
+and variance. The first MAX_LOCATIONS locations get exact per-key state in
+flat arrays; further locations (raw sensor or segment IDs) share a
+fixed-size hashed sketch, so memory stays bounded however many keys the
+feed produces.
+
+Usage:
+    python anomaly_detector.py [--data bangalore_traffic.csv] [--replay-days 7] [--benchmark]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import hashlib
+import logging
+import math
+import time
+import zlib
+from array import array
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from traffic_frame import DATE_FORMAT, load_traffic_frame
+from traffic_scoring import WEATHER_OPTIONS
+from vehicle_forecast import record_hour_indexes
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.05
+Z_THRESHOLD = 4.0
+# Observations a key needs before it can raise alerts
+WARMUP = 20
+# Floor for the standard deviation, so near-constant keys don't alert on +-1 vehicle
+MIN_STD = 2.0
+MAX_LOCATIONS = 2000
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+# Changes whenever keys map to different sketch cells, so cached detectors are rebuilt
+SKETCH_HASH = "crc32-multiply-shift"
+_MASK64 = (1 << 64) - 1
+MAX_EVENTS = 1000
+
+# timestamp is whatever was passed to update(); update_frame passes hours since the epoch
+AnomalyEvent = namedtuple("AnomalyEvent", ["timestamp", "location", "hour", "weather", "count", "expected", "std", "z"])
+
+
+def _update_cell(mean, var, seen, i, x, alpha, threshold, warmup):
+    """Fold x into cell i; returns (z, expected, std) from before the update
+
+    Until the cell has 1/alpha observations it keeps a plain running mean.
+    Once warmed up, deviations are clipped to threshold standard deviations
+    before updating, so an incident nudges the profile instead of
+    replacing it.
+    """
+    k = seen[i]
+    if k == 0:
+        mean[i] = x
+        seen[i] = 1
+        return 0.0, x, 0.0
+    m = mean[i]
+    v = var[i]
+    std = math.sqrt(v) if v > 0 else 0.0
+    diff = x - m
+    z = 0.0
+    if k >= warmup:
+        scale = std if std > MIN_STD else MIN_STD
+        z = diff / scale
+        limit = threshold * scale
+        if diff > limit:
+            diff = limit
+        elif diff < -limit:
+            diff = -limit
+    a = 1.0 / (k + 1) if k * alpha < 1 else alpha
+    increment = a * diff
+    mean[i] = m + increment
+    var[i] = (1 - a) * (v + diff * increment)
+    seen[i] = k + 1
+    return z, m, std
+
+
+class HashedEwmaSketch:
+    """EWMA mean/variance for an unbounded key space in depth x width cells
+
+    Every key updates one cell per row. Colliding keys blend their
+    statistics, so, as in a count-min sketch, the row that finds the
+    observation least surprising is trusted: a key only alerts when it is
+    anomalous in every row.
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.mean = array("d", bytes(8 * width * depth))
+        self.var = array("d", bytes(8 * width * depth))
+        self.seen = array("q", bytes(8 * width * depth))
+        # (first cell, odd 64-bit multiplier) of each row
+        self._rows = [
+            (row * width, int.from_bytes(hashlib.blake2b(b"row%d" % row, digest_size=8).digest(), "little") | 1)
+            for row in range(depth)
+        ]
+
+    def _cells(self, location, slot):
+        """One cell per row for a location's hour/weather slot, the same in every process
+
+        The detector is shared through the cross-process cache, so Python's
+        per-process randomized hash() cannot be used. The location is hashed
+        once with crc32 and each row spreads that with its own multiply-shift
+        hash, which keeps rows independent (differently seeded CRCs differ by
+        a constant XOR, so keys colliding in one row would collide in all).
+        The slot is an offset within the row, so a location's own slots never
+        share a cell.
+        """
+        h = zlib.crc32(repr(location).encode("utf-8"))
+        width = self.width
+        return [
+            start + (((h * multiplier & _MASK64) * width >> 64) + slot) % width
+            for start, multiplier in self._rows
+        ]
+
+    def update(self, location, slot, x, alpha, threshold, warmup):
+        best = None
+        for i in self._cells(location, slot):
+            result = _update_cell(self.mean, self.var, self.seen, i, x, alpha, threshold, warmup)
+            if best is None or abs(result[0]) < abs(best[0]):
+                best = result
+        return best
+
+    def nbytes(self):
+        return self.mean.itemsize * len(self.mean) * 3
+
+
+class AnomalyDetector:
+    """Per-key streaming anomaly detector with bounded memory
+
+    Readings whose z-score against their key's EWMA profile exceeds
+    threshold become AnomalyEvents. They are returned from update(), passed
+    to on_event and kept in a bounded deque of recent events.
+    """
+
+    def __init__(self, weathers=WEATHER_OPTIONS, alpha=EWMA_ALPHA, threshold=Z_THRESHOLD, warmup=WARMUP,
+                 max_locations=MAX_LOCATIONS, sketch_width=SKETCH_WIDTH, sketch_depth=SKETCH_DEPTH,
+                 max_events=MAX_EVENTS, on_event=None):
+        self.weathers = list(weathers)
+        self.weather_index = {weather: i for i, weather in enumerate(self.weathers)}
+        # The last weather slot collects readings with an unknown weather
+        self._weather_slots = len(self.weathers) + 1
+        self._location_slots = 24 * self._weather_slots
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.max_locations = max_locations
+        self.location_index = {}
+        self.mean = array("d")
+        self.var = array("d")
+        self.seen = array("q")
+        self.sketch = HashedEwmaSketch(sketch_width, sketch_depth)
+        self.events = deque(maxlen=max_events)
+        self.on_event = on_event
+        self.observations = 0
+        self.anomalies = 0
+        self.sketched = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["on_event"] = None
+        return state
+
+    def _index(self, location, hour, weather):
+        """Cell of a key in the exact arrays, or None once MAX_LOCATIONS are tracked"""
+        l = self.location_index.get(location)
+        if l is None:
+            if len(self.location_index) >= self.max_locations:
+                return None
+            l = len(self.location_index)
+            self.location_index[location] = l
+            self.mean.extend([0.0] * self._location_slots)
+            self.var.extend([0.0] * self._location_slots)
+            self.seen.extend([0] * self._location_slots)
+        w = self.weather_index.get(weather, self._weather_slots - 1)
+        return l * self._location_slots + hour * self._weather_slots + w
+
+    def update(self, location, hour, weather, count, timestamp=None):
+        """Add one reading; returns an AnomalyEvent when it is anomalous, else None"""
+        self.observations += 1
+        i = self._index(location, hour, weather)
+        if i is None:
+            self.sketched += 1
+            slot = hour * self._weather_slots + self.weather_index.get(weather, self._weather_slots - 1)
+            z, expected, std = self.sketch.update(
+                location, slot, count, self.alpha, self.threshold, self.warmup
+            )
+        else:
+            z, expected, std = _update_cell(
+                self.mean, self.var, self.seen, i, count, self.alpha, self.threshold, self.warmup
+            )
+        if z > self.threshold or z < -self.threshold:
+            event = AnomalyEvent(timestamp, location, hour, weather, count, expected, std, z)
+            self.anomalies += 1
+            self.events.append(event)
+            if self.on_event is not None:
+                self.on_event(event)
+            return event
+        return None
+
+    def update_frame(self, records):
+        """Add traffic records (DATE, TIME or HOUR, LOCATION, WEATHER, VEHICLE_COUNT) in time order
+
+        Returns the AnomalyEvents raised, timestamped in hours since the epoch.
+        """
+        hours = record_hour_indexes(records)
+        order = np.argsort(hours, kind="stable")
+        columns = zip(
+            hours[order].tolist(),
+            records["LOCATION"].to_numpy()[order].tolist(),
+            records["WEATHER"].to_numpy()[order].tolist(),
+            records["VEHICLE_COUNT"].to_numpy()[order].tolist(),
+        )
+        update = self.update
+        events = []
+        for hour_index, location, weather, count in columns:
+            event = update(location, hour_index % 24, weather, count, hour_index)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def seed(self, records):
+        """Initialise profiles from historical records in one vectorized pass
+
+        Keys with history start warmed up, so they can alert from the first
+        streamed reading.
+        """
+        hours = record_hour_indexes(records) % 24
+        profile = pd.DataFrame({
+            "LOCATION": records["LOCATION"].astype(str).to_numpy(),
+            "HOUR": hours,
+            "WEATHER": records["WEATHER"].astype(str).to_numpy(),
+            "VEHICLE_COUNT": records["VEHICLE_COUNT"].to_numpy(dtype=float),
+        }).groupby(["LOCATION", "HOUR", "WEATHER"], observed=True)["VEHICLE_COUNT"].agg(["mean", "var", "size"])
+        for (location, hour, weather), row in zip(profile.index, profile.itertuples(index=False)):
+            i = self._index(location, hour, weather)
+            if i is None:
+                continue
+            self.mean[i] = row.mean
+            self.var[i] = 0.0 if np.isnan(row.var) else row.var
+            self.seen[i] = int(row.size)
+        logger.info(f"Seeded {len(profile)} anomaly profiles from {len(records)} records")
+
+    def expected(self, location, hour, weather):
+        """(mean, std, observations) of a tracked key, or None"""
+        if location not in self.location_index:
+            return None
+        i = self._index(location, hour, weather)
+        return self.mean[i], math.sqrt(self.var[i]), self.seen[i]
+
+    def recent_events(self, location=None, limit=10):
+        """Most recent events, newest first, optionally for one location"""
+        events = [event for event in reversed(self.events) if location is None or event.location == location]
+        return events[:limit]
+
+    def stats(self):
+        exact_bytes = sum(a.itemsize * len(a) for a in (self.mean, self.var, self.seen))
+        return {
+            "observations": self.observations,
+            "anomalies": self.anomalies,
+            "locations": len(self.location_index),
+            "sketched": self.sketched,
+            "memory_kb": (exact_bytes + self.sketch.nbytes()) / 1024,
+        }
+
+
+def build_detector(traffic_data, replay_days=7, **params):
+    """Seed a detector on history before the last replay_days and stream the rest through it"""
+    detector = AnomalyDetector(**params)
+    hours = record_hour_indexes(traffic_data)
+    recent = hours >= hours.max() - replay_days * 24
+    detector.seed(traffic_data[~recent])
+    events = detector.update_frame(traffic_data[recent])
+    logger.info(f"Replayed {recent.sum()} recent records, {len(events)} anomalies")
+    return detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recent traffic through the streaming anomaly detector")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV")
+    parser.add_argument("--replay-days", type=int, default=7, help="Days at the end of the data to stream")
+    parser.add_argument("--threshold", type=float, default=Z_THRESHOLD, help="z-score that raises an alert")
+    parser.add_argument("--benchmark", action="store_true", help="Also measure throughput on synthetic keys")
+    parser.add_argument("--date-format", default=DATE_FORMAT, help='DATE format of the CSV, e.g. "%%d/%%m/%%Y"')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    traffic_data = load_traffic_frame(args.data, args.date_format)
+    start = time.perf_counter()
+    detector = build_detector(traffic_data, args.replay_days, threshold=args.threshold)
+    print(f"Built in {time.perf_counter() - start:.2f}s: {detector.stats()}")
+    for event in detector.recent_events(limit=20):
+        print(f"{pd.Timestamp(event.timestamp, unit='h'):%d %b %H:00} {event.location} ({event.weather}): "
+              f"{event.count} vehicles, expected {event.expected:.0f} ± {event.std:.0f} (z={event.z:+.1f})")
+
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        n = 1_000_000
+        for label, n_locations in [("exact", 500), ("sketched", 100_000)]:
+            bench = AnomalyDetector(max_locations=500)
+            locations = [f"segment-{i}" for i in rng.integers(0, n_locations, n)]
+            hours = rng.integers(0, 24, n).tolist()
+            weathers = rng.choice(WEATHER_OPTIONS, n).tolist()
+            counts = rng.poisson(80, n).tolist()
+            update = bench.update
+            start = time.perf_counter()
+            for location, hour, weather, count in zip(locations, hours, weathers, counts):
+                update(location, hour, weather, count)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {n / elapsed:,.0f} observations/s, {bench.stats()['memory_kb']:,.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
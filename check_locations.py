@@ -1,17 +1,86 @@
+"""
+Location name check
+Compares location names in the model, the traffic CSV and the coordinate
+registry, and reports names missing from a source with their closest match
+
+Usage:
+    python check_locations.py [--model traffic_classifier.pkl] [--data bangalore_traffic.csv]
+                              [--all] [--output location_mismatches.csv]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+
 import joblib
 import pandas as pd
 
-# Load model
-model = joblib.load('traffic_classifier.pkl')
+from location_registry import LOCATION_COORDINATES
+from location_search import RECONCILE_MIN_SCORE, mismatch_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report location name mismatches between model, data and registry")
+    parser.add_argument("--model", default="traffic_classifier.pkl", help="Trained classifier")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV")
+    parser.add_argument("--min-score", type=float, default=RECONCILE_MIN_SCORE,
+                        help="Minimum similarity for a suggested match")
+    parser.add_argument("--all", action="store_true", help="Also list registry locations missing elsewhere")
+    parser.add_argument("--output", default=None, help="Also write the full report to this CSV file")
+    args = parser.parse_args()
+
+    sources = {"registry": sorted(LOCATION_COORDINATES)}
+
+    # Load model
+    model = joblib.load(args.model)
+    sources["model"] = sorted(
+        col.split('LOCATION_')[-1] for col in model.feature_names_in_ if col.startswith('LOCATION_')
+    )
+
+    try:
+        locations = pd.read_csv(args.data, usecols=["LOCATION"], dtype="category")["LOCATION"]
+        sources["data"] = sorted(str(name) for name in locations.cat.categories)
+    except FileNotFoundError:
+        print(f"{args.data} not found, comparing model and registry only")
+
+    for label, names in sources.items():
+        print(f"Total locations in {label}: {len(names)}")
+
+    report = pd.DataFrame(
+        mismatch_report(sources, args.min_score),
+        columns=["location", "found_in", "missing_from", "closest_match", "score"],
+    )
+    if report.empty:
+        print("\nAll location names match across sources")
+        return
+
+    # Names the app cannot route are the ones that matter most
+    unroutable = report[(report["missing_from"] == "registry") & (report["found_in"] == "model")]
+    print(f"\nModel locations without coordinates: {len(unroutable)} "
+          f"({unroutable['closest_match'].notna().sum()} resolvable by fuzzy match)")
+
+    renamed = report[report["closest_match"].notna()]
+    if not renamed.empty:
+        print("\nLikely the same location under different names:")
+        print(renamed.to_string(index=False))
+
+    # The registry may list more locations than were trained on; skip those unless asked
+    missing = report[report["closest_match"].isna()]
+    if not args.all:
+        missing = missing[missing["found_in"] != "registry"]
+    if not missing.empty:
+        print("\nNo counterpart found:")
+        print(missing[["location", "found_in", "missing_from"]].to_string(index=False))
+    registry_only = report[(report["found_in"] == "registry") & report["closest_match"].isna()]
+    if not args.all and not registry_only.empty:
+        print(f"\n{registry_only['location'].nunique()} registry locations are not in the model or data "
+              f"(use --all to list them)")
 
-# Get locations from model
-locations = sorted([col.split('LOCATION_')[-1] for col in model.feature_names_in_ if col.startswith('LOCATION_')])
+    if args.output:
+        report.to_csv(args.output, index=False)
+        print(f"\nReport written to {args.output}")
 
-print('Total locations in model:', len(locations))
-print('\nFirst 20 locations:')
-for i, loc in enumerate(locations[:20]):
-    print(f'{i+1:2d}. {loc}')
 
-print('\nSample of all locations:')
-for i in range(0, len(locations), len(locations)//10):
-    print(f'{i+1:3d}. {locations[i]}')
+if __name__ == "__main__":
+    main()
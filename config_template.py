@@ -11,6 +11,7 @@ IMPORTANT: This is a template file.
 # OpenRouteService API Configuration
 # Get your free API key from: https://openrouteservice.org/
 ORS_API_KEY = "YOUR_API_KEY_HERE"
+ORS_BASE_URL = "https://api.openrouteservice.org"  # Or a local stand-in, e.g. "http://127.0.0.1:8080"
 
 # Application Settings
 APP_TITLE = "Smart Traffic Management System"
@@ -19,19 +20,63 @@ APP_DESCRIPTION = "Intelligent Traffic Prediction & Route Optimization for Banga
 
 # Data File Paths
 TRAFFIC_DATA_FILE = "bangalore_traffic.csv"
+DATE_FORMAT = "%Y-%m-%d"  # DATE column format, e.g. "%d/%m/%Y" for day-first exports or "mixed" to guess per value
 MODEL_FILE = "traffic_classifier.pkl"
+CONGESTION_LAYERS_FILE = "congestion_layers.npz"  # Written by congestion_layers.py
+TRAVEL_TIMES_FILE = "travel_times.npz"  # Written by isochrones.py
+SLOWDOWN_TABLE_FILE = "slowdown_table.npz"  # Written by route_calibration.py
+HISTORY_DIR = "traffic_history"  # Partitioned history written by history_store.py
+PROFILE_DIR = "profiles"  # Where ?profile=<label> and TRAFFIC_PROFILE=1 write rerun profiles
+PROFILE_TOP_N = 15  # Hot functions listed in the debug panel when profiling
+PROFILE_MAX_FILES = 50  # Newest profiles kept in PROFILE_DIR
+
+# Cache shared by all worker processes:
+# "memory://" (per process), "sqlite:///traffic_cache.db" (one host) or "redis://host:6379/0"
+CACHE_BACKEND_URL = "sqlite:///traffic_cache.db"
+
+# Directory for the shared-memory statistics manifest (None = system temp dir)
+SHARED_STATS_DIR = None
+
+# Vehicle Count Forecasting
+FORECAST_HISTORY_DAYS = 7  # Days of same-hour history kept per location
+FORECAST_HORIZON = 6  # Hours shown in the forecast table
+
+# Location Search
+LOCATION_SEARCH_RESULTS = 20  # Matches offered when searching a location by name
 
 # Map Configuration
 DEFAULT_ZOOM = 13
 MAP_TILES = 'OpenStreetMap'
 
 # Traffic Prediction Settings
+MODEL_CHECK_INTERVAL = 10  # Seconds between checks for a replaced model file (0 = never reload)
+INFERENCE_BACKEND = "sklearn"  # "numpy" evaluates the forest from flattened arrays (see tree_inference.py)
 DEFAULT_VEHICLE_COUNT = 75
 CONFIDENCE_THRESHOLD = 0.7
 
 # Route Planning Settings
 MAX_ALTERNATIVE_ROUTES = 3
 ROUTE_SHARE_FACTOR = 0.5
+ROUTE_CACHE_TTL = 3600  # Seconds to reuse a fetched route
+CONGESTION_DELAY_FACTOR = 0.5  # Extra travel time share at certain high traffic
+ROUTE_FETCH_TIMEOUT = 5  # Seconds to wait for an uncached route before moving on
+ROUTE_FETCH_WORKERS = 8  # Background threads fetching routes while the page renders
+ROUTE_LOG_FILE = "route_summaries.csv"  # Route summaries the ETA estimator is fitted on
+ROUTE_LOG_MAX_BYTES = 4 * 1024 * 1024  # Route log size at which it is rotated (3 backups are kept)
+ETA_REFIT_INTERVAL = 3600  # Seconds between background ETA estimator refits
+ETA_FIT_WINDOW = 50000  # Most recent logged routes the ETA estimator is fitted on
+ANOMALY_REPLAY_DAYS = 7  # Recent days streamed through the anomaly detector at startup
+ANOMALY_Z_THRESHOLD = 4.0  # Deviation (in standard deviations) that counts as unusual traffic
+ORS_FAILURE_THRESHOLD = 5  # Consecutive ORS failures before pausing calls
+ORS_RECOVERY_TIMEOUT = 30  # Seconds before probing ORS again
+
+# Startup Warm-up (python warmup.py)
+# Routes fetched into the cache before a new worker is reported ready
+WARMUP_ROUTE_PAIRS = [
+    ("Silk Board", "Electronic City"),
+    ("Majestic", "Whitefield"),
+    ("Hebbal", "Brigade Road"),
+]
 
 # UI Configuration
 SIDEBAR_EXPANDED = True
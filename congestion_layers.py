@@ -0,0 +1,142 @@
+"""
+City-wide congestion layers
+Offline job that scores every model location for all hours and weathers
+
+The archive is stamped with the versions of the data file and model it was
+scored from; the app ignores layers whose stamp does not match what it is
+serving, so run this with the same paths as config.py.
+
+Usage:
+    python congestion_layers.py [--data bangalore_traffic.csv] [--model traffic_classifier.pkl]
+                                [--output congestion_layers.npz]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import logging
+import time
+
+import joblib
+import numpy as np
+
+from location_registry import LOCATION_COORDINATES
+from location_search import reconcile_coordinates
+from model_manager import artifact_version
+from shared_cache import file_version
+from traffic_frame import load_traffic_frame
+from traffic_scoring import (
+    WEATHER_OPTIONS,
+    aggregate_vehicle_stats,
+    get_vehicle_counts,
+    model_locations,
+    predict_traffic_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+LAYERS_FILE = "congestion_layers.npz"
+
+
+def score_city_grid(model, vehicle_stats, coords_map=LOCATION_COORDINATES, weathers=WEATHER_OPTIONS):
+    """Score every model location for every hour and weather in one batched prediction
+
+    Only locations the model has a feature for are scored, at their
+    coordinates in coords_map; pass reconciled coordinates (see
+    location_search.reconcile_coordinates) for model locations named
+    differently in the registry. Returns a dict of compact arrays indexed
+    [weather, hour, location], plus prebuilt heatmap layers of
+    (lat, lon, weight) points per weather and hour.
+    """
+    locations = [location for location in model_locations(model) if location in coords_map]
+    for location in sorted(set(model_locations(model)) - set(coords_map)):
+        logger.warning(f"No coordinates for model location '{location}', left out of the congestion layers")
+    coords = np.array([coords_map[location] for location in locations], dtype=np.float32)
+    n_weathers, n_locations = len(weathers), len(locations)
+
+    # Row order is weather, then hour, then location
+    grid_weathers = np.repeat(weathers, 24 * n_locations)
+    grid_hours = np.tile(np.repeat(np.arange(24), n_locations), n_weathers)
+    grid_locations = np.tile(locations, 24 * n_weathers)
+    counts = np.empty((n_weathers, 24, n_locations), dtype=np.uint16)
+    for w, weather in enumerate(weathers):
+        for l, location in enumerate(locations):
+            counts[w, :, l] = get_vehicle_counts(location, range(24), weather, vehicle_stats)
+
+    predictions, _, high_probabilities = predict_traffic_batch(
+        model, grid_locations, grid_hours, grid_weathers, counts.ravel()
+    )
+    shape = (n_weathers, 24, n_locations)
+    high_probabilities = high_probabilities.reshape(shape).astype(np.float16)
+
+    heat_points = np.empty(shape + (3,), dtype=np.float32)
+    heat_points[..., 0] = coords[:, 0]
+    heat_points[..., 1] = coords[:, 1]
+    heat_points[..., 2] = high_probabilities
+
+    return {
+        "locations": np.array(locations),
+        "weathers": np.array(weathers),
+        "coords": coords,
+        "vehicle_counts": counts,
+        "predictions": (predictions.reshape(shape) != 0).astype(np.uint8),
+        "high_probability": high_probabilities,
+        "heat_points": heat_points,
+    }
+
+
+def layers_version(data_file, model_version):
+    """Stamp tying layers to the data file and model version they were scored from"""
+    return f"{file_version(data_file)}|{model_version}"
+
+
+def save_layers(layers, path=LAYERS_FILE, version=None):
+    """Write scored layers as a compressed NumPy archive, stamped with version"""
+    if version is not None:
+        layers = {**layers, "version": np.array(version)}
+    np.savez_compressed(path, **layers)
+
+
+def layers_match(layers, version):
+    """Whether layers were scored for this version (unstamped layers never match)"""
+    return "version" in layers and str(layers["version"]) == version
+
+
+def load_layers(path=LAYERS_FILE):
+    """Load scored layers written by save_layers"""
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def heatmap_layer(layers, hour, weather):
+    """Return the prebuilt [lat, lon, weight] points for one hour and weather"""
+    w = list(layers["weathers"]).index(weather)
+    return layers["heat_points"][w, hour].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute city-wide congestion heatmap layers")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV to aggregate")
+    parser.add_argument("--model", default="traffic_classifier.pkl", help="Trained classifier")
+    parser.add_argument("--output", default=LAYERS_FILE, help="Where to write the layers archive")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    traffic_data = load_traffic_frame(args.data)
+    model = joblib.load(args.model)
+    vehicle_stats = aggregate_vehicle_stats(traffic_data)
+    logger.info(f"Loaded {len(traffic_data)} records in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    layers = score_city_grid(model, vehicle_stats, reconcile_coordinates(model_locations(model), LOCATION_COORDINATES))
+    save_layers(layers, args.output, layers_version(args.data, artifact_version(args.model)))
+    logger.info(
+        f"Scored {layers['high_probability'].size} location/hour/weather cells "
+        f"in {time.perf_counter() - start:.2f}s -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Network-free ETA estimator
+Predicts travel times from straight-line distance between registry
+coordinates, learned from the route summaries ORS has returned before
+
+The app appends the fastest route of every ORS directions response to
+ROUTE_LOG_FILE. The estimator fits free-flow minutes against haversine
+distance on the most recent FIT_WINDOW_ROWS routes of that log and scales
+the result by the same congestion multiplier trip legs use (1 +
+CONGESTION_DELAY_FACTOR x high-traffic probability for the hour and
+weather), with an error band taken from the fit's residuals.
+
+Every worker process appends to the same log. Rows are single appends and
+the header is published atomically, so concurrent writers never interleave
+or repeat it. Past ROUTE_LOG_MAX_BYTES the log is renamed to a
+timestamped backup, and only the newest ROUTE_LOG_BACKUPS are kept.
+
+Usage:
+    python eta_estimator.py [--log route_summaries.csv] [--fixtures ors_fixtures]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import csv
+import glob
+import io
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import trip_optimizer
+
+logger = logging.getLogger(__name__)
+
+ROUTE_LOG_FILE = "route_summaries.csv"
+LOG_COLUMNS = ["fetched_at", "from_lat", "from_lon", "to_lat", "to_lon", "distance_km", "duration_min"]
+ROUTE_LOG_MAX_BYTES = 4 * 1024 * 1024
+ROUTE_LOG_BACKUPS = 3
+# Most recent logged routes the estimator is fitted on
+FIT_WINDOW_ROWS = 50_000
+
+# Below this many logged routes the straight-line prior is used
+MIN_OBSERVATIONS = 20
+RIDGE = 1e-3
+BAND_QUANTILES = (0.1, 0.9)
+PRIOR_BAND = (0.7, 1.5)
+
+_log_lock = threading.Lock()
+
+
+def haversine_km(from_coords, to_coords):
+    """Great-circle distance in km between matching rows of (lat, lon) arrays"""
+    start = np.radians(np.asarray(from_coords, dtype=float))
+    end = np.radians(np.asarray(to_coords, dtype=float))
+    a = (np.sin((end[..., 0] - start[..., 0]) / 2) ** 2
+         + np.cos(start[..., 0]) * np.cos(end[..., 0]) * np.sin((end[..., 1] - start[..., 1]) / 2) ** 2)
+    return 2 * trip_optimizer.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def fastest_summary(route):
+    """(distance_km, duration_min) of the fastest alternative in a directions response"""
+    summaries = [feature['properties']['summary'] for feature in route['features']]
+    fastest = min(summaries, key=lambda summary: summary['duration'])
+    return fastest['distance'] / 1000, fastest['duration'] / 60
+
+
+def _rotated_logs(path):
+    """Backups of a route log, oldest first"""
+    return sorted(
+        name for name in glob.glob(f"{glob.escape(path)}.*") if name.rsplit(".", 1)[1].isdigit()
+    )
+
+
+def _rotate_log(path, max_bytes, backups):
+    """Move a full log aside under a unique name and drop backups beyond the newest ones"""
+    try:
+        if os.path.getsize(path) < max_bytes:
+            return
+        # Unique names, so two processes rotating at once never overwrite each other's backup
+        os.replace(path, f"{path}.{time.time_ns()}")
+    except FileNotFoundError:
+        return
+    for old in _rotated_logs(path)[:-backups]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass
+
+
+def _create_log(path):
+    """Create the log with its header in one step, so only one writer ever adds a header"""
+    if os.path.exists(path):
+        return
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", newline="") as f:
+        csv.writer(f).writerow(LOG_COLUMNS)
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp_path)
+
+
+def log_route(from_coords, to_coords, route, path=ROUTE_LOG_FILE, max_bytes=ROUTE_LOG_MAX_BYTES,
+              backups=ROUTE_LOG_BACKUPS):
+    """Append the fastest route between two (lon, lat) points to the route log
+
+    Each row is written with one append, so rows from other processes
+    never interleave with it. Failures are logged and ignored so routing
+    never depends on the log.
+    """
+    try:
+        distance_km, duration_min = fastest_summary(route)
+        line = io.StringIO()
+        csv.writer(line).writerow([round(time.time()), from_coords[1], from_coords[0], to_coords[1], to_coords[0],
+                                   round(distance_km, 3), round(duration_min, 2)])
+        with _log_lock:
+            _rotate_log(path, max_bytes, backups)
+            _create_log(path)
+            with open(path, "a", newline="") as f:
+                f.write(line.getvalue())
+    except Exception as e:
+        logger.warning(f"Could not log route summary to {path}: {e}")
+
+
+def read_route_log(path=ROUTE_LOG_FILE, max_rows=None):
+    """Logged route summaries as a DataFrame, oldest first (empty if there is no log yet)
+
+    Backups are read too, newest first, until max_rows rows are found;
+    only the most recent max_rows are returned.
+    """
+    frames, rows = [], 0
+    for log in [path] + _rotated_logs(path)[::-1]:
+        if max_rows is not None and rows >= max_rows:
+            break
+        try:
+            frame = pd.read_csv(log)
+        except FileNotFoundError:
+            continue
+        frames.insert(0, frame)
+        rows += len(frame)
+    if not frames:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    summaries = pd.concat(frames, ignore_index=True)
+    return summaries if max_rows is None else summaries.tail(max_rows).reset_index(drop=True)
+
+
+def fixture_summaries(directory):
+    """Route summaries from recorded ORS directions exchanges (see ors_standin.py)"""
+    from ors_standin import FixtureStore
+
+    rows = []
+    for exchange in FixtureStore(directory).exchanges():
+        if "directions" not in exchange["path"] or exchange["status"] != 200:
+            continue
+        (from_lon, from_lat), (to_lon, to_lat) = exchange["request"]["coordinates"][0], exchange["request"]["coordinates"][-1]
+        distance_km, duration_min = fastest_summary(exchange["response"])
+        rows.append([None, from_lat, from_lon, to_lat, to_lon, distance_km, duration_min])
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
+
+def _features(distance_km):
+    distance_km = np.asarray(distance_km, dtype=float)
+    return np.stack([np.ones_like(distance_km), distance_km, np.sqrt(distance_km)], axis=-1)
+
+
+class EtaEstimator:
+    """Travel-time estimates from straight-line distance and congestion
+
+    Free-flow minutes are a ridge fit of c0 + c1 * d + c2 * sqrt(d) on the
+    haversine distance d; the square-root term lets short urban trips run
+    slower per km than long ones. Estimates are multiplied by a congestion
+    factor, and the band by the 10th and 90th percentile of actual /
+    fitted minutes.
+    """
+
+    def __init__(self, coefficients, band=PRIOR_BAND, observations=0, mae=None, source="Straight-line prior"):
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self._scalar_coefficients = self.coefficients.tolist()
+        self.band = tuple(float(b) for b in band)
+        self.observations = observations
+        self.mae = mae
+        self.source = source
+
+    @classmethod
+    def prior(cls):
+        """Fixed detour factor and speed, as used for estimated trip matrices"""
+        minutes_per_km = trip_optimizer.DEFAULT_DETOUR_FACTOR / trip_optimizer.DEFAULT_SPEED_KMH * 60
+        return cls([0.0, minutes_per_km, 0.0])
+
+    @classmethod
+    def fit(cls, summaries, ridge=RIDGE, min_observations=MIN_OBSERVATIONS):
+        """Fit on route summaries (LOG_COLUMNS); falls back to the prior with too few"""
+        summaries = summaries.dropna(subset=LOG_COLUMNS[1:])
+        distance_km = haversine_km(
+            summaries[["from_lat", "from_lon"]].to_numpy(float), summaries[["to_lat", "to_lon"]].to_numpy(float)
+        )
+        minutes = summaries["duration_min"].to_numpy(float)
+        valid = (distance_km > 0) & (minutes > 0)
+        if valid.sum() < min_observations:
+            logger.info(f"Only {valid.sum()} logged routes, using the straight-line prior")
+            return cls.prior()
+
+        X, y = _features(distance_km[valid]), minutes[valid]
+        penalty = ridge * len(y) * np.diag([0.0, 1.0, 1.0])
+        coefficients = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+        fitted = np.maximum(X @ coefficients, 0.5)
+        ratios = y / fitted
+        return cls(
+            coefficients,
+            band=np.quantile(ratios, BAND_QUANTILES),
+            observations=int(valid.sum()),
+            mae=float(np.abs(y - fitted).mean()),
+            source=f"Fitted on {int(valid.sum())} routes",
+        )
+
+    @classmethod
+    def from_log(cls, path=ROUTE_LOG_FILE, max_rows=FIT_WINDOW_ROWS, **params):
+        """Fit on the most recent max_rows logged routes"""
+        return cls.fit(read_route_log(path, max_rows), **params)
+
+    def free_flow_minutes(self, distance_km):
+        """Fitted minutes for straight-line distances in km"""
+        return np.maximum(_features(distance_km) @ self.coefficients, 0.5)
+
+    def estimate(self, from_coords, to_coords, congestion_factor=1.0):
+        """(eta, low, high) minutes for matching rows of (lat, lon) arrays, vectorized"""
+        eta = self.free_flow_minutes(haversine_km(from_coords, to_coords)) * congestion_factor
+        return eta, eta * self.band[0], eta * self.band[1]
+
+    def estimate_one(self, from_coords, to_coords, congestion_factor=1.0):
+        """(eta, low, high) minutes for one pair of (lat, lon) points, without NumPy overhead"""
+        lat1, lon1 = math.radians(from_coords[0]), math.radians(from_coords[1])
+        lat2, lon2 = math.radians(to_coords[0]), math.radians(to_coords[1])
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        distance_km = 2 * trip_optimizer.EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+        c0, c1, c2 = self._scalar_coefficients
+        eta = max(c0 + c1 * distance_km + c2 * math.sqrt(distance_km), 0.5) * congestion_factor
+        return eta, eta * self.band[0], eta * self.band[1]
+
+    def rank_pairs(self, from_coords, to_coords, congestion_factor=1.0, max_minutes=None):
+        """Indexes of OD pairs ordered by estimated minutes, dropping pairs above max_minutes"""
+        eta, _, _ = self.estimate(from_coords, to_coords, congestion_factor)
+        order = np.argsort(eta, kind="stable")
+        if max_minutes is not None:
+            order = order[eta[order] <= max_minutes]
+        return order, eta[order]
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "observations": self.observations,
+            "mae": self.mae,
+            "band": self.band,
+            "coefficients": self.coefficients.round(3).tolist(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the ETA estimator and report its accuracy")
+    parser.add_argument("--log", default=ROUTE_LOG_FILE, help="Route summary log written by the app")
+    parser.add_argument("--fixtures", default=None, help="Also fit on ORS fixtures recorded by ors_standin.py")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of routes held out for evaluation")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the holdout split")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    summaries = read_route_log(args.log)
+    if args.fixtures:
+        summaries = pd.concat([summaries, fixture_summaries(args.fixtures)], ignore_index=True)
+    print(f"Route summaries: {len(summaries)}")
+
+    rng = np.random.default_rng(args.seed)
+    held_out = rng.random(len(summaries)) < args.holdout
+    estimator = EtaEstimator.fit(summaries[~held_out])
+    print(f"Estimator: {estimator.source}, coefficients {estimator.stats()['coefficients']}, "
+          f"band x{estimator.band[0]:.2f}-x{estimator.band[1]:.2f}")
+
+    test = summaries[held_out].dropna(subset=LOG_COLUMNS[1:])
+    if len(test):
+        eta, low, high = estimator.estimate(
+            test[["from_lat", "from_lon"]].to_numpy(float), test[["to_lat", "to_lon"]].to_numpy(float)
+        )
+        actual = test["duration_min"].to_numpy(float)
+        prior_eta, _, _ = EtaEstimator.prior().estimate(
+            test[["from_lat", "from_lon"]].to_numpy(float), test[["to_lat", "to_lon"]].to_numpy(float)
+        )
+        print(f"Holdout ({len(test)} routes): MAE {np.abs(eta - actual).mean():.1f} min "
+              f"(prior {np.abs(prior_eta - actual).mean():.1f} min), "
+              f"{((actual >= low) & (actual <= high)).mean():.0%} inside the band")
+
+    runs = 100_000
+    start = time.perf_counter()
+    for _ in range(runs):
+        estimator.estimate_one((12.9716, 77.5946), (12.9352, 77.6245), 1.2)
+    print(f"Single estimate: {(time.perf_counter() - start) / runs * 1e6:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Shared geometry helpers
+Planar projection and radius matching of (lat, lon) points against the
+location registry, used by probe ingestion and route calibration
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import math
+
+import numpy as np
+
+import trip_optimizer
+
+KM_PER_DEGREE = math.pi * trip_optimizer.EARTH_RADIUS_KM / 180
+
+
+class LocationGrid:
+    """Nearest-location lookup within a radius for arrays of (lat, lon) points
+
+    Coordinates are projected to km around the locations' mean latitude
+    (accurate to well under a metre across a city) and bucketed into square
+    cells one radius wide. Each cell lists the locations in its 3x3
+    neighbourhood, padded to the same length, so candidates for a batch of
+    points come from one table lookup.
+    """
+
+    def __init__(self, coords_map, radius_m):
+        self.locations = sorted(coords_map)
+        coords = np.array([coords_map[location] for location in self.locations], dtype=float)
+        self.radius_km = radius_m / 1000
+        self._lon_scale = KM_PER_DEGREE * math.cos(math.radians(coords[:, 0].mean()))
+        self.x, self.y = self._project(coords[:, 0], coords[:, 1])
+        self._origin = (self.x.min() - self.radius_km, self.y.min() - self.radius_km)
+        self.shape = (
+            int((self.x.max() - self._origin[0]) / self.radius_km) + 2,
+            int((self.y.max() - self._origin[1]) / self.radius_km) + 2,
+        )
+
+        cell_x, cell_y = self._cells(self.x, self.y)
+        candidates = [[] for _ in range(self.shape[0] * self.shape[1])]
+        for i, (cx, cy) in enumerate(zip(cell_x, cell_y)):
+            for nx in range(max(cx - 1, 0), min(cx + 2, self.shape[0])):
+                for ny in range(max(cy - 1, 0), min(cy + 2, self.shape[1])):
+                    candidates[nx * self.shape[1] + ny].append(i)
+        width = max(len(cell) for cell in candidates)
+        self.table = np.full((len(candidates), width), -1, dtype=np.int32)
+        for cell, members in enumerate(candidates):
+            self.table[cell, :len(members)] = members
+        # Padding points at a location infinitely far away
+        self._x = np.append(self.x, np.inf)
+        self._y = np.append(self.y, np.inf)
+
+    def _project(self, lat, lon):
+        return np.asarray(lon, dtype=float) * self._lon_scale, np.asarray(lat, dtype=float) * KM_PER_DEGREE
+
+    def _cells(self, x, y):
+        return (
+            np.floor((x - self._origin[0]) / self.radius_km).astype(np.int64),
+            np.floor((y - self._origin[1]) / self.radius_km).astype(np.int64),
+        )
+
+    def match(self, lat, lon):
+        """Index into self.locations of the nearest location within the radius, -1 for none"""
+        x, y = self._project(lat, lon)
+        cell_x, cell_y = self._cells(x, y)
+        inside = (cell_x >= 0) & (cell_x < self.shape[0]) & (cell_y >= 0) & (cell_y < self.shape[1])
+        matched = np.full(len(x), -1, dtype=np.int32)
+        if not inside.any():
+            return matched
+        x, y = x[inside], y[inside]
+        candidates = self.table[cell_x[inside] * self.shape[1] + cell_y[inside]]
+        distance = (self._x[candidates] - x[:, None]) ** 2 + (self._y[candidates] - y[:, None]) ** 2
+        nearest = distance.argmin(axis=1)
+        rows = np.arange(len(x))
+        within = distance[rows, nearest] <= self.radius_km ** 2
+        matched[np.flatnonzero(inside)[within]] = candidates[rows, nearest][within]
+        return matched
@@ -0,0 +1,322 @@
+"""
+Partitioned traffic history store
+Keeps traffic records as Parquet files partitioned by date and location
+bucket, so queries read only the partitions and columns they need
+
+Layout:
+    traffic_history/date=2025-04-01/bucket=3.parquet
+    traffic_history/_manifest.json   bucket count and the partitions written
+
+Date ranges and weekdays prune whole date directories, locations prune
+buckets, and hour/weather/location conditions are pushed down to the
+Parquet reader. Partitions are looked up in the manifest rather than by
+listing the directory, so query time grows with the partitions that can
+hold matching records, not with the total history. Needs the pyarrow
+package.
+
+Usage:
+    python history_store.py build [--data bangalore_traffic.csv] [--output traffic_history] [--buckets 8]
+    python history_store.py query --location "Silk Board" --hours 8-10 --weekdays --days 30
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from traffic_frame import DATE_FORMAT, iso_dates
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = "traffic_history"
+LOCATION_BUCKETS = 8
+COLUMNS = ["DATE", "TIME", "HOUR", "LOCATION", "WEATHER", "VEHICLE_COUNT"]
+MANIFEST_FILE = "_manifest.json"
+
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The pyarrow package is required for the history store (pip install pyarrow)") from e
+    return pq
+
+
+def location_bucket(location, buckets=LOCATION_BUCKETS):
+    """Stable bucket for a location name (the same in every process)"""
+    return zlib.crc32(str(location).encode("utf-8")) % buckets
+
+
+def _scan_partitions(directory):
+    """{date: [buckets]} found on disk, for stores written before the manifest existed"""
+    partitions = {}
+    for name in os.listdir(directory):
+        if name.startswith("date="):
+            partitions[name.split("=", 1)[1]] = sorted(
+                int(file[len("bucket="):-len(".parquet")])
+                for file in os.listdir(os.path.join(directory, name)) if file.endswith(".parquet")
+            )
+    return partitions
+
+
+def read_manifest(directory=HISTORY_DIR):
+    """(buckets, {date: [buckets]}) of a store; raises FileNotFoundError without one"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        return manifest["buckets"], manifest["partitions"]
+    except FileNotFoundError:
+        pass
+    try:
+        with open(os.path.join(directory, "_buckets")) as f:
+            buckets = int(f.read())
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No history store in {directory} (run: python history_store.py build)")
+    return buckets, _scan_partitions(directory)
+
+
+def _write_manifest(directory, buckets, partitions):
+    path = os.path.join(directory, MANIFEST_FILE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"buckets": buckets, "partitions": dict(sorted(partitions.items()))}, f)
+    os.replace(temp_path, path)
+
+
+def write_history(traffic_data, directory=HISTORY_DIR, buckets=LOCATION_BUCKETS, date_format=DATE_FORMAT):
+    """Write traffic records as date/location-bucket partitions
+
+    Partitions for the dates in traffic_data are replaced, so a new day can
+    be added by writing just that day's records. Writing with a different
+    bucket count than the store was built with removes every existing
+    partition, since locations no longer map to the same buckets. Rows are
+    sorted by location and hour within each file, which keeps Parquet
+    statistics selective for pushed-down filters. DATE values are read in
+    date_format (see traffic_frame.DATE_FORMAT). Returns the number of
+    files written.
+    """
+    pq = _parquet()
+    import pyarrow as pa
+
+    frame = pd.DataFrame({
+        "DATE": iso_dates(traffic_data["DATE"], date_format),
+        "TIME": traffic_data["TIME"].astype(str),
+        "HOUR": (traffic_data["HOUR"] if "HOUR" in traffic_data
+                 else pd.to_datetime(traffic_data["TIME"].astype(str), format="%H:%M").dt.hour).astype("int8"),
+        "LOCATION": traffic_data["LOCATION"].astype(str),
+        "WEATHER": traffic_data["WEATHER"].astype(str),
+        "VEHICLE_COUNT": pd.to_numeric(traffic_data["VEHICLE_COUNT"], downcast="unsigned"),
+    })
+    bucket_of = {location: location_bucket(location, buckets) for location in frame["LOCATION"].unique()}
+    frame["BUCKET"] = frame["LOCATION"].map(bucket_of)
+    frame = frame.sort_values(["DATE", "BUCKET", "LOCATION", "HOUR"], kind="stable")
+
+    os.makedirs(directory, exist_ok=True)
+    try:
+        old_buckets, partitions = read_manifest(directory)
+    except FileNotFoundError:
+        old_buckets, partitions = buckets, _scan_partitions(directory)
+    if old_buckets != buckets:
+        logger.warning(f"Rebuilding {directory} with {buckets} buckets instead of {old_buckets}, "
+                       f"removing {len(partitions)} dates of old partitions")
+        for date in partitions:
+            shutil.rmtree(os.path.join(directory, f"date={date}"), ignore_errors=True)
+        partitions = {}
+
+    files = 0
+    for date, day in frame.groupby("DATE", sort=False):
+        partition_dir = os.path.join(directory, f"date={date}")
+        os.makedirs(partition_dir, exist_ok=True)
+        written = []
+        for bucket, partition in day.groupby("BUCKET", sort=False):
+            path = os.path.join(partition_dir, f"bucket={bucket}.parquet")
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            table = pa.Table.from_pandas(partition[COLUMNS], preserve_index=False)
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, path)
+            written.append(int(bucket))
+            files += 1
+        # Buckets of the replaced day that have no records any more
+        for bucket in set(partitions.get(date, ())) - set(written):
+            try:
+                os.remove(os.path.join(partition_dir, f"bucket={bucket}.parquet"))
+            except FileNotFoundError:
+                pass
+        partitions[date] = sorted(written)
+    _write_manifest(directory, buckets, partitions)
+    if os.path.exists(os.path.join(directory, "_buckets")):
+        os.remove(os.path.join(directory, "_buckets"))
+    logger.info(f"Wrote {len(frame)} records to {files} partitions under {directory}")
+    return files
+
+
+class HistoryStore:
+    """Query API over a partitioned history directory
+
+    The manifest is re-read when another process rewrites it, so a
+    long-lived store sees days added after it was opened.
+    """
+
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self._partitions = None
+        self._load_manifest()
+
+    def _load_manifest(self):
+        """Read the manifest if it changed since the last read (one stat call)"""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            # Stores written before the manifest existed are scanned once
+            mtime = None
+        if self._partitions is None or mtime != self._manifest_mtime:
+            self.buckets, self._partitions = read_manifest(self.directory)
+            self._dates = sorted(self._partitions)
+            self._manifest_mtime = mtime
+
+    def dates(self):
+        """Dates with partitions, oldest first"""
+        self._load_manifest()
+        return self._dates
+
+    def partitions(self, start=None, end=None, locations=None, weekdays=None):
+        """Partition files that can hold records matching the date, weekday and location conditions"""
+        dates = np.array(self.dates())
+        if start is not None:
+            dates = dates[dates >= str(start)]
+        if end is not None:
+            dates = dates[dates <= str(end)]
+        if weekdays is not None and len(dates):
+            dates = dates[np.isin(pd.to_datetime(dates).dayofweek, list(weekdays))]
+        buckets = None if locations is None else {location_bucket(location, self.buckets) for location in locations}
+        return [
+            os.path.join(self.directory, f"date={date}", f"bucket={bucket}.parquet")
+            for date in dates for bucket in self._partitions[date] if buckets is None or bucket in buckets
+        ]
+
+    def query(self, start=None, end=None, days=None, locations=None, hours=None, weekdays=None,
+              weathers=None, columns=None):
+        """Traffic records matching every given condition
+
+        start/end are inclusive ISO dates; days instead selects the last N
+        days of history. hours, weekdays (0 = Monday), locations and weathers
+        are collections of allowed values. columns projects the result
+        (default: all). Returns a DataFrame with categorical strings.
+        """
+        pq = _parquet()
+        if days is not None:
+            dates = self.dates()
+            if dates:
+                end = end or dates[-1]
+                start = (pd.Timestamp(end) - pd.Timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        files = self.partitions(start, end, locations, weekdays)
+        columns = list(columns or COLUMNS)
+        self.last_query = {"partitions": len(files), "total_partitions": self.partition_count()}
+        if not files:
+            return pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+
+        filters = []
+        if locations is not None:
+            filters.append(("LOCATION", "in", list(locations)))
+        if hours is not None:
+            filters.append(("HOUR", "in", [int(hour) for hour in hours]))
+        if weathers is not None:
+            filters.append(("WEATHER", "in", list(weathers)))
+        table = pq.read_table(files, columns=columns, filters=filters or None)
+        return table.to_pandas(strings_to_categorical=True)
+
+    def partition_count(self):
+        return sum(len(buckets) for buckets in self._partitions.values())
+
+
+def parse_hours(text):
+    """Hours from "8-10" (inclusive) or "7,8,18" """
+    hours = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            hours.extend(range(int(first), int(last) + 1))
+        else:
+            hours.append(int(part))
+    return hours
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the partitioned traffic history store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Partition a traffic CSV into the store")
+    build.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV")
+    build.add_argument("--output", default=HISTORY_DIR, help="Store directory")
+    build.add_argument("--buckets", type=int, default=LOCATION_BUCKETS, help="Location buckets per date")
+    build.add_argument("--date-format", default=DATE_FORMAT, help='DATE format of the CSV, e.g. "%%d/%%m/%%Y"')
+
+    query = commands.add_parser("query", help="Query the store")
+    query.add_argument("--store", default=HISTORY_DIR, help="Store directory")
+    query.add_argument("--location", action="append", help="Location (repeatable)")
+    query.add_argument("--hours", type=parse_hours, default=None, help='Hours, e.g. "8-10" or "7,18"')
+    query.add_argument("--weekdays", action="store_true", help="Monday to Friday only")
+    query.add_argument("--weather", action="append", help="Weather (repeatable)")
+    query.add_argument("--days", type=int, default=None, help="Only the last N days")
+    query.add_argument("--start", default=None, help="First date (YYYY-MM-DD)")
+    query.add_argument("--end", default=None, help="Last date (YYYY-MM-DD)")
+    query.add_argument("--columns", default=None, help="Comma-separated columns to read")
+    query.add_argument("--compare", default=None, help="Also time the same question on this CSV")
+    query.add_argument("--date-format", default=DATE_FORMAT, help="DATE format of the --compare CSV")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "build":
+        start = time.perf_counter()
+        write_history(pd.read_csv(args.data), args.output, args.buckets, args.date_format)
+        print(f"Built {args.output} in {time.perf_counter() - start:.1f}s")
+        return
+
+    store = HistoryStore(args.store)
+    weekdays = range(5) if args.weekdays else None
+    start = time.perf_counter()
+    records = store.query(
+        start=args.start, end=args.end, days=args.days, locations=args.location, hours=args.hours,
+        weekdays=weekdays, weathers=args.weather, columns=args.columns.split(",") if args.columns else None,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"{len(records)} records from {store.last_query['partitions']} of "
+          f"{store.last_query['total_partitions']} partitions in {elapsed * 1000:.0f} ms")
+    if "VEHICLE_COUNT" in records and len(records):
+        print(records["VEHICLE_COUNT"].describe(percentiles=[0.5, 0.9, 0.99]).round(1).to_string())
+
+    if args.compare:
+        start = time.perf_counter()
+        frame = pd.read_csv(args.compare)
+        dates = iso_dates(frame["DATE"], args.date_format)
+        first, last = args.start, args.end
+        if args.days is not None:
+            last = last or dates.max()
+            first = (pd.Timestamp(last) - pd.Timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+        mask = np.ones(len(frame), dtype=bool)
+        if first is not None:
+            mask &= dates >= first
+        if last is not None:
+            mask &= dates <= last
+        if args.location:
+            mask &= frame["LOCATION"].isin(args.location)
+        if args.hours:
+            mask &= pd.to_datetime(frame["TIME"], format="%H:%M").dt.hour.isin(args.hours)
+        if args.weekdays:
+            mask &= pd.to_datetime(dates).dt.dayofweek < 5
+        if args.weather:
+            mask &= frame["WEATHER"].isin(args.weather)
+        print(f"CSV scan: {mask.sum()} records in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
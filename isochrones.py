@@ -0,0 +1,186 @@
+"""
+Reachability isochrones
+Answers "what can I reach from X within N minutes" from a precomputed
+location-to-location travel-time matrix scaled by congestion predictions
+
+Usage:
+    python isochrones.py [--output travel_times.npz] [--estimate]
+
+Without --estimate the matrix is fetched from OpenRouteService (ORS_API_KEY
+and ORS_BASE_URL in config.py) in chunks of sources.
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import logging
+import time
+
+import folium
+import numpy as np
+
+import trip_optimizer
+from location_registry import LOCATION_COORDINATES
+
+logger = logging.getLogger(__name__)
+
+TRAVEL_TIMES_FILE = "travel_times.npz"
+
+# Sources per ORS matrix request; keeps sources x destinations under the service limit
+MATRIX_CHUNK = 40
+
+# Isochrone bands as shares of the time budget, nearest first
+BANDS = [(1 / 3, "darkgreen"), (2 / 3, "orange"), (1.0, "red")]
+
+
+def estimate_travel_times_matrix(coords_map=LOCATION_COORDINATES):
+    """Straight-line travel-time matrix in minutes, used when no routed matrix exists"""
+    locations = sorted(coords_map)
+    coords = np.array([coords_map[location] for location in locations], dtype=float)
+    return {
+        "locations": np.array(locations),
+        "coords": coords,
+        "durations": trip_optimizer.estimate_travel_times(coords),
+        "source": np.array("Straight-line estimate"),
+    }
+
+
+def fetch_travel_times_matrix(client, coords_map=LOCATION_COORDINATES, chunk=MATRIX_CHUNK):
+    """Routed travel-time matrix in minutes from the ORS matrix endpoint
+
+    Pairs ORS cannot route are left as infinity.
+    """
+    locations = sorted(coords_map)
+    coords = np.array([coords_map[location] for location in locations], dtype=float)
+    lon_lat = [[float(lon), float(lat)] for lat, lon in coords]
+    durations = np.full((len(locations), len(locations)), np.inf)
+    for start in range(0, len(locations), chunk):
+        sources = list(range(start, min(start + chunk, len(locations))))
+        response = client.distance_matrix(
+            locations=lon_lat,
+            sources=sources,
+            profile='driving-car',
+            metrics=['duration'],
+            validate=True,
+        )
+        block = np.array(response['durations'], dtype=float) / 60
+        durations[sources] = np.where(np.isnan(block), np.inf, block)
+        logger.info(f"Fetched travel times for sources {sources[0]}-{sources[-1]}")
+    return {
+        "locations": np.array(locations),
+        "coords": coords,
+        "durations": durations,
+        "source": np.array("OpenRouteService"),
+    }
+
+
+def save_travel_times(matrix, path=TRAVEL_TIMES_FILE):
+    np.savez_compressed(path, **matrix)
+
+
+def load_travel_times(path=TRAVEL_TIMES_FILE):
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def congestion_factors(layers, locations, hour, weather, delay_factor):
+    """Travel-time multipliers for arriving at each location at hour in weather
+
+    Uses the precomputed congestion layers; locations they do not cover
+    get a factor of 1.
+    """
+    w = list(layers["weathers"]).index(weather)
+    positions = {name: i for i, name in enumerate(layers["locations"])}
+    index = np.array([positions.get(name, -1) for name in locations])
+    probabilities = layers["high_probability"][w, hour].astype(float)
+    return np.where(index >= 0, 1 + delay_factor * probabilities[index], 1.0)
+
+
+def reachable_minutes(durations, factors, origin):
+    """Congestion-adjusted minutes from origin to every location in one vectorized pass
+
+    Each trip is scaled by the destination's factor, as trip legs are.
+    """
+    minutes = durations[origin] * factors
+    minutes[origin] = 0.0
+    return minutes
+
+
+def convex_hull(points):
+    """Convex hull of (lat, lon) points, counter-clockwise (monotone chain)"""
+    points = sorted(set(map(tuple, points)))
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    return lower[:-1] + upper[:-1]
+
+
+def isochrone_layer(locations, coords, minutes, budget, origin, name="Reachable"):
+    """Folium layer with the reachable area and locations colored by travel-time band"""
+    layer = folium.FeatureGroup(name=name)
+    reachable = np.flatnonzero(minutes <= budget)
+    outline = convex_hull(coords[reachable])
+    if len(outline) >= 3:
+        folium.Polygon(
+            [[float(lat), float(lon)] for lat, lon in outline],
+            color="blue",
+            weight=2,
+            fill=True,
+            fill_opacity=0.1,
+            tooltip=f"Reachable within {budget} min",
+        ).add_to(layer)
+
+    bands = np.searchsorted([share * budget for share, _ in BANDS], minutes[reachable])
+    for i, band in zip(reachable, bands):
+        folium.CircleMarker(
+            location=[float(coords[i][0]), float(coords[i][1])],
+            radius=10 if i == origin else 6,
+            color="blue" if i == origin else BANDS[min(band, len(BANDS) - 1)][1],
+            fill=True,
+            fill_opacity=0.8,
+            popup=f"{locations[i]}: {minutes[i]:.0f} min",
+        ).add_to(layer)
+    return layer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the location-to-location travel-time matrix")
+    parser.add_argument("--output", default=TRAVEL_TIMES_FILE, help="Where to write the matrix archive")
+    parser.add_argument("--estimate", action="store_true", help="Use straight-line estimates instead of ORS")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    if args.estimate:
+        matrix = estimate_travel_times_matrix()
+    else:
+        import openrouteservice
+
+        import config
+        client = openrouteservice.Client(
+            key=config.ORS_API_KEY,
+            base_url=getattr(config, "ORS_BASE_URL", "https://api.openrouteservice.org"),
+        )
+        matrix = fetch_travel_times_matrix(client)
+    save_travel_times(matrix, args.output)
+    logger.info(
+        f"Wrote {matrix['durations'].shape[0]}x{matrix['durations'].shape[1]} travel times "
+        f"({matrix['source']}) in {time.perf_counter() - start:.1f}s -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Load testing harness
+Replays realistic user sessions against the app's pipeline at increasing
+concurrency and reports throughput and latency percentiles per stage
+
+Each simulated user picks a random from/to pair from the model's locations,
+then moves the hour slider and weather selector a few times. Every
+interaction reruns the app's TrafficEngine calls like a Streamlit rerun
+does: prediction for the destination, the departure sweep (for users who
+enable it) and the traffic-adjusted routes. Routes go through the engine's
+cache, circuit breaker and single-flight layers to a local ORS stand-in
+with configurable latency and error rate, are logged for the ETA estimator
+(to a temporary route log unless --route-log is given) and are calibrated
+by the engine's route calibrator. Each concurrency level runs on a fresh
+engine, so it starts with cold caches.
+With --fixtures the stand-in replays responses recorded from the real API
+(see ors_standin.py) and sessions only use the recorded location pairs.
+
+Usage:
+    python load_test.py [--concurrency 1 2 4 8 16 32] [--duration 20]
+                        [--latency 0.3] [--jitter 0.1] [--error-rate 0.02]
+                        [--ors-url http://127.0.0.1:8080] [--route-log routes.csv]
+                        [--output results.csv]
+    python load_test.py --fixtures ors_fixtures [--latency-scale 1.0]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from ors_standin import FixtureStore, ORSStandIn
+from traffic_engine import TrafficEngine
+from traffic_scoring import WEATHER_OPTIONS, model_locations
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["rerun", "prediction", "departure_sweep", "route"]
+
+
+class StageRecorder:
+    """Thread-safe latency samples and error counts per stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sessions = 0
+
+    def record(self, stage, seconds, failed=False):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+            if failed:
+                self.errors[stage] += 1
+
+    def timed(self, stage, fn, *args):
+        """Call fn, recording its latency; failures are counted, not raised"""
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.record(stage, time.perf_counter() - start, failed=True)
+            logger.debug(f"{stage} failed: {type(e).__name__}: {e}")
+            return None
+        self.record(stage, time.perf_counter() - start)
+        return result
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def summary(self, concurrency, elapsed):
+        """One row per stage with throughput and p50/p95/p99 latency in ms"""
+        rows = []
+        for stage in STAGES:
+            samples = np.array(self.latencies.get(stage, []))
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+            rows.append({
+                "concurrency": concurrency,
+                "stage": stage,
+                "count": len(samples),
+                "errors": self.errors.get(stage, 0),
+                "per_second": len(samples) / elapsed,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+            })
+        return rows
+
+
+def location_pairs(engine, fixtures=None):
+    """From/to pairs sessions pick from, and the (lat, lon) coordinates of their locations
+
+    Every pair of model locations with coordinates, or with fixtures only
+    the pairs with a recorded two-point directions response.
+    """
+    model, _ = engine.model_manager.snapshot()
+    coords_map = engine.coords_map(model_locations(model))
+    locations = sorted(location for location in model_locations(model) if location in coords_map)
+    if fixtures is None:
+        return list(itertools.permutations(locations, 2)), coords_map
+    return recorded_pairs(fixtures, locations, coords_map), coords_map
+
+
+def run_session(engine, pairs, coords_map, recorder, rng, deadline, sweep_share=0.3, think_time=0.0):
+    """Replay one user session: open the page, then change the sliders a few times
+
+    Each interaction reruns the page's engine calls in the app's order: the
+    route fetch starts in the background, prediction and departure sweep
+    render meanwhile, then the route stage waits for the routes and adjusts
+    their durations for traffic.
+    """
+    from_location, to_location = rng.choice(pairs)
+    from_coords = coords_map[from_location][::-1]
+    to_coords = coords_map[to_location][::-1]
+    hour = rng.randrange(24)
+    weather = rng.choice(WEATHER_OPTIONS)
+    wants_sweep = rng.random() < sweep_share
+
+    for interaction in range(1 + rng.randint(1, 4)):
+        if time.perf_counter() >= deadline:
+            return False
+        if interaction:
+            if rng.random() < 0.7:
+                hour = rng.randrange(24)
+            else:
+                weather = rng.choice(WEATHER_OPTIONS)
+
+        start = time.perf_counter()
+        model, model_version = engine.model_manager.snapshot()
+        routes = engine.start_route_fetch(from_coords, to_coords)
+        recorder.timed("prediction", predict, engine, model, to_location, hour, weather)
+        if wants_sweep:
+            recorder.timed(
+                "departure_sweep", departure_sweep, engine, model, model_version,
+                from_location, to_location, coords_map, weather,
+            )
+        recorder.timed("route", route_durations, engine, routes, hour, weather)
+        recorder.record("rerun", time.perf_counter() - start)
+
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+    return True
+
+
+def predict(engine, model, location, hour, weather):
+    vehicle_count = engine.vehicle_counts(location, [hour], weather)[0]
+    return engine.predict(model, location, hour, weather, vehicle_count)
+
+
+def departure_sweep(engine, model, model_version, from_location, to_location, coords_map, weather):
+    route_minutes = engine.eta_estimator.estimate_one(coords_map[from_location], coords_map[to_location])[0]
+    return engine.sweep_departure_hours(model, model_version, from_location, to_location, weather, route_minutes)
+
+
+def route_durations(engine, routes, hour, weather):
+    return engine.route_durations(routes.result().value, hour, weather)
+
+
+def run_level(engine, pairs, coords_map, concurrency, duration, seed=None, sweep_share=0.3, think_time=0.0):
+    """Run concurrency simulated users for duration seconds; returns (recorder, elapsed)"""
+    recorder = StageRecorder()
+    deadline = time.perf_counter() + duration
+
+    def user(index):
+        rng = random.Random(None if seed is None else seed + index)
+        while time.perf_counter() < deadline:
+            if run_session(engine, pairs, coords_map, recorder, rng, deadline, sweep_share, think_time):
+                recorder.session_done()
+
+    threads = [threading.Thread(target=user, args=(i,), name=f"load-user-{i}") for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def recorded_pairs(fixtures, locations, coords_map):
+    """Location pairs with a recorded two-point directions response"""
+    by_coords = {tuple(coords_map[location][::-1]): location for location in locations}
+    pairs = set()
+    for exchange in fixtures.exchanges():
+        coordinates = exchange["request"].get("coordinates", [])
+        if exchange["path"].startswith("/v2/directions/") and len(coordinates) == 2:
+            from_location = by_coords.get(tuple(coordinates[0]))
+            to_location = by_coords.get(tuple(coordinates[1]))
+            if from_location and to_location:
+                pairs.add((from_location, to_location))
+    return sorted(pairs)
+
+
+def format_results(results):
+    """Render result rows as a plain-text table"""
+    table = pd.DataFrame(results)
+    return table.to_string(
+        index=False,
+        formatters={
+            "per_second": "{:.1f}".format,
+            "p50_ms": "{:.1f}".format,
+            "p95_ms": "{:.1f}".format,
+            "p99_ms": "{:.1f}".format,
+        },
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the traffic app pipeline")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV to aggregate")
+    parser.add_argument("--model", default="traffic_classifier.pkl", help="Trained classifier")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="Simulated concurrent users per level")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stand-in ORS latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Stand-in ORS latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stand-in ORS requests that fail")
+    parser.add_argument("--fixtures", default=None, help="Replay recorded ORS responses from this fixture store")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="With --fixtures, also wait this multiple of the recorded ORS time")
+    parser.add_argument("--ors-url", default=None, help="Use this ORS endpoint instead of starting a stand-in")
+    parser.add_argument("--cache", default="memory://", help="Shared cache backend URL")
+    parser.add_argument("--sweep-share", type=float, default=0.3, help="Share of sessions using the departure planner")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between interactions")
+    parser.add_argument("--route-log", default=None,
+                        help="Log fetched routes here (default: a temporary file, not the app's route log)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible sessions")
+    parser.add_argument("--output", default=None, help="Also write the results to this CSV file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    fixtures = None
+    if args.fixtures:
+        fixtures = FixtureStore(args.fixtures)
+        print(f"Replaying {len(fixtures)} recorded responses")
+
+    standin = None
+    ors_url = args.ors_url
+    if ors_url is None:
+        standin = ORSStandIn(
+            args.latency, args.jitter, args.error_rate, seed=args.seed,
+            mode="replay" if args.fixtures else "synthetic", fixtures=args.fixtures,
+            latency_scale=args.latency_scale, fallback=True,
+        ).start()
+        ors_url = standin.url
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="load-test-") as scratch:
+            route_log = args.route_log or os.path.join(scratch, "route_summaries.csv")
+            for concurrency in args.concurrency:
+                # A fresh engine per level, so each level starts with cold caches
+                engine = TrafficEngine(args.data, args.model, args.cache, "load-test", ors_url, route_log)
+                try:
+                    pairs, coords_map = location_pairs(engine, fixtures)
+                    if not pairs:
+                        parser.error(f"No recorded routes between known locations in {args.fixtures}")
+                    engine.warm_up([location for location, _ in pairs], route_pairs=[])
+                    recorder, elapsed = run_level(
+                        engine, pairs, coords_map, concurrency, args.duration, args.seed,
+                        args.sweep_share, args.think_time,
+                    )
+                finally:
+                    engine.model_manager.stop()
+                    engine.route_executor.shutdown(wait=False, cancel_futures=True)
+                rows = recorder.summary(concurrency, elapsed)
+                results.extend(rows)
+                reruns = next((row["per_second"] for row in rows if row["stage"] == "rerun"), 0.0)
+                print(
+                    f"{concurrency:>4} users: {recorder.sessions / elapsed:.1f} sessions/s, "
+                    f"{reruns:.1f} reruns/s over {len(pairs)} location pairs, "
+                    f"route cache {engine.route_cache.stats()}",
+                    flush=True,
+                )
+    finally:
+        if standin is not None:
+            standin.stop()
+            print(f"ORS stand-in: {standin.stats()}")
+
+    print()
+    print(format_results(results))
+    if args.output:
+        pd.DataFrame(results).to_csv(args.output, index=False)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Location registry for Bangalore
+Coordinates (lat, lon) of every location the apps can route between
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+LOCATION_COORDINATES = {
+    "1st Main Road": (12.9784, 77.5994),
+    "2nd Cross": (12.9352, 77.6245),
+    "2nd Cross Road": (12.9628, 77.6447),
+    "2nd Main Road": (12.9863, 77.6189),
+    "3rd Cross": (12.9256, 77.6693),
+    "4th Cross": (12.9087, 77.6014),
+    "Albert Victor Road": (12.9663, 77.5967),
+    "Ali Asker Road": (12.9945, 77.5861),
+    "Annaswamy Mudaliar Road": (12.9665, 77.5942),
+    "Artillery Road": (12.9759, 77.6158),
+    "Assayyee Road - Annaswamy Mudaliar Road": (12.9653, 77.5951),
+    "Atturu-Ananthapura Road": (12.9001, 77.5623),
+    "Avenue Road": (12.9732, 77.5816),
+    "BTM Layout": (12.9162, 77.6101),
+    "Banasawadi-Ramamurthynagar Road": (13.0139, 77.6612),
+    "Bangalore University Road": (13.0344, 77.5652),
+    "Bannerghatta Road": (12.8913, 77.5979),
+    "Bazaar Street": (12.9675, 77.5783),
+    "Bedarahalli-Ullalu Road": (12.8614, 77.5337),
+    "Begur Main Road": (12.8581, 77.6412),
+    "Bellary Road": (13.0068, 77.5893),
+    "Brigade Road": (12.9754, 77.6045),
+    "Brunton Road": (12.9761, 77.6073),
+    "Byappanahalli Main Road": (12.9782, 77.6385),
+    "Campbell Road": (12.9892, 77.5819),
+    "Castle Street": (12.9738, 77.5967),
+    "Central Street": (12.9739, 77.6112),
+    "Chamarajpet - Sarjapur Road": (12.9541, 77.5653),
+    "Church Street": (12.9723, 77.6118),
+    "City Bus Road": (12.9779, 77.5716),
+    "Cleveland Road": (12.9726, 77.6089),
+    "Commercial Street": (12.9771, 77.6105),
+    "Commissariat Road": (12.9738, 77.6115),
+    "Convent Road": (12.9712, 77.6062),
+    "Crescent Road": (12.9881, 77.5931),
+    "Cubbon Road": (12.9765, 77.5947),
+    "Cunningham Road": (12.9789, 77.6022),
+    "Devanga Hostel Road": (12.9628, 77.5791),
+    "Diagonal Road": (12.9762, 77.5923),
+    "Dickenson Road": (12.9715, 77.6221),
+    "Double Road": (12.9632, 77.5841),
+    "Dr.Rajkumar Road": (12.9981, 77.5521),
+    "Electronic City": (12.8452, 77.6604),
+    "Electronic City Phase 1": (12.8456, 77.6643),
+    "Haines Road": (12.9584, 77.6037),
+    "Hennur Main Road": (13.0415, 77.6213),
+    "Hosur Road": (12.9169, 77.6298),
+    "Indiranagar 100 Feet Road": (12.9784, 77.6392),
+    "Infantry Road": (12.9812, 77.5998),
+    "Jayachamaraja Wodeyar Road": (12.9738, 77.5876),
+    "Kasturba Road": (12.9746, 77.5932),
+    "Koramangala 5th Block": (12.9345, 77.6232),
+    "Koramangala - Indiranagar Road": (12.9654, 77.6287),
+    "Langford Road": (12.9574, 77.5978),
+    "Lavelle Road": (12.9709, 77.6012),
+    "Mahatma Gandhi Road": (12.9765, 77.6045),
+    "Marathahalli": (12.9592, 77.6974),
+    "Mysore Road": (12.9563, 77.5132),
+    "Old Madras Road": (12.9987, 77.6789),
+    "Outer Ring Road": (12.9345, 77.6891),
+    "Palace Road": (12.9987, 77.5921),
+    "Prime Street": (12.9721, 77.6045),
+    "Race Course Road": (12.9843, 77.5987),
+    "Rajaram Mohan Roy Road": (12.9632, 77.5789),
+    "Residency Road": (12.9712, 77.6012),
+    "Richmond Road": (12.9612, 77.6012),
+    "Sarjapura Road": (12.9012, 77.6891),
+    "Silk Board": (12.9172, 77.6237),
+    "Sri Rama Temple Street": (12.9432, 77.5678),
+    "Vidyaranyapura Road": (13.0789, 77.5432),
+    "Whitefield": (12.9698, 77.7499),
+    "Whitefield Main Road": (12.9784, 77.7321),
+    "Hebbal": (13.0358, 77.5970),
+    "Majestic": (12.9763, 77.5715)
+}
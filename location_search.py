@@ -0,0 +1,210 @@
+"""
+Location search
+Typo-tolerant ranked location search over trigram and word-prefix indexes,
+plus name reconciliation between the model, the traffic CSV and the registry
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import bisect
+import logging
+import re
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Match = namedtuple("Match", ["name", "score"])
+
+# Spelled-out forms so "MG Rd" and "M.G. Road" style variants meet halfway
+ABBREVIATIONS = {
+    "rd": "road",
+    "st": "street",
+    "ave": "avenue",
+    "cir": "circle",
+    "jn": "junction",
+    "jct": "junction",
+    "blk": "block",
+    "ph": "phase",
+    "mg": "mahatma gandhi",
+    "orr": "outer ring road",
+}
+
+# Minimum score for a match to be used when reconciling names
+RECONCILE_MIN_SCORE = 0.6
+
+# Ranking bonuses on top of trigram similarity (0 to 1)
+EXACT_BONUS = 1.0
+NAME_PREFIX_BONUS = 0.5
+WORD_PREFIX_BONUS = 0.3
+
+
+def normalize(name):
+    """Lowercase, drop punctuation and spell out common abbreviations"""
+    words = re.sub(r"[^a-z0-9]+", " ", name.lower().replace("&", " and ")).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def aliases(name):
+    """Normalized forms a location can be found by
+
+    "ORR (Outer Ring Road)" is indexed as the full name and as each of its
+    parts, so it matches both "ORR" and "Outer Ring Road".
+    """
+    forms = {normalize(name)}
+    outer = re.sub(r"\(.*?\)", " ", name)
+    forms.add(normalize(outer))
+    forms.update(normalize(inner) for inner in re.findall(r"\((.*?)\)", name))
+    forms.update(normalize(part) for part in re.split(r"\s+-\s+", outer) if part.strip())
+    return sorted(form for form in forms if form)
+
+
+def trigrams(text):
+    """Set of word trigrams, padded so short words and word starts count"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class LocationIndex:
+    """Ranked fuzzy search over a list of location names
+
+    Each name is indexed under all of its aliases. Scores combine the
+    trigram (Jaccard) similarity with bonuses for exact matches and for
+    queries that prefix the name or one of its words; the best alias
+    counts for each name.
+    """
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        entry_names, entry_keys = [], []
+        for name_id, name in enumerate(self.names):
+            for alias in aliases(name):
+                entry_names.append(name_id)
+                entry_keys.append(alias)
+        self._entry_names = np.array(entry_names, dtype=np.int64)
+        self._entry_keys = entry_keys
+        # Entries are grouped by name, so per-name maxima can use reduceat. Names
+        # with no alias (punctuation only) have no entries, so each group's
+        # name is kept to put its maximum back in the right place.
+        self._name_starts = np.flatnonzero(np.r_[True, np.diff(self._entry_names) != 0]) if entry_names \
+            else np.zeros(0, dtype=np.int64)
+        self._group_names = self._entry_names[self._name_starts]
+
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(entry_keys))
+        prefixes = []
+        for entry_id, key in enumerate(entry_keys):
+            grams = trigrams(key)
+            gram_counts[entry_id] = len(grams)
+            for gram in grams:
+                postings[gram].append(entry_id)
+            words = key.split()
+            for i in range(len(words)):
+                prefixes.append((" ".join(words[i:]), entry_id, i == 0))
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._gram_counts = gram_counts
+        prefixes.sort()
+        self._prefix_keys = [key for key, _, _ in prefixes]
+        self._prefix_entries = [(entry_id, whole) for _, entry_id, whole in prefixes]
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query, limit=10, min_score=0.2):
+        """Return up to limit Matches for query, best first"""
+        text = normalize(query)
+        if not text or not self.names:
+            return []
+
+        scores = np.zeros(len(self._entry_keys))
+        grams = trigrams(text)
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(scores))
+            scores += shared / (len(grams) + self._gram_counts - shared)
+
+        # Word-prefix matches; capped so one-letter queries stay cheap
+        bonuses = np.zeros(len(scores))
+        start = bisect.bisect_left(self._prefix_keys, text)
+        stop = min(bisect.bisect_right(self._prefix_keys, text + "\uffff"), start + 50 * limit)
+        for entry_id, whole in self._prefix_entries[start:stop]:
+            bonus = NAME_PREFIX_BONUS if whole else WORD_PREFIX_BONUS
+            if whole and self._entry_keys[entry_id] == text:
+                bonus = EXACT_BONUS
+            bonuses[entry_id] = max(bonuses[entry_id], bonus)
+        scores += bonuses
+
+        name_scores = np.zeros(len(self.names))
+        if len(self._name_starts):
+            name_scores[self._group_names] = np.maximum.reduceat(scores, self._name_starts)
+        candidates = np.flatnonzero(name_scores >= min_score)
+        order = candidates[np.lexsort((candidates, -name_scores[candidates]))][:limit]
+        return [Match(self.names[i], float(name_scores[i])) for i in order]
+
+    def best_match(self, query, min_score=RECONCILE_MIN_SCORE):
+        """The single best Match for query, or None below min_score"""
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+
+def reconcile(names, reference, min_score=RECONCILE_MIN_SCORE):
+    """Map each name to its exact or closest counterpart in reference
+
+    Returns a dict of name -> Match (score None for exact matches), with
+    None for names that have no counterpart above min_score.
+    """
+    index = reference if isinstance(reference, LocationIndex) else LocationIndex(sorted(set(reference)))
+    reference_names = set(index.names)
+    resolved = {}
+    for name in names:
+        if name in reference_names:
+            resolved[name] = Match(name, None)
+        else:
+            resolved[name] = index.best_match(name, min_score)
+    return resolved
+
+
+def reconcile_coordinates(names, coords_map, min_score=RECONCILE_MIN_SCORE):
+    """coords_map plus each of names under the coordinates of its closest match
+
+    Model locations such as "ORR (Outer Ring Road)" get the coordinates of
+    "Outer Ring Road"; names without a match above min_score are left out.
+    """
+    reconciled = dict(coords_map)
+    for name, match in reconcile(names, coords_map, min_score).items():
+        if match is None:
+            logger.warning(f"No coordinates for location '{name}'")
+        elif match.name != name:
+            logger.info(f"Using coordinates of '{match.name}' for location '{name}'")
+            reconciled[name] = coords_map[match.name]
+    return reconciled
+
+
+def mismatch_report(sources, min_score=RECONCILE_MIN_SCORE):
+    """Names missing from one source but present in another
+
+    sources maps a source label to its location names. Each row gives the
+    name, where it was found, where it is missing and the closest name there.
+    """
+    indexes = {label: LocationIndex(sorted(set(names))) for label, names in sources.items()}
+    rows = []
+    for label, names in sources.items():
+        for other, index in indexes.items():
+            if other == label:
+                continue
+            present = set(index.names)
+            for name in sorted(set(names) - present):
+                match = index.best_match(name, min_score)
+                rows.append({
+                    "location": name,
+                    "found_in": label,
+                    "missing_from": other,
+                    "closest_match": match.name if match else None,
+                    "score": round(match.score, 2) if match else None,
+                })
+    return rows
@@ -0,0 +1,187 @@
+"""
+Model hot-swap manager
+Watches the classifier artifact and swaps in new versions without restarts
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from shared_cache import file_version
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FEATURES = ["HOUR", "VEHICLE_COUNT"]
+REQUIRED_FEATURE_PREFIXES = ["LOCATION_", "WEATHER_"]
+
+
+class IncompatibleModelError(ValueError):
+    """Raised when a new model cannot replace the active one"""
+
+
+def validate_model(model, current=None):
+    """Check that a model can serve the app's predictions
+
+    The model must expose feature_names_in_ with the hour, vehicle count,
+    location and weather features, and must predict on a sample row. Raises
+    IncompatibleModelError otherwise. Locations dropped relative to the
+    current model are logged but allowed.
+    """
+    features = list(getattr(model, "feature_names_in_", []))
+    if not features or not hasattr(model, "predict_proba"):
+        raise IncompatibleModelError("Model has no feature_names_in_ or predict_proba")
+    missing = [name for name in REQUIRED_FEATURES if name not in features]
+    missing += [f"{prefix}*" for prefix in REQUIRED_FEATURE_PREFIXES
+                if not any(name.startswith(prefix) for name in features)]
+    if missing:
+        raise IncompatibleModelError(f"Model is missing features: {', '.join(missing)}")
+
+    sample = pd.DataFrame(np.zeros((1, len(features))), columns=features)
+    sample["HOUR"] = 9
+    sample["VEHICLE_COUNT"] = 75
+    try:
+        probabilities = model.predict_proba(sample)
+    except Exception as e:
+        raise IncompatibleModelError(f"Model failed on a sample row: {e}") from e
+    if probabilities.shape != (1, len(model.classes_)):
+        raise IncompatibleModelError(f"Unexpected prediction shape {probabilities.shape}")
+
+    if current is not None:
+        dropped = set(current.feature_names_in_) - set(features)
+        if dropped:
+            logger.warning(f"New model drops {len(dropped)} features: {sorted(dropped)[:5]}")
+
+
+def artifact_version(path, version_file=None):
+    """Version of a model artifact: the training job's version file, else the file's mtime and size"""
+    try:
+        with open(version_file or f"{path}.version") as f:
+            return f.read().strip()
+    except OSError:
+        return file_version(path)
+
+
+class ModelManager:
+    """Serve the active model and reload it in the background when the artifact changes
+
+    A change is detected from version_file (written by the training job
+    once the artifact is complete) when it exists, otherwise from the
+    artifact's mtime and size. A changed artifact is loaded only after two
+    checks agree on its version, so half-written files are skipped. The
+    new model is loaded and validated off the request path, then swapped in
+    with a single reference assignment: callers that already read .model
+    keep using the old one and nobody waits on the load.
+    """
+
+    def __init__(self, path, check_interval=5.0, version_file=None, loader=joblib.load, watch=True):
+        self.path = path
+        self.check_interval = check_interval
+        self.version_file = version_file or f"{path}.version"
+        self._loader = loader
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._candidate = None
+        self._rejected = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+        self.last_check = None
+
+        version = self.artifact_version()
+        start = time.perf_counter()
+        model = self._loader(path)
+        validate_model(model)
+        self.last_reload_seconds = time.perf_counter() - start
+        self._active = (model, version, time.time())
+        logger.info(f"Loaded model {version} in {self.last_reload_seconds:.2f}s")
+
+        self._thread = None
+        if watch and check_interval:
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    @property
+    def model(self):
+        """The active model; read it once per request and reuse the reference"""
+        return self._active[0]
+
+    @property
+    def version(self):
+        return self._active[1]
+
+    def snapshot(self):
+        """(model, version) read together, so they always belong to each other"""
+        model, version, _ = self._active
+        return model, version
+
+    def artifact_version(self):
+        """Version of the artifact on disk"""
+        return artifact_version(self.path, self.version_file)
+
+    def check(self):
+        """Reload if the artifact changed; returns True when a new model was swapped in"""
+        self.last_check = time.time()
+        version = self.artifact_version()
+        if version in (self.version, self._rejected):
+            self._candidate = None
+            return False
+        if version != self._candidate and not os.path.exists(self.version_file):
+            # Wait for the next check to confirm the file has stopped changing
+            self._candidate = version
+            return False
+        return self.reload(version)
+
+    def reload(self, version=None):
+        """Load, validate and swap in the artifact; the active model stays on failure"""
+        with self._reload_lock:
+            version = version or self.artifact_version()
+            start = time.perf_counter()
+            try:
+                model = self._loader(self.path)
+                validate_model(model, self.model)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # Skip this version until the artifact changes again
+                self._candidate = None
+                self._rejected = version
+                logger.error(f"Model reload failed for {version}, keeping {self.version}: {e}")
+                return False
+            self.last_reload_seconds = time.perf_counter() - start
+            self._active = (model, version, time.time())
+            self._candidate = None
+            self.reloads += 1
+            self.last_error = None
+            logger.info(f"Swapped in model {version} (loaded in {self.last_reload_seconds:.2f}s)")
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Model check failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Active version and reload counters"""
+        _, version, loaded_at = self._active
+        return {
+            "version": version,
+            "loaded_at": loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_reload_seconds": self.last_reload_seconds,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,326 @@
+"""
+Local OpenRouteService stand-in
+Answers directions and matrix requests locally for load tests, benchmarks
+and offline development
+
+Modes:
+    synthetic   Straight-line responses computed on the fly (default)
+    record      Forward requests to the real ORS and save each response to a fixture store
+    replay      Serve responses from the fixture store without any network access
+
+Every mode can add latency (fixed, with jitter, and/or a share of the
+recorded upstream time) and inject errors at a configurable rate.
+
+Usage:
+    python ors_standin.py [--port 8080] [--latency 0.2] [--jitter 0.05] [--error-rate 0.02]
+    python ors_standin.py --mode record --fixtures ors_fixtures
+    python ors_standin.py --mode replay --fixtures ors_fixtures [--latency-scale 1.0] [--fallback]
+
+Point the app at it with ORS_BASE_URL = "http://127.0.0.1:8080" in config.py.
+When recording, the app's ORS_API_KEY is passed through to the real API.
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+import trip_optimizer
+
+logger = logging.getLogger(__name__)
+
+MODES = ["synthetic", "record", "replay"]
+DEFAULT_UPSTREAM = "https://api.openrouteservice.org"
+DEFAULT_FIXTURES_DIR = "ors_fixtures"
+
+# Returned for injected errors; not one the ORS client retries
+ERROR_STATUS = 500
+
+
+def synthetic_directions(body):
+    """Straight-line routes through the requested (lon, lat) coordinates
+
+    Alternatives are slightly longer copies of the first route, as many as
+    alternative_routes.target_count asks for.
+    """
+    coordinates = [list(point) for point in body["coordinates"]]
+    points = np.array(coordinates, dtype=float)[:, ::-1]
+    legs_km = trip_optimizer.haversine_matrix(points)[np.arange(len(points) - 1), np.arange(1, len(points))]
+    distance = float(legs_km.sum()) * trip_optimizer.DEFAULT_DETOUR_FACTOR * 1000
+    duration = distance / 1000 / trip_optimizer.DEFAULT_SPEED_KMH * 3600
+
+    target_count = (body.get("alternative_routes") or {}).get("target_count", 1)
+    features = []
+    for i in range(target_count):
+        features.append({
+            "type": "Feature",
+            "properties": {"summary": {"distance": distance * (1 + 0.1 * i), "duration": duration * (1 + 0.15 * i)}},
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def synthetic_matrix(body):
+    """Travel-time matrix in seconds for the requested (lon, lat) locations"""
+    points = np.array(body["locations"], dtype=float)[:, ::-1]
+    durations = trip_optimizer.estimate_travel_times(points) * 60
+    return {"durations": durations.round(1).tolist()}
+
+
+class FixtureStore:
+    """Recorded ORS exchanges, one JSON file per distinct request
+
+    Requests are matched on the endpoint path and the canonical JSON body,
+    so replaying the same app interactions hits the same fixtures.
+    """
+
+    def __init__(self, directory=DEFAULT_FIXTURES_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    @staticmethod
+    def key(path, body):
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(f"{path.split('?')[0]}\n{canonical}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, path, body):
+        """Return the recorded exchange for a request, or None"""
+        key = self.key(path, body)
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key]
+        try:
+            with open(self._path(key)) as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._loaded[key] = fixture
+        return fixture
+
+    def put(self, path, body, status, response, elapsed):
+        """Save an exchange; the file is replaced atomically"""
+        key = self.key(path, body)
+        fixture = {"path": path, "request": body, "status": status, "response": response, "elapsed": elapsed}
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(fixture, f)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._loaded[key] = fixture
+
+    def exchanges(self):
+        """Iterate over every recorded exchange"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    yield json.load(f)
+
+    def __len__(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+
+class ORSStandIn:
+    """Threaded HTTP server mimicking the ORS directions and matrix endpoints
+
+    Each request waits latency +/- jitter seconds, plus latency_scale times
+    the recorded upstream time when replaying, and fails with probability
+    error_rate. In replay mode, requests without a fixture get a 404 unless
+    fallback is set, in which case a synthetic response is served. Use as a
+    context manager or call start/stop.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, host="127.0.0.1", port=0, seed=None,
+                 mode="synthetic", fixtures=None, upstream=DEFAULT_UPSTREAM, latency_scale=0.0, fallback=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown stand-in mode {mode!r}, expected one of {MODES}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.mode = mode
+        self.fixtures = fixtures if isinstance(fixtures, FixtureStore) else FixtureStore(fixtures or DEFAULT_FIXTURES_DIR)
+        self.upstream = upstream.rstrip("/")
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.recorded = 0
+        self.replayed = 0
+        self.replay_misses = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                status, payload = standin.respond(self.path, body, self.headers.get("Authorization"))
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def respond(self, path, body, authorization=None):
+        """Return (status, payload) for a request path and JSON body"""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        if self.mode == "record" and not failed:
+            time.sleep(delay)
+            return self._record(path, body, authorization)
+
+        fixture = None
+        if self.mode == "replay":
+            fixture = self.fixtures.get(path, body)
+            with self._lock:
+                if fixture is None:
+                    self.replay_misses += 1
+                else:
+                    self.replayed += 1
+            if fixture is not None:
+                delay += self.latency_scale * fixture.get("elapsed", 0.0)
+
+        time.sleep(delay)
+        if failed:
+            return ERROR_STATUS, {"error": {"code": 2099, "message": "Injected stand-in error"}}
+        if fixture is not None:
+            return fixture["status"], fixture["response"]
+        if self.mode == "replay" and not self.fallback:
+            return 404, {"error": {"code": 2099, "message": f"No recorded response for {path}"}}
+        return self._synthetic(path, body)
+
+    def _synthetic(self, path, body):
+        try:
+            if path.startswith("/v2/directions/"):
+                return 200, synthetic_directions(body)
+            if path.startswith("/v2/matrix/"):
+                return 200, synthetic_matrix(body)
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {"error": {"code": 2000, "message": f"Invalid request: {e}"}}
+        return 404, {"error": {"code": 2099, "message": f"Unsupported endpoint {path}"}}
+
+    def _record(self, path, body, authorization):
+        """Forward a request upstream and save successful responses"""
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                self.upstream + path,
+                json=body,
+                headers={"Authorization": authorization or "", "Content-Type": "application/json"},
+                timeout=60,
+            )
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Upstream request to {path} failed: {e}")
+            return 502, {"error": {"code": 2099, "message": f"Upstream request failed: {e}"}}
+        elapsed = time.perf_counter() - start
+
+        if response.status_code == 200:
+            self.fixtures.put(path, body, response.status_code, payload, elapsed)
+            with self._lock:
+                self.recorded += 1
+        return response.status_code, payload
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ors-standin", daemon=True)
+        self._thread.start()
+        logger.info(f"ORS stand-in ({self.mode}) listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "requests": self.requests,
+                "errors": self.errors,
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "replay_misses": self.replay_misses,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenRouteService stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--mode", choices=MODES, default="synthetic", help="How requests are answered")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixture store directory")
+    parser.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="ORS endpoint to record from")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds around the latency")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="Replay mode: also wait this multiple of the recorded upstream time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--fallback", action="store_true",
+                        help="Replay mode: answer unrecorded requests synthetically instead of with 404")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    standin = ORSStandIn(
+        args.latency, args.jitter, args.error_rate, args.host, args.port,
+        mode=args.mode, fixtures=args.fixtures, upstream=args.upstream,
+        latency_scale=args.latency_scale, fallback=args.fallback,
+    )
+    if args.mode == "replay":
+        logger.info(f"Replaying {len(standin.fixtures)} recorded responses from {args.fixtures}")
+    try:
+        standin.start()._thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+        logger.info(f"Stand-in stats: {standin.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+GPS probe ingestion
+Turns raw fleet GPS pings into hourly vehicle counts per registry location,
+in the bangalore_traffic.csv schema
+
+Each ping (timestamp, vehicle_id, lat, lon) is snapped to the nearest
+registry location within a radius through geo.LocationGrid, so matching a
+chunk of pings is a handful of array operations. Plain CSV ping files are
+split into byte ranges that worker processes parse and match independently;
+each returns the distinct (hour, location, vehicle) keys it saw, so
+VEHICLE_COUNT is the number of distinct vehicles seen at a location in an
+hour.
+
+Usage:
+    python probe_ingest.py pings/*.csv [--output probe_traffic.csv] [--radius 300] [--workers 8]
+    python probe_ingest.py --synthetic 5000000 pings.csv   Write synthetic pings first
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import datetime
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from geo import LocationGrid
+from location_registry import LOCATION_COORDINATES
+
+logger = logging.getLogger(__name__)
+
+PING_COLUMNS = ["timestamp", "vehicle_id", "lat", "lon"]
+OUTPUT_COLUMNS = ["DATE", "TIME", "LOCATION", "WEATHER", "VEHICLE_COUNT"]
+MATCH_RADIUS_M = 300
+CHUNK_BYTES = 64 * 1024 * 1024
+# Numeric timestamps are epoch seconds in UTC; hours are bucketed in local time (IST)
+UTC_OFFSET_MINUTES = 330
+# Trailing UTC offset of an ISO 8601 date-time ("Z", "+05:30", "-0400")
+UTC_OFFSET_PATTERN = r"(?:Z|[+-]\d{2}:?\d{2})$"
+DEFAULT_WEATHER = "Clear"
+
+# Distinct keys are (cell, vehicle): cell = hour index << LOCATION_BITS | location, vehicle = 64-bit id hash
+LOCATION_BITS = 12
+
+
+def hour_indexes(timestamps, utc_offset_minutes=UTC_OFFSET_MINUTES):
+    """Hours since the epoch in local time for epoch-second or date-time timestamps
+
+    Date-times with a UTC offset ("2025-05-01T03:00:00Z") are converted to
+    local time, like epoch seconds; date-times without one are taken to be
+    local already.
+    """
+    if pd.api.types.is_numeric_dtype(timestamps):
+        seconds = timestamps.to_numpy(dtype=np.int64) + utc_offset_minutes * 60
+        return seconds // 3600
+    try:
+        parsed = pd.to_datetime(timestamps, format="ISO8601")
+    except ValueError:
+        # Several offsets, or offsets mixed with local date-times
+        text = timestamps.astype(str)
+        aware = text.str.contains(UTC_OFFSET_PATTERN).to_numpy()
+        hours = np.empty(len(text), dtype=np.int64)
+        hours[aware] = _local_hours(pd.to_datetime(text[aware], format="ISO8601", utc=True), utc_offset_minutes)
+        hours[~aware] = _local_hours(pd.to_datetime(text[~aware], format="ISO8601"), utc_offset_minutes)
+        return hours
+    return _local_hours(parsed, utc_offset_minutes)
+
+
+def _local_hours(parsed, utc_offset_minutes):
+    if parsed.dt.tz is not None:
+        local = datetime.timezone(datetime.timedelta(minutes=utc_offset_minutes))
+        parsed = parsed.dt.tz_convert(local).dt.tz_localize(None)
+    return parsed.to_numpy(dtype="datetime64[h]").astype(np.int64)
+
+
+def distinct_keys(pings, grid, utc_offset_minutes=UTC_OFFSET_MINUTES):
+    """Distinct (cell, vehicle) keys of the pings that match a location"""
+    location = grid.match(pings["lat"].to_numpy(), pings["lon"].to_numpy())
+    keep = location >= 0
+    if not keep.any():
+        return _empty_keys()
+    hours = hour_indexes(pings["timestamp"][keep], utc_offset_minutes).astype(np.uint64)
+    return pd.DataFrame({
+        "cell": (hours << np.uint64(LOCATION_BITS)) | location[keep].astype(np.uint64),
+        "vehicle": pd.util.hash_array(pings["vehicle_id"].to_numpy()[keep]),
+    }).drop_duplicates()
+
+
+def _empty_keys():
+    return pd.DataFrame({"cell": np.empty(0, np.uint64), "vehicle": np.empty(0, np.uint64)})
+
+
+def _merge_keys(keys):
+    return pd.concat(keys, ignore_index=True).drop_duplicates() if keys else _empty_keys()
+
+
+def file_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """Header columns and newline-aligned (start, end) byte ranges of a CSV file"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        columns = f.readline().decode("utf-8").strip().split(",")
+        start = f.tell()
+        ranges = []
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return columns, ranges
+
+
+_grid = None
+
+
+def _init_worker(coords_map, radius_m):
+    global _grid
+    _grid = LocationGrid(coords_map, radius_m)
+
+
+def _ingest_part(path, columns, start, end, utc_offset_minutes):
+    """Distinct keys and ping count of one byte range (or a whole compressed file when start is None)"""
+    usecols = PING_COLUMNS
+    dtypes = {"vehicle_id": "str", "lat": "float64", "lon": "float64"}
+    if start is None:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=5_000_000)
+    else:
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        chunks = [pd.read_csv(io.BytesIO(data), header=None, names=columns, usecols=usecols, dtype=dtypes)]
+    keys, pings = [], 0
+    for chunk in chunks:
+        pings += len(chunk)
+        keys.append(distinct_keys(chunk, _grid, utc_offset_minutes))
+    return _merge_keys(keys), pings
+
+
+def ingest_pings(paths, coords_map=LOCATION_COORDINATES, radius_m=MATCH_RADIUS_M, workers=None,
+                 chunk_bytes=CHUNK_BYTES, utc_offset_minutes=UTC_OFFSET_MINUTES, weather=DEFAULT_WEATHER,
+                 weather_data=None):
+    """Hourly distinct-vehicle counts per location from GPS ping files
+
+    Ping files are CSVs with a header containing PING_COLUMNS. Plain files
+    are split into chunk_bytes ranges; compressed files are read whole by one
+    worker. weather_data (DATE, TIME, WEATHER records) sets each hour's
+    weather, falling back to weather. Returns a DataFrame with OUTPUT_COLUMNS.
+    """
+    if len(coords_map) >= 1 << LOCATION_BITS:
+        raise ValueError(f"At most {(1 << LOCATION_BITS) - 1} locations can be matched")
+    tasks = []
+    for path in paths:
+        if path.endswith((".gz", ".bz2", ".zip", ".xz", ".zst")):
+            tasks.append((path, None, None, None))
+        else:
+            columns, ranges = file_ranges(path, chunk_bytes)
+            missing = set(PING_COLUMNS) - set(columns)
+            if missing:
+                raise ValueError(f"{path} is missing ping columns: {sorted(missing)}")
+            tasks.extend((path, columns, start, end) for start, end in ranges)
+
+    keys, pings = [], 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(coords_map, radius_m)) as pool:
+        futures = [pool.submit(_ingest_part, path, columns, start, end, utc_offset_minutes)
+                   for path, columns, start, end in tasks]
+        for future in futures:
+            part_keys, part_pings = future.result()
+            keys.append(part_keys)
+            pings += part_pings
+    keys = _merge_keys(keys)
+
+    cells, counts = np.unique(keys["cell"].to_numpy(), return_counts=True)
+    hours = (cells >> np.uint64(LOCATION_BITS)).astype(np.int64)
+    locations = np.array(sorted(coords_map))[(cells & np.uint64((1 << LOCATION_BITS) - 1)).astype(np.int64)]
+    stamps = pd.to_datetime(hours, unit="h")
+    records = pd.DataFrame({
+        "DATE": stamps.strftime("%Y-%m-%d"),
+        "TIME": stamps.strftime("%H:00"),
+        "LOCATION": locations,
+        "WEATHER": weather,
+        "VEHICLE_COUNT": counts,
+    })
+    if weather_data is not None and len(records):
+        weather_hours = pd.DataFrame({
+            "DATE": weather_data["DATE"].astype(str),
+            "TIME": weather_data["TIME"].astype(str).str[:2] + ":00",
+            "HOURLY_WEATHER": weather_data["WEATHER"].astype(str),
+        }).drop_duplicates(["DATE", "TIME"], keep="last")
+        records = records.merge(weather_hours, on=["DATE", "TIME"], how="left")
+        records["WEATHER"] = records.pop("HOURLY_WEATHER").fillna(weather)
+    logger.info(f"Matched {pings} pings from {len(tasks)} parts into {len(records)} location-hours")
+    return records[OUTPUT_COLUMNS]
+
+
+def write_synthetic_pings(path, n, coords_map=LOCATION_COORDINATES, vehicles=20000, days=1, seed=0,
+                          start="2025-05-01"):
+    """Write n pings scattered around registry locations, for benchmarks"""
+    rng = np.random.default_rng(seed)
+    coords = np.array([coords_map[location] for location in sorted(coords_map)])
+    around = rng.integers(0, len(coords), n)
+    jitter = rng.normal(0, 0.003, (n, 2))
+    first = pd.Timestamp(start).timestamp() - UTC_OFFSET_MINUTES * 60
+    pings = pd.DataFrame({
+        "timestamp": (first + rng.integers(0, days * 86400, n)).astype(np.int64),
+        "vehicle_id": np.char.add("KA01-", rng.integers(0, vehicles, n).astype(str)),
+        "lat": (coords[around, 0] + jitter[:, 0]).round(6),
+        "lon": (coords[around, 1] + jitter[:, 1]).round(6),
+    })
+    pings.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate GPS pings into hourly vehicle counts per location")
+    parser.add_argument("pings", nargs="+", help="Ping CSV files (timestamp, vehicle_id, lat, lon)")
+    parser.add_argument("--output", default="probe_traffic.csv", help="CSV to write in the traffic data schema")
+    parser.add_argument("--append", action="store_true", help="Append to --output (e.g. bangalore_traffic.csv)")
+    parser.add_argument("--radius", type=float, default=MATCH_RADIUS_M, help="Match radius in metres")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024), help="Bytes per task in MB")
+    parser.add_argument("--utc-offset", type=int, default=UTC_OFFSET_MINUTES,
+                        help="Minutes added to epoch-second timestamps before bucketing into hours")
+    parser.add_argument("--weather", default=DEFAULT_WEATHER, help="Weather for hours without weather data")
+    parser.add_argument("--weather-data", default=None, help="CSV with DATE, TIME, WEATHER per hour")
+    parser.add_argument("--synthetic", type=int, default=0, help="First write this many synthetic pings to the file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.synthetic:
+        start = time.perf_counter()
+        write_synthetic_pings(args.pings[0], args.synthetic)
+        print(f"Wrote {args.synthetic} synthetic pings to {args.pings[0]} in {time.perf_counter() - start:.1f}s")
+
+    weather_data = pd.read_csv(args.weather_data) if args.weather_data else None
+    start = time.perf_counter()
+    records = ingest_pings(
+        args.pings, radius_m=args.radius, workers=args.workers, chunk_bytes=args.chunk_mb * 1024 * 1024,
+        utc_offset_minutes=args.utc_offset, weather=args.weather, weather_data=weather_data,
+    )
+    elapsed = time.perf_counter() - start
+    append = args.append and os.path.exists(args.output)
+    records.to_csv(args.output, mode="a" if append else "w", header=not append, index=False)
+    size_mb = sum(os.path.getsize(path) for path in args.pings) / 1e6
+    print(f"{len(records)} location-hours -> {args.output} in {elapsed:.1f}s ({size_mb / elapsed:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Rerun profiling
+Opt-in sampling profiler for a single Streamlit rerun, saved as collapsed
+stacks that flamegraph.pl, speedscope and inferno read directly
+
+Profiling is enabled for every rerun with the TRAFFIC_PROFILE environment
+variable. On a worker started with TRAFFIC_PROFILE_KEY, one session can be
+profiled by opening the app with ?profile=<label>&profile_key=<key>;
+without the key, ?profile is ignored, so visitors cannot fill the disk
+with profiles. Each profile is written to PROFILE_DIR as
+<time>-<label>.folded and listed with the inputs of the rerun in
+PROFILE_DIR/index.jsonl. Only the newest MAX_PROFILES are kept.
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import glob
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "TRAFFIC_PROFILE"
+PROFILE_KEY_ENV = "TRAFFIC_PROFILE_KEY"
+PROFILE_PARAM = "profile"
+PROFILE_KEY_PARAM = "profile_key"
+PROFILE_DIR = "profiles"
+MAX_PROFILES = 50
+SAMPLE_INTERVAL = 0.005
+# A rerun that is interrupted (st.stop, a newer rerun) never stops its profiler
+MAX_DURATION = 120
+
+
+def profile_label(query_params=None):
+    """Label for profiling this rerun, or None when profiling is off
+
+    Checks the TRAFFIC_PROFILE environment variable first, then the
+    ?profile= query parameter, which only counts when ?profile_key= matches
+    the TRAFFIC_PROFILE_KEY environment variable. An empty or "1" value
+    gives the label "rerun".
+    """
+    value = os.environ.get(PROFILE_ENV)
+    if value in (None, "", "0") and query_params is not None:
+        key = os.environ.get(PROFILE_KEY_ENV)
+        given = query_params.get(PROFILE_KEY_PARAM)
+        value = None
+        if key and given is not None and hmac.compare_digest(str(given), key):
+            value = query_params.get(PROFILE_PARAM)
+    if value in (None, "0"):
+        return None
+    return value if value not in ("", "1") else "rerun"
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread at a fixed interval
+
+    A background thread records the target thread's call stack every
+    interval seconds, so the profiled code runs unmodified and pandas or
+    folium time is attributed to the Python frame that called into it.
+    root_file trims the frames above the first frame from that file, so
+    stacks start at the script instead of the Streamlit runner.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, root_file=None, max_duration=MAX_DURATION):
+        self.interval = interval
+        self.root_file = os.path.abspath(root_file) if root_file else None
+        self.max_duration = max_duration
+        self.samples = Counter()
+        self.duration = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._ident = None
+        self._start = None
+
+    def start(self, thread_ident=None):
+        self._ident = thread_ident or threading.get_ident()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="rerun-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._start is not None:
+            self.duration = time.perf_counter() - self._start
+        return self
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._ident)
+            if frame is None or time.perf_counter() - self._start > self.max_duration:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            if self.root_file:
+                for i, code in enumerate(stack):
+                    if code.co_filename == self.root_file:
+                        stack = stack[i:]
+                        break
+            self.samples[tuple(stack)] += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def folded(self):
+        """Collapsed stacks, one "root;...;leaf count" line per distinct stack"""
+        lines = Counter()
+        for stack, count in self.samples.items():
+            lines[";".join(self._label(code) for code in stack)] += count
+        return [f"{stack} {count}" for stack, count in lines.most_common()]
+
+    def top_functions(self, n=15):
+        """Functions with the most samples on top of the stack (self) and anywhere on it (total)"""
+        total_samples = sum(self.samples.values())
+        if not total_samples:
+            return []
+        own, anywhere = Counter(), Counter()
+        for stack, count in self.samples.items():
+            own[self._label(stack[-1])] += count
+            for label in {self._label(code) for code in stack}:
+                anywhere[label] += count
+        ms_per_sample = self.duration * 1000 / total_samples
+        ranked = sorted(anywhere, key=lambda label: (-own[label], -anywhere[label]))[:n]
+        return [{
+            "function": label,
+            "self_ms": round(own[label] * ms_per_sample, 1),
+            "self_pct": round(100 * own[label] / total_samples, 1),
+            "total_ms": round(anywhere[label] * ms_per_sample, 1),
+            "total_pct": round(100 * anywhere[label] / total_samples, 1),
+        } for label in ranked]
+
+    def save(self, directory=PROFILE_DIR, label="rerun", tags=None, max_profiles=MAX_PROFILES):
+        """Write the collapsed stacks and index them with tags; returns the profile path
+
+        The oldest profiles beyond max_profiles are deleted along with
+        their index entries.
+        """
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-") or "rerun"
+        path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}.folded")
+        with open(path, "w") as f:
+            f.write("\n".join(self.folded()) + "\n")
+        entry = {
+            "file": os.path.basename(path),
+            "label": label,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.samples.values()),
+            "tags": tags or {},
+        }
+        with open(os.path.join(directory, "index.jsonl"), "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+        logger.info(f"Saved {entry['samples']} samples over {entry['duration_ms']:.0f} ms to {path}")
+        prune_profiles(directory, max_profiles)
+        return path
+
+
+def prune_profiles(directory=PROFILE_DIR, max_profiles=MAX_PROFILES):
+    """Delete all but the newest max_profiles profiles and drop their index entries"""
+    # File names start with the save time, so name order is age order
+    stale = sorted(glob.glob(os.path.join(glob.escape(directory), "*.folded")))[:-max(max_profiles, 1)]
+    if not stale:
+        return
+    for path in stale:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    removed = {os.path.basename(path) for path in stale}
+    index_path = os.path.join(directory, "index.jsonl")
+    try:
+        with open(index_path) as f:
+            lines = [line for line in f if line.strip() and json.loads(line).get("file") not in removed]
+    except FileNotFoundError:
+        return
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.writelines(lines)
+    os.replace(temp_path, index_path)
+    logger.info(f"Removed {len(stale)} old profiles from {directory}")
@@ -0,0 +1,196 @@
+"""
+Resilient route caching
+Stale-while-revalidate serving and a circuit breaker for OpenRouteService outages
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_cache import make_key
+
+logger = logging.getLogger(__name__)
+
+CacheResult = namedtuple("CacheResult", ["value", "age", "stale", "refreshing"])
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and no cached value exists"""
+
+
+class CircuitBreaker:
+    """Stop calling a failing service and probe periodically to recover
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused. Once recovery_timeout seconds have passed a single probe is
+    let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        """One of 'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and self._clock() - self._opened_at >= self.recovery_timeout:
+                self._state = "half_open"
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    logger.warning(f"Circuit breaker opened after {self._failures} failures")
+                self._state = "open"
+                self._opened_at = self._clock()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker, raising CircuitOpenError when open"""
+        if not self.allow_request():
+            raise CircuitOpenError("Service unavailable, circuit breaker is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+class StaleWhileRevalidateCache:
+    """Serve cached values immediately and refresh expired ones in the background
+
+    Fresh entries are returned as-is. Expired entries are still returned, with
+    a background refresh started if the breaker allows it. Only a miss waits
+    for the fetch, and at most fetch_timeout seconds; a fetch that overruns
+    keeps running and fills the cache for the next request. With a shared
+    backend, entries fetched by one worker are served by all of them.
+    """
+
+    def __init__(self, ttl, breaker=None, max_entries=1024, fetch_timeout=None,
+                 max_workers=4, backend=None, namespace="routes", clock=time.time):
+        self.ttl = ttl
+        self.breaker = breaker or CircuitBreaker()
+        self.backend = backend
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.fetch_timeout = fetch_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="route-refresh")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key, fetch, *args, **kwargs):
+        """Return a CacheResult for key, calling fetch(*args, **kwargs) when needed
+
+        Raises CircuitOpenError on a miss while the breaker is open, and
+        concurrent.futures.TimeoutError when a miss takes longer than fetch_timeout.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.backend is not None:
+            # Another worker may already have fetched it
+            entry = self.backend.get(make_key(self.namespace, key))
+            if entry is not None:
+                self._store(key, entry)
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = self._clock() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return CacheResult(value, age, False, False)
+            self.stale_hits += 1
+            refreshing = self._submit(key, fetch, args, kwargs) is not None
+            return CacheResult(value, age, True, refreshing)
+
+        self.misses += 1
+        future = self._submit(key, fetch, args, kwargs)
+        if future is None:
+            raise CircuitOpenError("Service unavailable, circuit breaker is open")
+        return CacheResult(future.result(timeout=self.fetch_timeout), 0.0, False, False)
+
+    def _submit(self, key, fetch, args, kwargs):
+        """Start (or join) a fetch for key; returns None if the breaker refuses"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if not self.breaker.allow_request():
+                return None
+            future = self._executor.submit(self._fetch, key, fetch, args, kwargs)
+            self._pending[key] = future
+        return future
+
+    def _fetch(self, key, fetch, args, kwargs):
+        try:
+            value = fetch(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"Error refreshing cached value: {e}")
+            raise
+        else:
+            self.breaker.record_success()
+            entry = (value, self._clock())
+            self._store(key, entry)
+            if self.backend is not None:
+                self.backend.set(make_key(self.namespace, key), entry)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Snapshot of cache and breaker counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "refreshing": len(self._pending),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "breaker": self.breaker.state,
+                "rejected": self.breaker.rejected,
+            }
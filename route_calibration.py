@@ -0,0 +1,332 @@
+"""
+Traffic-calibrated route durations
+Turns free-flow ORS durations into traffic-adjusted ones using slowdown
+multipliers calibrated on historical vehicle counts, the traffic model and
+driven trip times
+
+Each location/hour/weather gets the multiplier 1 + delay_factor *
+((1 - model_weight) * (count / busiest)^exponent + model_weight * p_high).
+The first term is the BPR volume-delay curve with the location's busiest
+hour and weather standing in for capacity; p_high is the model's
+probability of high traffic for the cell. The multipliers are precomputed
+into one [location, hour, weather] table.
+A route's factor is the length-weighted mean multiplier along its geometry,
+sampled every SAMPLE_SPACING_M and matched to locations within
+CORRIDOR_RADIUS_M; stretches away from every known location count as free
+flow.
+
+delay_factor, model_weight and exponent are fitted by least squares on
+route log rows that carry ACTUAL_COLUMN, the minutes the trip really took
+(filled in from fleet or probe trip times), against ORS's free-flow
+duration. With fewer than MIN_TRIPS such trips the defaults are used.
+The table is stamped with the data file and model it was calibrated for.
+
+Usage:
+    python route_calibration.py [--data bangalore_traffic.csv] [--model traffic_classifier.pkl]
+                                [--trips route_summaries.csv] [--output slowdown_table.npz]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import logging
+import time
+
+import joblib
+import numpy as np
+
+from congestion_layers import layers_version
+from eta_estimator import ROUTE_LOG_FILE, read_route_log
+from geo import KM_PER_DEGREE, LocationGrid
+from location_registry import LOCATION_COORDINATES
+from location_search import reconcile_coordinates
+from model_manager import artifact_version
+from probe_ingest import hour_indexes
+from traffic_frame import load_traffic_frame
+from traffic_scoring import DEFAULT_VEHICLE_COUNT, aggregate_vehicle_stats, predict_traffic_batch
+
+logger = logging.getLogger(__name__)
+
+SLOWDOWN_TABLE_FILE = "slowdown_table.npz"
+# Extra travel time share where a location is at its busiest
+DELAY_FACTOR = 0.5
+# BPR exponent: delay grows with the fourth power of the volume ratio
+SLOWDOWN_EXPONENT = 4
+# Share of the congestion level taken from the model's high-traffic probability
+MODEL_WEIGHT = 0.5
+SAMPLE_SPACING_M = 100
+CORRIDOR_RADIUS_M = 1000
+
+# Route log column with the minutes a trip actually took
+ACTUAL_COLUMN = "actual_min"
+# Below this many driven trips the default curve is used
+MIN_TRIPS = 20
+EXPONENT_GRID = np.arange(1.0, 8.5, 0.5)
+
+
+def congestion_inputs(vehicle_stats, model=None):
+    """Volume ratios and high-traffic probabilities indexed [location, hour, weather]
+
+    Mean counts follow the same fallbacks as VehicleStats.counts and are
+    divided by each location's busiest cell. Probabilities come from one
+    batched prediction on those counts, and are None without a model.
+    """
+    counts = vehicle_stats.location_hour_weather
+    counts = np.where(np.isnan(counts), vehicle_stats.location_hour[:, :, None], counts)
+    counts = np.where(np.isnan(counts), vehicle_stats.location[:, None, None], counts)
+    counts = np.where(np.isnan(counts), DEFAULT_VEHICLE_COUNT, counts)
+    ratios = counts / counts.max(axis=(1, 2), keepdims=True)
+    if model is None:
+        return ratios, None
+
+    # Row order is location, then hour, then weather
+    n_locations, n_weathers = counts.shape[0], counts.shape[2]
+    _, _, high_probabilities = predict_traffic_batch(
+        model,
+        np.repeat(vehicle_stats.locations, 24 * n_weathers),
+        np.tile(np.repeat(np.arange(24), n_weathers), n_locations),
+        np.tile(vehicle_stats.weathers, 24 * n_locations),
+        counts.ravel(),
+    )
+    return ratios, high_probabilities.reshape(counts.shape)
+
+
+def _congestion(ratios, probabilities, exponent, model_weight):
+    """Congestion level between 0 and 1 from volume ratios and high-traffic probabilities"""
+    volume = ratios ** exponent
+    if probabilities is None:
+        return volume
+    return (1 - model_weight) * volume + model_weight * probabilities
+
+
+def calibrate_slowdowns(vehicle_stats, model=None, delay_factor=DELAY_FACTOR, exponent=SLOWDOWN_EXPONENT,
+                        model_weight=MODEL_WEIGHT, inputs=None):
+    """Slowdown multipliers for every location, hour and weather
+
+    Without a model the multipliers follow the volume curve alone. inputs
+    reuses congestion_inputs already computed for vehicle_stats and model.
+    Returns a dict of arrays with multipliers indexed [location, hour,
+    weather].
+    """
+    ratios, probabilities = inputs or congestion_inputs(vehicle_stats, model)
+    if probabilities is None:
+        model_weight = 0.0
+    multipliers = 1 + delay_factor * _congestion(ratios, probabilities, exponent, model_weight)
+    return {
+        "locations": np.array(vehicle_stats.locations),
+        "weathers": np.array(vehicle_stats.weathers),
+        "multipliers": multipliers.astype(np.float32),
+        "delay_factor": np.float32(delay_factor),
+        "exponent": np.float32(exponent),
+        "model_weight": np.float32(model_weight),
+        "trips": np.int64(0),
+    }
+
+
+def _nonnegative_lstsq(X, y):
+    """Least-squares coefficients of y on the columns of X, each held at or above zero"""
+    best, best_error = np.zeros(X.shape[1]), float(y @ y)
+    for columns in ([list(range(X.shape[1]))] + [[c] for c in range(X.shape[1])]):
+        coefficients = np.zeros(X.shape[1])
+        coefficients[columns] = np.linalg.lstsq(X[:, columns], y, rcond=None)[0]
+        if (coefficients < 0).any():
+            continue
+        residuals = y - X @ coefficients
+        if residuals @ residuals < best_error:
+            best, best_error = coefficients, float(residuals @ residuals)
+    return best, best_error
+
+
+def fit_slowdowns(vehicle_stats, trips, model=None, coords_map=LOCATION_COORDINATES, min_trips=MIN_TRIPS,
+                  delay_factor=DELAY_FACTOR, exponent=SLOWDOWN_EXPONENT, model_weight=MODEL_WEIGHT,
+                  radius_m=CORRIDOR_RADIUS_M, spacing_m=SAMPLE_SPACING_M):
+    """Calibration table with the slowdown curve fitted on driven trips
+
+    trips are route log rows; those with ACTUAL_COLUMN are fitted as
+    actual / free-flow - 1 = a * volume^exponent + b * p_high along the
+    straight line between their endpoints at the hour they were fetched,
+    averaged over weathers (the log has no weather). a and b are
+    non-negative least-squares coefficients for each exponent in
+    EXPONENT_GRID, and the exponent with the smallest error wins, giving
+    delay_factor = a + b and model_weight = b / (a + b). Falls back to the
+    given parameters with fewer than min_trips usable trips.
+    """
+    inputs = congestion_inputs(vehicle_stats, model)
+    table = calibrate_slowdowns(vehicle_stats, model, delay_factor, exponent, model_weight, inputs)
+    if ACTUAL_COLUMN not in trips:
+        logger.info(f"No {ACTUAL_COLUMN} column in the route log, using the default slowdown curve")
+        return table
+    trips = trips.dropna(subset=["fetched_at", "from_lat", "from_lon", "to_lat", "to_lon", "duration_min",
+                                 ACTUAL_COLUMN])
+    trips = trips[(trips["duration_min"] > 0) & (trips[ACTUAL_COLUMN] > 0)]
+    if len(trips) < min_trips:
+        logger.info(f"Only {len(trips)} driven trips logged, using the default slowdown curve")
+        return table
+
+    calibrator = RouteCalibrator(table, coords_map, radius_m, spacing_m)
+    routes, rows, lengths = calibrator.samples(
+        trips[["from_lon", "from_lat", "to_lon", "to_lat"]].to_numpy(float).reshape(-1, 2, 2)
+    )
+    hours = (hour_indexes(trips["fetched_at"].astype(np.int64)) % 24)[routes]
+    matched = rows >= 0
+    totals = np.bincount(routes, lengths, minlength=len(trips))
+    totals[totals == 0] = 1
+
+    def along_trips(cells):
+        """Length-weighted mean of an all-weather cell value along each trip, zero off the corridor"""
+        values = np.where(matched, cells[np.maximum(rows, 0), hours].mean(axis=-1), 0.0)
+        return np.bincount(routes, lengths * values, minlength=len(trips)) / totals
+
+    ratios, probabilities = inputs
+    y = (trips[ACTUAL_COLUMN] / trips["duration_min"]).to_numpy(float) - 1
+    probability_column = [] if probabilities is None else [along_trips(probabilities)]
+    best = None
+    for candidate in EXPONENT_GRID:
+        X = np.column_stack([along_trips(ratios ** candidate)] + probability_column)
+        coefficients, error = _nonnegative_lstsq(X, y)
+        if best is None or error < best[2]:
+            best = (candidate, coefficients, error)
+    exponent, coefficients, error = best
+    delay_factor = float(coefficients.sum())
+    if probabilities is not None and delay_factor > 0:
+        model_weight = float(coefficients[1]) / delay_factor
+    logger.info(
+        f"Fitted slowdowns on {len(trips)} trips: delay factor {delay_factor:.2f}, exponent {exponent:g}, "
+        f"model weight {model_weight if probabilities is not None else 0:.2f} "
+        f"(RMS error {np.sqrt(error / len(trips)):.2f} of free-flow time)"
+    )
+    table = calibrate_slowdowns(vehicle_stats, model, delay_factor, exponent, model_weight, inputs)
+    table["trips"] = np.int64(len(trips))
+    return table
+
+
+def save_calibration(table, path=SLOWDOWN_TABLE_FILE, version=None):
+    """Write a calibration table as a compressed NumPy archive, stamped with version"""
+    if version is not None:
+        table = {**table, "version": np.array(version)}
+    np.savez_compressed(path, **table)
+
+
+def calibration_match(table, version):
+    """Whether a table was calibrated for this version (unstamped tables never match)"""
+    return "version" in table and str(table["version"]) == version
+
+
+def load_calibration(path=SLOWDOWN_TABLE_FILE):
+    """Load a calibration table written by save_calibration"""
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def _sample_routes(routes, spacing_km):
+    """Evenly spaced (lat, lon) samples along each route, with their route and length in km"""
+    starts, vectors, segment_routes = [], [], []
+    for number, coordinates in enumerate(routes):
+        points = np.asarray(coordinates, dtype=float).reshape(-1, 2)[:, ::-1]
+        if len(points) == 1:
+            points = np.repeat(points, 2, axis=0)
+        starts.append(points[:-1])
+        vectors.append(np.diff(points, axis=0))
+        segment_routes.append(np.full(len(points) - 1, number))
+    starts, vectors = np.concatenate(starts), np.concatenate(vectors)
+    segment_routes = np.concatenate(segment_routes)
+
+    lon_scale = np.cos(np.radians(starts[:, 0] + vectors[:, 0] / 2))
+    lengths = KM_PER_DEGREE * np.hypot(vectors[:, 0], vectors[:, 1] * lon_scale)
+    per_segment = np.maximum(np.ceil(lengths / spacing_km).astype(np.int64), 1)
+    segment = np.repeat(np.arange(len(starts)), per_segment)
+    position = np.arange(len(segment)) - np.repeat(np.cumsum(per_segment) - per_segment, per_segment)
+    fraction = (position + 0.5) / per_segment[segment]
+    samples = starts[segment] + fraction[:, None] * vectors[segment]
+    return samples[:, 0], samples[:, 1], segment_routes[segment], (lengths / per_segment)[segment]
+
+
+class RouteCalibrator:
+    """Traffic factors for route geometries from a calibration table"""
+
+    def __init__(self, table, coords_map=LOCATION_COORDINATES, radius_m=CORRIDOR_RADIUS_M,
+                 spacing_m=SAMPLE_SPACING_M):
+        self.table = table
+        self.spacing_km = spacing_m / 1000
+        self.weather_index = {name: i for i, name in enumerate(table["weathers"])}
+        locations = [str(location) for location in table["locations"]]
+        located = [i for i, location in enumerate(locations) if location in coords_map]
+        self.grid = LocationGrid({locations[i]: coords_map[locations[i]] for i in located}, radius_m)
+        # Table row of each grid location
+        self._rows = np.array([locations.index(location) for location in self.grid.locations], dtype=np.intp)
+
+    def multipliers(self, hour, weather):
+        """Multiplier per table location at hour in weather (the all-weather mean for unknown weather)"""
+        w = self.weather_index.get(weather)
+        by_weather = self.table["multipliers"][:, int(hour) % 24]
+        return by_weather[:, w] if w is not None else by_weather.mean(axis=1)
+
+    def samples(self, routes):
+        """Route, table row (-1 off every corridor) and length in km of samples along (lon, lat) lines"""
+        lat, lon, sample_routes, lengths = _sample_routes(routes, self.spacing_km)
+        matched = self.grid.match(lat, lon)
+        return sample_routes, np.where(matched >= 0, self._rows[matched], -1), lengths
+
+    def route_factors(self, features, hour, weather):
+        """Travel-time factor of each GeoJSON route feature when driven at hour in weather"""
+        if not features:
+            return np.ones(0)
+        routes, rows, lengths = self.samples([feature["geometry"]["coordinates"] for feature in features])
+        factors = np.where(rows >= 0, self.multipliers(hour, weather)[rows], 1.0)
+        totals = np.bincount(routes, lengths, minlength=len(features))
+        weighted = np.bincount(routes, lengths * factors, minlength=len(features))
+        return np.where(totals > 0, weighted / np.where(totals > 0, totals, 1), 1.0)
+
+    def adjust(self, features, hour, weather):
+        """(free-flow minutes, traffic-adjusted minutes) for each route feature"""
+        free_flow = np.array([feature["properties"]["summary"]["duration"] / 60 for feature in features])
+        return free_flow, free_flow * self.route_factors(features, hour, weather)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate route slowdown multipliers on traffic history")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV to calibrate on")
+    parser.add_argument("--model", default="traffic_classifier.pkl", help="Classifier artifact")
+    parser.add_argument("--trips", default=ROUTE_LOG_FILE,
+                        help=f"Route log whose {ACTUAL_COLUMN} trip times the curve is fitted on")
+    parser.add_argument("--output", default=SLOWDOWN_TABLE_FILE, help="Where to write the table")
+    parser.add_argument("--delay-factor", type=float, default=DELAY_FACTOR,
+                        help="Extra travel time share at certain congestion, when not fitted")
+    parser.add_argument("--exponent", type=float, default=SLOWDOWN_EXPONENT,
+                        help="Volume-delay exponent, when not fitted")
+    parser.add_argument("--model-weight", type=float, default=MODEL_WEIGHT,
+                        help="Share of congestion taken from the model, when not fitted")
+    parser.add_argument("--no-fit", action="store_true", help="Use the given parameters instead of fitting them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    vehicle_stats = aggregate_vehicle_stats(load_traffic_frame(args.data))
+    model = joblib.load(args.model)
+    params = dict(delay_factor=args.delay_factor, exponent=args.exponent, model_weight=args.model_weight)
+    if args.no_fit:
+        table = calibrate_slowdowns(vehicle_stats, model, **params)
+    else:
+        # Same reconciled coordinates the engine fits with
+        coords_map = reconcile_coordinates(tuple(vehicle_stats.locations), LOCATION_COORDINATES)
+        table = fit_slowdowns(vehicle_stats, read_route_log(args.trips), model, coords_map, **params)
+    save_calibration(table, args.output, layers_version(args.data, artifact_version(args.model)))
+    multipliers = table["multipliers"]
+    logger.info(
+        f"Calibrated {multipliers.size} location/hour/weather cells in {time.perf_counter() - start:.1f}s "
+        f"-> {args.output}"
+    )
+    print(f"delay factor {table['delay_factor']:.2f}, exponent {table['exponent']:g}, "
+          f"model weight {table['model_weight']:.2f} ({int(table['trips'])} trips fitted)")
+
+    print(f"{'hour':>4} " + " ".join(f"{weather:>7}" for weather in table["weathers"]))
+    for hour in range(0, 24, 3):
+        print(f"{hour:>4} " + " ".join(f"{factor:>7.2f}" for factor in multipliers[:, hour].mean(axis=0)))
+    busiest = np.unravel_index(multipliers.argmax(), multipliers.shape)
+    print(f"Slowest cell: {table['locations'][busiest[0]]} at {busiest[1]:02d}:00 in "
+          f"{table['weathers'][busiest[2]]} weather, x{multipliers.max():.2f}")
+
+
+if __name__ == "__main__":
+    main()
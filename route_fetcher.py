@@ -1,16 +1,87 @@
+"""
+Route fetcher
+Fetches routes from OpenRouteService (or the endpoint in ORS_BASE_URL) and
+prints their summaries. Run against ors_standin.py in record mode to capture
+fixtures for offline replay.
+
+Usage:
+    python route_fetcher.py [--from "Brigade Road"] [--to "Byappanahalli Main Road"]
+    python route_fetcher.py --pairs 50 [--seed 1]   Fetch routes for random location pairs
+    python route_fetcher.py --pairs 50 --max-minutes 30   Fetch the 50 nearest pairs by estimated ETA
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import random
+
+import numpy as np
 import openrouteservice
-from openrouteservice import convert
 
-api_key = "5b3ce3597851110001cf624814b4a4ce25c54048af11a14163f28d54"
-client = openrouteservice.Client(key=api_key)
+import config
+from eta_estimator import ROUTE_LOG_FILE, EtaEstimator, log_route
+from location_registry import LOCATION_COORDINATES
+
+ORS_BASE_URL = getattr(config, "ORS_BASE_URL", "https://api.openrouteservice.org")
+ROUTE_LOG_FILE = getattr(config, "ROUTE_LOG_FILE", ROUTE_LOG_FILE)
+
+
+def fetch_route(client, from_location, to_location):
+    """Request alternative routes between two registry locations"""
+    return client.directions(
+        coordinates=[LOCATION_COORDINATES[from_location][::-1], LOCATION_COORDINATES[to_location][::-1]],
+        profile='driving-car',
+        format='geojson',
+        validate=True,
+        alternative_routes={"share_factor": 0.5, "target_count": 3},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch routes between Bangalore locations")
+    parser.add_argument("--from", dest="from_location", default="Brigade Road", help="Start location")
+    parser.add_argument("--to", dest="to_location", default="Byappanahalli Main Road", help="Destination")
+    parser.add_argument("--pairs", type=int, default=0, help="Fetch this many random location pairs instead")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the random pairs")
+    parser.add_argument("--max-minutes", type=float, default=None,
+                        help="With --pairs, rank every pair by estimated ETA and fetch the nearest ones within this limit")
+    parser.add_argument("--log", action="store_true", help="Append fetched routes to the ETA estimator's route log")
+    args = parser.parse_args()
+
+    client = openrouteservice.Client(key=config.ORS_API_KEY, base_url=ORS_BASE_URL)
+    estimator = EtaEstimator.from_log(ROUTE_LOG_FILE)
+    locations = sorted(LOCATION_COORDINATES)
+    if args.pairs and args.max_minutes is not None:
+        # Spend ORS quota on the pairs most likely to matter, without calling ORS to find them
+        origins, destinations = np.nonzero(~np.eye(len(locations), dtype=bool))
+        coords = np.array([LOCATION_COORDINATES[location] for location in locations])
+        order, etas = estimator.rank_pairs(coords[origins], coords[destinations], max_minutes=args.max_minutes)
+        order = order[:args.pairs]
+        pairs = [(locations[origins[i]], locations[destinations[i]]) for i in order]
+        print(f"{len(etas)} of {len(origins)} pairs estimated within {args.max_minutes:.0f} min, fetching {len(pairs)}")
+    elif args.pairs:
+        rng = random.Random(args.seed)
+        pairs = [tuple(rng.sample(locations, 2)) for _ in range(args.pairs)]
+    else:
+        pairs = [(args.from_location, args.to_location)]
 
-start_coords = (77.6045, 12.9754)  # (lon, lat)
-end_coords = (77.6392, 12.9784)    # (lon, lat)
+    for from_location, to_location in pairs:
+        from_coords, to_coords = LOCATION_COORDINATES[from_location], LOCATION_COORDINATES[to_location]
+        eta, low, high = estimator.estimate_one(from_coords, to_coords)
+        try:
+            route = fetch_route(client, from_location, to_location)
+        except Exception as e:
+            print(f"{from_location} -> {to_location}: failed ({e})")
+            continue
+        if args.log:
+            log_route(from_coords[::-1], to_coords[::-1], route, ROUTE_LOG_FILE)
+        summaries = [feature['properties']['summary'] for feature in route['features']]
+        options = ", ".join(
+            f"{summary['distance'] / 1000:.1f} km / {summary['duration'] / 60:.0f} min" for summary in summaries
+        )
+        print(f"{from_location} -> {to_location}: {options} (estimated {eta:.0f} min, {low:.0f}-{high:.0f})")
 
-route = client.directions(
-    coordinates=[start_coords, end_coords],
-    profile='driving-car',
-    format='geojson'
-)
 
-print(route)
+if __name__ == "__main__":
+    main()
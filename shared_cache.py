@@ -0,0 +1,242 @@
+"""
+Shared cache backends
+Cross-process caching for route responses, predictions and aggregated statistics
+
+Backends are chosen by URL:
+    memory://                    In-process only (local stand-in, no sharing)
+    sqlite:///traffic_cache.db   SQLite file shared by every worker on the host
+    redis://localhost:6379/0     Redis or any Redis-compatible server (needs `redis`)
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def make_key(namespace, *parts):
+    """Build a stable string key from a namespace and hashable parts"""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def file_version(path):
+    """Version tag for a file that changes whenever the file does"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+class CacheBackend:
+    """Common interface; get returns None on a miss
+
+    Backend errors are logged and treated as misses so a cache outage never
+    breaks a request.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            value = self._get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Cache read failed for {key}: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        try:
+            self._set(key, value, ttl)
+            self.sets += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Cache write failed for {key}: {e}")
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "errors": self.errors,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with TTLs, used when no shared backend is configured"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file shared by all processes on one host
+
+    Uses WAL mode so readers never block the writer. Each write is a single
+    upsert in its own transaction, so readers see either the old or the new
+    value. Expired rows, then the oldest rows above max_entries, are evicted
+    every evict_every writes.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, evict_every=100, timeout=5.0):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def _set(self, key, value, ttl):
+        payload = sqlite3.Binary(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now + ttl if ttl else None),
+            )
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the oldest ones above max_entries"""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            connection.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        stats = super().stats()
+        try:
+            stats["entries"] = self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except Exception:
+            stats["entries"] = None
+        return stats
+
+
+class RedisCache(CacheBackend):
+    """Cache stored in Redis or any server speaking the Redis protocol
+
+    Eviction beyond TTLs is left to the server's maxmemory policy
+    (allkeys-lru is recommended).
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for redis:// cache URLs (pip install redis)") from e
+        self._client = redis.Redis.from_url(url)
+
+    def _get(self, key):
+        payload = self._client.get(key)
+        return None if payload is None else pickle.loads(payload)
+
+    def _set(self, key, value, ttl):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._client.set(key, payload, ex=int(ttl) if ttl else None)
+
+
+def create_cache_backend(url="memory://", max_entries=DEFAULT_MAX_ENTRIES):
+    """Create a cache backend from a URL, falling back to memory on errors"""
+    try:
+        if url.startswith("sqlite:///"):
+            return SQLiteCache(url[len("sqlite:///"):], max_entries=max_entries)
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            return RedisCache(url)
+        if url != "memory://":
+            logger.warning(f"Unknown cache backend URL {url!r}, using in-process cache")
+    except Exception as e:
+        logger.error(f"Could not open cache backend {url!r}, using in-process cache: {e}")
+    return MemoryCache(max_entries=max_entries)
@@ -0,0 +1,251 @@
+"""
+Shared-memory vehicle statistics
+Publishes aggregated statistics and location coordinates once per host so
+worker processes attach to them zero-copy instead of re-reading the CSV
+
+Usage:
+    python shared_stats.py --publish   Build and publish statistics for the current data file
+    python shared_stats.py --clear     Remove published segments and manifests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from location_registry import LOCATION_COORDINATES
+from shared_cache import file_version
+from traffic_frame import load_traffic_frame
+from traffic_scoring import VehicleStats, aggregate_vehicle_stats
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PREFIX = "traffic_stats"
+
+
+class SharedVehicleStats(VehicleStats):
+    """VehicleStats whose arrays live in shared memory segments
+
+    attached is True when the arrays were published by another process.
+    coords holds (lat, lon) per location, NaN where the registry has none.
+    """
+
+    def __init__(self, manifest, segments, arrays, attached):
+        super().__init__(
+            manifest["locations"],
+            manifest["weathers"],
+            arrays["location_hour_weather"],
+            arrays["location_hour"],
+            arrays["location"],
+            arrays["location_hour_weather_quantiles"],
+            arrays["location_hour_quantiles"],
+            arrays["location_quantiles"],
+        )
+        self.coords = arrays["coords"]
+        self.version = manifest["version"]
+        self.attached = attached
+        self._segments = segments
+
+    def __reduce__(self):
+        # Pickling copies the arrays into a plain VehicleStats
+        return VehicleStats, (self.locations, self.weathers, *[np.array(a) for a in self.arrays().values()])
+
+    def close(self):
+        """Release this process's mapping of the segments"""
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+
+# Python < 3.13 has no track flag, so the resource tracker must be told
+# about our segments by hand on POSIX
+_MANUAL_TRACKING = sys.version_info < (3, 13) and os.name == "posix"
+
+
+def _open_segment(name, create=False, size=0):
+    """Open a segment that outlives the process that created it"""
+    if not _MANUAL_TRACKING:
+        try:
+            return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+        except TypeError:
+            return shared_memory.SharedMemory(name=name, create=create, size=size)
+    # Stop the tracker from unlinking the segment when this process exits
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def manifest_path(data_path, directory=None):
+    """Manifest location for the current version of a data file"""
+    directory = directory or tempfile.gettempdir()
+    path_digest = hashlib.sha1(os.path.abspath(data_path).encode("utf-8")).hexdigest()[:8]
+    version_digest = hashlib.sha1(file_version(data_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(directory, f"{MANIFEST_PREFIX}_{path_digest}_{version_digest}.json")
+
+
+def build_stats_arrays(vehicle_stats, coords_map=LOCATION_COORDINATES):
+    """Collect the arrays to publish, adding coordinates aligned to the locations"""
+    coords = np.full((len(vehicle_stats.locations), 2), np.nan)
+    for i, location in enumerate(vehicle_stats.locations):
+        if location in coords_map:
+            coords[i] = coords_map[location]
+    arrays = {name: np.ascontiguousarray(array, dtype=np.float64) for name, array in vehicle_stats.arrays().items()}
+    arrays["coords"] = coords
+    return arrays
+
+
+def publish(vehicle_stats, path, version, coords_map=LOCATION_COORDINATES):
+    """Copy statistics into shared memory and publish a manifest at path
+
+    If another process published first, its segments are used and ours are
+    discarded. Returns a SharedVehicleStats backed by the published segments.
+    """
+    arrays = build_stats_arrays(vehicle_stats, coords_map)
+    tag = hashlib.sha1(f"{path}:{os.getpid()}".encode("utf-8")).hexdigest()[:10]
+    segments, entries = [], {}
+    for i, (name, array) in enumerate(arrays.items()):
+        segment = _open_segment(f"ts_{tag}_{i}", create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        entries[name] = {"segment": segment.name, "shape": list(array.shape), "dtype": array.dtype.str}
+
+    manifest = {
+        "version": version,
+        "locations": vehicle_stats.locations,
+        "weathers": vehicle_stats.weathers,
+        "arrays": entries,
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    try:
+        # Linking is atomic and fails if the manifest already exists
+        os.link(temp_path, path)
+    except FileExistsError:
+        logger.info("Statistics already published by another worker, attaching")
+        _discard(segments)
+        return attach(path)
+    finally:
+        os.remove(temp_path)
+
+    # Attach before closing our handles so the segments always have an owner
+    # (Windows frees a segment as soon as no handle to it is open)
+    published = attach(path, attached=False)
+    for segment in segments:
+        segment.close()
+    logger.info(f"Published vehicle statistics to shared memory ({sum(a.nbytes for a in arrays.values())} bytes)")
+    return published
+
+
+def attach(path, attached=True):
+    """Map published statistics without copying; read-only views"""
+    with open(path) as f:
+        manifest = json.load(f)
+    segments, arrays = [], {}
+    try:
+        for name, entry in manifest["arrays"].items():
+            segment = _open_segment(entry["segment"])
+            segments.append(segment)
+            array = np.ndarray(tuple(entry["shape"]), np.dtype(entry["dtype"]), buffer=segment.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+    except Exception:
+        for segment in segments:
+            segment.close()
+        raise
+    return SharedVehicleStats(manifest, segments, arrays, attached)
+
+
+def load_shared_stats(data_path="bangalore_traffic.csv", directory=None, traffic_loader=None,
+                      coords_map=LOCATION_COORDINATES):
+    """Attach to published statistics for data_path, building them if needed
+
+    Only the first worker on a host reads the CSV (via traffic_loader, which
+    defaults to load_traffic_frame); later workers just map the segments.
+    """
+    path = manifest_path(data_path, directory)
+    if os.path.exists(path):
+        try:
+            return attach(path)
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            # Segments are gone (e.g. host reboot) or the manifest is damaged
+            logger.warning(f"Discarding stale statistics manifest {path}: {e}")
+            _remove(path)
+
+    traffic_data = (traffic_loader or load_traffic_frame)(data_path)
+    vehicle_stats = aggregate_vehicle_stats(traffic_data)
+    clear(data_path, directory, keep=path)
+    return publish(vehicle_stats, path, file_version(data_path), coords_map)
+
+
+def clear(data_path="bangalore_traffic.csv", directory=None, keep=None):
+    """Unlink published segments and manifests for data_path, except keep
+
+    Processes that are still attached keep their mappings until they exit.
+    """
+    pattern = manifest_path(data_path, directory).rsplit("_", 1)[0] + "_*.json"
+    for path in glob.glob(pattern):
+        if path == keep:
+            continue
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            for entry in manifest["arrays"].values():
+                try:
+                    _discard([_open_segment(entry["segment"])])
+                except FileNotFoundError:
+                    pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read statistics manifest {path}: {e}")
+        _remove(path)
+
+
+def _discard(segments):
+    for segment in segments:
+        segment.close()
+        if _MANUAL_TRACKING:
+            # unlink() unregisters the segment, so re-register it first
+            resource_tracker.register(segment._name, "shared_memory")
+        segment.unlink()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish vehicle statistics to shared memory")
+    parser.add_argument("--data", default="bangalore_traffic.csv", help="Traffic CSV to aggregate")
+    parser.add_argument("--dir", default=None, help="Manifest directory (default: system temp dir)")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--publish", action="store_true", help="Build and publish statistics")
+    action.add_argument("--clear", action="store_true", help="Remove published statistics")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.clear:
+        clear(args.data, args.dir)
+        logger.info("Cleared published statistics")
+    else:
+        stats = load_shared_stats(args.data, args.dir)
+        logger.info(
+            f"Statistics for {len(stats.locations)} locations available at {manifest_path(args.data, args.dir)}"
+        )
+        stats.close()
+
+
+if __name__ == "__main__":
+    main()
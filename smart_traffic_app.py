@@ -8,21 +8,44 @@ Version: 2.0
 
 import streamlit as st
 import pandas as pd
-import joblib
-import openrouteservice
+import numpy as np
 import folium
+from folium.plugins import HeatMap, MarkerCluster
 from streamlit_folium import st_folium
-from config import ORS_API_KEY
+import config
 from openrouteservice.exceptions import ApiError
 import logging
 import time
 from datetime import datetime
 import plotly.graph_objects as go
+from traffic_frame import memory_report
+from congestion_layers import heatmap_layer
+from isochrones import congestion_factors, isochrone_layer, reachable_minutes
+from location_search import reconcile
+from traffic_scoring import WEATHER_OPTIONS, predict_traffic_batch
+from single_flight import route_flight
+from traffic_engine import (
+    ANOMALY_REPLAY_DAYS,
+    CONGESTION_DELAY_FACTOR,
+    FORECAST_HISTORY_DAYS,
+    WARMUP_ROUTE_PAIRS,
+    get_engine,
+    model_locations,
+)
+from profiling import MAX_PROFILES, PROFILE_DIR, SamplingProfiler, profile_label
+from warmup import WARMUP_PARAM, warmup_requested
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Optional settings (see config_template.py), with defaults for older config files
+LOCATION_SEARCH_RESULTS = getattr(config, "LOCATION_SEARCH_RESULTS", 20)
+FORECAST_HORIZON = getattr(config, "FORECAST_HORIZON", 6)
+PROFILE_DIR = getattr(config, "PROFILE_DIR", PROFILE_DIR)
+PROFILE_TOP_N = getattr(config, "PROFILE_TOP_N", 15)
+PROFILE_MAX_FILES = getattr(config, "PROFILE_MAX_FILES", MAX_PROFILES)
+
 # Page configuration
 st.set_page_config(
     page_title="Smart Traffic Management System",
@@ -31,6 +54,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling of this rerun (TRAFFIC_PROFILE=1, or ?profile=<label>&profile_key=<TRAFFIC_PROFILE_KEY>)
+profiler = None
+profile_name = profile_label(st.query_params)
+if profile_name is not None:
+    # A rerun cut short by st.stop or a newer rerun leaves its profiler running
+    previous = st.session_state.get("_profiler")
+    if previous is not None and previous.running:
+        previous.stop()
+    profiler = SamplingProfiler(root_file=__file__).start()
+    st.session_state["_profiler"] = profiler
+
 # Custom CSS for professional styling
 st.markdown("""
 <style>
@@ -59,175 +93,35 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load and cache data for better performance"""
-    try:
-        traffic_data = pd.read_csv("bangalore_traffic.csv")
-        logger.info(f"Loaded traffic data with {len(traffic_data)} records")
-        return traffic_data
-    except Exception as e:
-        logger.error(f"Error loading traffic data: {e}")
-        st.error("Failed to load traffic data. Please check if the file exists.")
-        return None
-
-@st.cache_resource
-def load_model():
-    """Load and cache ML model"""
-    try:
-        model = joblib.load("traffic_classifier.pkl")
-        logger.info("ML model loaded successfully")
-        return model
-    except Exception as e:
-        logger.error(f"Error loading model: {e}")
-        st.error("Failed to load ML model. Please check if the file exists.")
-        return None
-
-@st.cache_data
-def get_location_coordinates():
-    """Return comprehensive location coordinates for Bangalore"""
-    return {
-        "1st Main Road": (12.9784, 77.5994),
-        "2nd Cross": (12.9352, 77.6245),
-        "2nd Cross Road": (12.9628, 77.6447),
-        "2nd Main Road": (12.9863, 77.6189),
-        "3rd Cross": (12.9256, 77.6693),
-        "4th Cross": (12.9087, 77.6014),
-        "Albert Victor Road": (12.9663, 77.5967),
-        "Ali Asker Road": (12.9945, 77.5861),
-        "Annaswamy Mudaliar Road": (12.9665, 77.5942),
-        "Artillery Road": (12.9759, 77.6158),
-        "Assayyee Road - Annaswamy Mudaliar Road": (12.9653, 77.5951),
-        "Atturu-Ananthapura Road": (12.9001, 77.5623),
-        "Avenue Road": (12.9732, 77.5816),
-        "BTM Layout": (12.9162, 77.6101),
-        "Banasawadi-Ramamurthynagar Road": (13.0139, 77.6612),
-        "Bangalore University Road": (13.0344, 77.5652),
-        "Bannerghatta Road": (12.8913, 77.5979),
-        "Bazaar Street": (12.9675, 77.5783),
-        "Bedarahalli-Ullalu Road": (12.8614, 77.5337),
-        "Begur Main Road": (12.8581, 77.6412),
-        "Bellary Road": (13.0068, 77.5893),
-        "Brigade Road": (12.9754, 77.6045),
-        "Brunton Road": (12.9761, 77.6073),
-        "Byappanahalli Main Road": (12.9782, 77.6385),
-        "Campbell Road": (12.9892, 77.5819),
-        "Castle Street": (12.9738, 77.5967),
-        "Central Street": (12.9739, 77.6112),
-        "Chamarajpet - Sarjapur Road": (12.9541, 77.5653),
-        "Church Street": (12.9723, 77.6118),
-        "City Bus Road": (12.9779, 77.5716),
-        "Cleveland Road": (12.9726, 77.6089),
-        "Commercial Street": (12.9771, 77.6105),
-        "Commissariat Road": (12.9738, 77.6115),
-        "Convent Road": (12.9712, 77.6062),
-        "Crescent Road": (12.9881, 77.5931),
-        "Cubbon Road": (12.9765, 77.5947),
-        "Cunningham Road": (12.9789, 77.6022),
-        "Devanga Hostel Road": (12.9628, 77.5791),
-        "Diagonal Road": (12.9762, 77.5923),
-        "Dickenson Road": (12.9715, 77.6221),
-        "Double Road": (12.9632, 77.5841),
-        "Dr.Rajkumar Road": (12.9981, 77.5521),
-        "Electronic City": (12.8452, 77.6604),
-        "Electronic City Phase 1": (12.8456, 77.6643),
-        "Haines Road": (12.9584, 77.6037),
-        "Hennur Main Road": (13.0415, 77.6213),
-        "Hosur Road": (12.9169, 77.6298),
-        "Indiranagar 100 Feet Road": (12.9784, 77.6392),
-        "Infantry Road": (12.9812, 77.5998),
-        "Jayachamaraja Wodeyar Road": (12.9738, 77.5876),
-        "Kasturba Road": (12.9746, 77.5932),
-        "Koramangala 5th Block": (12.9345, 77.6232),
-        "Koramangala - Indiranagar Road": (12.9654, 77.6287),
-        "Langford Road": (12.9574, 77.5978),
-        "Lavelle Road": (12.9709, 77.6012),
-        "Mahatma Gandhi Road": (12.9765, 77.6045),
-        "Marathahalli": (12.9592, 77.6974),
-        "Mysore Road": (12.9563, 77.5132),
-        "Old Madras Road": (12.9987, 77.6789),
-        "Outer Ring Road": (12.9345, 77.6891),
-        "Palace Road": (12.9987, 77.5921),
-        "Prime Street": (12.9721, 77.6045),
-        "Race Course Road": (12.9843, 77.5987),
-        "Rajaram Mohan Roy Road": (12.9632, 77.5789),
-        "Residency Road": (12.9712, 77.6012),
-        "Richmond Road": (12.9612, 77.6012),
-        "Sarjapura Road": (12.9012, 77.6891),
-        "Silk Board": (12.9172, 77.6237),
-        "Sri Rama Temple Street": (12.9432, 77.5678),
-        "Vidyaranyapura Road": (13.0789, 77.5432),
-        "Whitefield": (12.9698, 77.7499),
-        "Whitefield Main Road": (12.9784, 77.7321),
-        "Hebbal": (13.0358, 77.5970),
-        "Majestic": (12.9763, 77.5715)
-    }
-
-def get_vehicle_count(location, hour, weather, traffic_data):
-    """Calculate estimated vehicle count based on historical data"""
-    try:
-        filter_conditions = [
-            (traffic_data["LOCATION"] == location) &
-            (pd.to_datetime(traffic_data["TIME"], format="%H:%M").dt.hour == hour) &
-            (traffic_data["WEATHER"] == weather),
-            
-            (traffic_data["LOCATION"] == location) &
-            (pd.to_datetime(traffic_data["TIME"], format="%H:%M").dt.hour == hour),
-            
-            (traffic_data["LOCATION"] == location)
-        ]
-
-        vehicle_count = 75  # Default fallback value
-
-        for condition in filter_conditions:
-            filtered = traffic_data[condition]
-            if not filtered.empty:
-                vehicle_count = int(filtered["VEHICLE_COUNT"].mean())
-                break
-                
-        return vehicle_count
-    except Exception as e:
-        logger.error(f"Error calculating vehicle count: {e}")
-        return 75
-
-def predict_traffic(model, location, hour, weather, vehicle_count):
-    """Predict traffic conditions using ML model"""
-    try:
-        input_data = pd.DataFrame(columns=model.feature_names_in_)
-        input_data.loc[0] = 0
-        input_data.at[0, "HOUR"] = hour
-        input_data.at[0, "VEHICLE_COUNT"] = vehicle_count
-
-        weather_col = f"WEATHER_{weather}"
-        location_col = f"LOCATION_{location}"
-        
-        if weather_col in input_data.columns:
-            input_data.at[0, weather_col] = 1
-        if location_col in input_data.columns:
-            input_data.at[0, location_col] = 1
-
-        prediction = model.predict(input_data)[0]
-        confidence = model.predict_proba(input_data)[0].max()
-        
-        return prediction, confidence
-    except Exception as e:
-        logger.error(f"Error predicting traffic: {e}")
-        return 1, 0.5
-
-def create_route_map(from_location, to_location, coords_map):
-    """Create interactive route map with multiple route options"""
+# Data, model, caches and routing shared by every session and frontend in this process
+engine = get_engine()
+
+def location_options(query, locations):
+    """Selectbox options ranked by a fuzzy search, or every location without a query"""
+    if not query.strip():
+        return locations
+    matches = engine.location_index(tuple(locations)).search(query, limit=LOCATION_SEARCH_RESULTS)
+    return [match.name for match in matches] or locations
+
+@st.cache_data(show_spinner=False)
+def sweep_departure_hours(_model, model_version, from_location, to_location, weather,
+                          route_minutes=None, percentile=None):
+    """Departure sweep, memoized per process on top of the engine's shared cache"""
+    return engine.sweep_departure_hours(
+        _model, model_version, from_location, to_location, weather, route_minutes, percentile
+    )
+
+def create_route_map(from_location, to_location, coords_map, routes, hour, weather):
+    """Create interactive route map with multiple route options
+
+    routes is the Future returned by start_route_fetch. Durations are
+    adjusted for the traffic expected at hour in weather. Returns the map,
+    route details, best route and a freshness dict (age in seconds, stale,
+    refreshing) describing the cached routes.
+    """
     try:
-        client = openrouteservice.Client(key=ORS_API_KEY)
-        from_coords = coords_map[from_location][::-1]
-        to_coords = coords_map[to_location][::-1]
-
-        route = client.directions(
-            coordinates=[from_coords, to_coords],
-            profile='driving-car',
-            format='geojson',
-            validate=True,
-            alternative_routes={"share_factor": 0.5, "target_count": 3},
-        )
+        route_result = routes.result()
+        route = route_result.value
 
         midpoint = [
             (coords_map[from_location][0] + coords_map[to_location][0])/2,
@@ -237,13 +131,15 @@ def create_route_map(from_location, to_location, coords_map):
         m = folium.Map(location=midpoint, zoom_start=13, tiles='OpenStreetMap')
         colors = ['blue', 'green', 'purple']
         route_details = []
+        free_flow, durations = engine.route_durations(route, hour, weather)
         
         for i, feature in enumerate(route['features']):
             summary = feature['properties']['summary']
             route_details.append({
                 "number": i+1,
                 "distance": summary['distance']/1000,
-                "duration": summary['duration']/60,
+                "duration": durations[i],
+                "free_flow": free_flow[i],
                 "color": colors[i % len(colors)]
             })
 
@@ -274,22 +170,37 @@ def create_route_map(from_location, to_location, coords_map):
             icon=folium.Icon(color="red", icon="stop")
         ).add_to(m)
 
-        return m, route_details, best_route
+        freshness = {
+            "age": route_result.age,
+            "stale": route_result.stale,
+            "refreshing": route_result.refreshing,
+        }
+        return m, route_details, best_route, freshness
 
     except ApiError as e:
         logger.error(f"API Error creating route map: {e}")
-        return None, [], {}
+        return None, [], {}, None
     except Exception as e:
         logger.error(f"Error creating route map: {e}")
-        return None, [], {}
+        return None, [], {}, None
 
 # Initialize data
-traffic_data = load_data()
-model = load_model()
-
-if traffic_data is None or model is None:
+try:
+    vehicle_stats = engine.vehicle_stats
+except Exception as e:
+    logger.error(f"Error loading traffic data: {e}")
+    st.error("Failed to load traffic data. Please check if the file exists.")
+    st.stop()
+try:
+    model_manager = engine.model_manager
+except Exception as e:
+    logger.error(f"Error loading model: {e}")
+    st.error("Failed to load ML model. Please check if the file exists.")
     st.stop()
 
+# Read once so the whole rerun uses one model even if a new one is swapped in
+model, model_version = model_manager.snapshot()
+
 # Main header
 st.markdown("""
 <div class="main-header">
@@ -299,16 +210,26 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Extract location list from model features
-location_list = sorted({col.split("LOCATION_")[-1] for col in model.feature_names_in_ if col.startswith("LOCATION_")})
-weather_options = ["Clear", "Rainy", "Cloudy", "Foggy"]
+location_list = model_locations(model)
+weather_options = WEATHER_OPTIONS
+
+# Headless warm-up run from warmup.py before this worker takes traffic
+if warmup_requested(st.query_params.get(WARMUP_PARAM)):
+    engine.warm_up(location_list, WARMUP_ROUTE_PAIRS)
 
 # Sidebar for input controls
 with st.sidebar:
     st.header("🎛️ Trip Configuration")
     
     st.subheader("📍 Route Selection")
-    from_location = st.selectbox("From Location", location_list, help="Select your starting point")
-    to_location = st.selectbox("To Location", location_list, help="Select your destination")
+    from_query = st.text_input("🔎 Search Start", placeholder="Type part of a name, typos are fine")
+    from_location = st.selectbox(
+        "From Location", location_options(from_query, location_list), help="Select your starting point"
+    )
+    to_query = st.text_input("🔎 Search Destination", placeholder="Type part of a name, typos are fine")
+    to_location = st.selectbox(
+        "To Location", location_options(to_query, location_list), help="Select your destination"
+    )
     
     if from_location == to_location:
         st.warning("⚠️ Please select different locations for route planning")
@@ -316,18 +237,68 @@ with st.sidebar:
     st.subheader("🌤️ Conditions")
     weather = st.selectbox("Weather Condition", weather_options, help="Current weather conditions")
     hour = st.slider("Time of Day", 0, 23, 9, format="%d:00", help="Hour of the day (24-hour format)")
+    count_source = st.radio(
+        "Vehicle Counts",
+        ["Historical average", "Historical percentile", "Recent trend forecast"],
+        help=f"Percentiles plan for busier-than-usual days; forecasts follow the last {FORECAST_HISTORY_DAYS} days "
+             f"and the latest hours' trend"
+    )
+    count_percentile = st.slider(
+        "Percentile", 50, 99, 90, format="p%d",
+        disabled=count_source != "Historical percentile",
+        help="Vehicle count this share of recorded readings stay under; p90 plans for busier-than-usual conditions"
+    )
+    if count_source != "Historical percentile":
+        count_percentile = None
+    
+    st.subheader("🚚 Deliveries")
+    plan_trip = st.checkbox("Plan multi-stop trip", help="Optimize the visiting order for many stops")
+    
+    st.subheader("🔥 City View")
+    show_city_view = st.checkbox("City-wide congestion", help="Congestion across all locations for the selected hour and weather")
+    city_view_style = st.radio("Overlay", ["Heatmap", "Markers"], horizontal=True, disabled=not show_city_view)
+
+    st.subheader("⏱️ Reachability")
+    show_isochrone = st.checkbox(
+        "Reachable area",
+        help="Locations reachable from the start location at the selected hour and weather"
+    )
+    isochrone_minutes = st.slider("Within (minutes)", 5, 90, 20, step=5, disabled=not show_isochrone)
+    
+    st.subheader("🕒 Departure Planner")
+    find_departure = st.checkbox("When should I leave?", help="Compare all 24 departure hours at once")
+    include_route = st.checkbox(
+        "Include route conditions",
+        value=True,
+        disabled=not find_departure,
+        help="Also score the origin and shift the destination to the estimated arrival hour"
+    )
     
     current_time = datetime.now()
     st.info(f"🕐 Current time: {current_time.strftime('%H:%M')}")
 
+# Start fetching routes now so ORS responds while the local sections render
+coords_map = engine.coords_map(location_list)
+route_request = None
+if from_location != to_location and from_location in coords_map and to_location in coords_map:
+    route_request = engine.start_route_fetch(coords_map[from_location][::-1], coords_map[to_location][::-1])
+
 # Main content area
 col1, col2 = st.columns([2, 1])
 
 with col1:
     st.header("📊 Traffic Analysis")
     
-    vehicle_count = get_vehicle_count(to_location, hour, weather, traffic_data)
-    prediction, confidence = predict_traffic(model, to_location, hour, weather, vehicle_count)
+    vehicle_count = engine.vehicle_counts(to_location, [hour], weather, count_percentile)[0]
+    upcoming = None
+    if count_source == "Recent trend forecast":
+        forecaster = engine.forecaster
+        upcoming = forecaster.forecast(to_location, 24) if forecaster is not None else None
+        if upcoming is not None:
+            vehicle_count = int(upcoming.loc[upcoming["HOUR"] == hour, "VEHICLE_COUNT"].iloc[0])
+        else:
+            st.caption("No recent observations for this location, using the historical average.")
+    prediction, confidence = engine.predict(model, to_location, hour, weather, vehicle_count)
     
     traffic_status = "Low Traffic" if prediction == 0 else "High Traffic"
     status_color = "🟢" if prediction == 0 else "🔴"
@@ -338,6 +309,9 @@ with col1:
     
     with col1a:
         st.metric("🚗 Vehicle Count", f"{vehicle_count:,}", help="Estimated vehicles at destination")
+        count_spread = vehicle_stats.percentiles(to_location, hour, weather)
+        if count_spread:
+            st.caption(f"p50 {count_spread[50]} · p90 {count_spread[90]} · p99 {count_spread[99]}")
     
     with col1b:
         st.metric("🎯 Confidence", f"{confidence:.1%}", help="Model prediction confidence")
@@ -345,6 +319,40 @@ with col1:
     with col1c:
         st.metric("⏰ Time", f"{hour:02d}:00", help="Selected hour")
 
+    if upcoming is not None:
+        next_hours = upcoming.head(FORECAST_HORIZON)
+        predictions, confidences, _ = predict_traffic_batch(
+            model,
+            [to_location] * len(next_hours),
+            next_hours["HOUR"],
+            [weather] * len(next_hours),
+            next_hours["VEHICLE_COUNT"],
+        )
+        st.subheader(f"📈 Next {len(next_hours)} Hours at {to_location}")
+        st.dataframe(
+            pd.DataFrame({
+                "Time": next_hours["TIMESTAMP"].dt.strftime("%d %b %H:00"),
+                "Vehicles": next_hours["VEHICLE_COUNT"],
+                "Traffic": ["🟢 Low" if p == 0 else "🔴 High" for p in predictions],
+                "Confidence": [f"{c:.0%}" for c in confidences],
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(f"Forecast from observations up to {next_hours['TIMESTAMP'].iloc[0] - pd.Timedelta(hours=1):%d %b %H:00}")
+
+    anomaly_detector = engine.anomaly_detector
+    if anomaly_detector is not None:
+        for location in dict.fromkeys([from_location, to_location]):
+            anomalies = anomaly_detector.recent_events(location, limit=3)
+            if anomalies:
+                latest = anomalies[0]
+                st.warning(
+                    f"🚨 Unusual traffic at {location} on {pd.Timestamp(latest.timestamp, unit='h'):%d %b %H:00}: "
+                    f"{latest.count} vehicles vs usual {latest.expected:.0f} ± {latest.std:.0f} in {latest.weather.lower()} weather"
+                    + (f" ({len(anomalies) - 1} more recently)" if len(anomalies) > 1 else "")
+                )
+
 with col2:
     st.header("📈 Traffic Insights")
     
@@ -379,216 +387,537 @@ with col2:
     fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
     st.plotly_chart(fig, use_container_width=True)
 
+# Network-free travel time, shown until ORS answers and whenever it cannot
+route_eta = None
+if route_request is not None:
+    high_probability = confidence if prediction == 1 else 1 - confidence
+    route_eta = engine.eta_estimator.estimate_one(
+        coords_map[from_location], coords_map[to_location], 1 + CONGESTION_DELAY_FACTOR * high_probability
+    )
+
+# Departure Planner Section
+if find_departure:
+    st.header("🕒 Best Departure Time")
+    
+    route_minutes = None
+    route_estimated = None
+    if include_route and from_location != to_location:
+        if route_request is not None:
+            # Never wait on ORS here: sections below would stall behind it
+            if route_request.done():
+                try:
+                    sweep_route = route_request.result().value
+                    route_minutes = min(f['properties']['summary']['duration'] for f in sweep_route['features']) / 60
+                except Exception as e:
+                    logger.error(f"Error fetching route for departure sweep: {e}")
+                    route_estimated = "unavailable"
+            else:
+                route_estimated = "loading"
+            if route_minutes is None:
+                # Free-flow estimate; the sweep applies each hour's conditions itself
+                route_minutes = engine.eta_estimator.estimate_one(coords_map[from_location], coords_map[to_location])[0]
+                route_estimated = route_estimated or "unavailable"
+        if route_minutes is None:
+            st.info("ℹ️ Route unavailable - scoring destination conditions only")
+    
+    sweep = sweep_departure_hours(
+        model, model_version, from_location, to_location, weather, route_minutes, count_percentile
+    )
+    best = sweep.iloc[0]
+    
+    sweep_col1, sweep_col2 = st.columns([1, 2])
+    
+    with sweep_col1:
+        st.success(f"🏆 Best departure: **{int(best['HOUR']):02d}:00**")
+        if route_estimated == "loading":
+            st.caption(f"Route estimated at about {route_minutes:.0f} mins while the routing service answers")
+        elif route_estimated:
+            st.caption(f"Routing service unavailable, route estimated at about {route_minutes:.0f} mins")
+        elif route_minutes is not None:
+            st.caption(f"Fastest route takes about {route_minutes:.0f} mins")
+        st.dataframe(
+            pd.DataFrame({
+                'Rank': sweep['RANK'],
+                'Departure': [f"{h:02d}:00" for h in sweep['HOUR']],
+                'Traffic': ['🟢 Low' if p == 0 else '🔴 High' for p in sweep['PREDICTION']],
+                'High Traffic Risk': [f"{v:.0%}" for v in sweep['SCORE']],
+                'Vehicles': sweep['VEHICLE_COUNT'],
+            }),
+            use_container_width=True,
+            hide_index=True,
+            height=300
+        )
+    
+    with sweep_col2:
+        by_hour = sweep.sort_values("HOUR")
+        sweep_fig = go.Figure(go.Bar(
+            x=[f"{h:02d}:00" for h in by_hour['HOUR']],
+            y=by_hour['SCORE'],
+            marker_color=[
+                'orange' if h == best['HOUR'] else ('green' if p == 0 else 'lightcoral')
+                for h, p in zip(by_hour['HOUR'], by_hour['PREDICTION'])
+            ]
+        ))
+        sweep_fig.update_layout(
+            height=340,
+            margin=dict(l=20, r=20, t=40, b=20),
+            title="High traffic risk by departure hour",
+            yaxis=dict(range=[0, 1], tickformat=".0%")
+        )
+        st.plotly_chart(sweep_fig, use_container_width=True)
+
+# City-Wide Congestion Section
+if show_city_view:
+    st.header("🔥 City-Wide Congestion")
+    
+    layers = engine.congestion_layers(model, model_version)
+    weather_index = list(layers['weathers']).index(weather)
+    city_probabilities = layers['high_probability'][weather_index, hour].astype(float)
+    
+    city_map = folium.Map(location=[12.9716, 77.5946], zoom_start=11, tiles='OpenStreetMap')
+    if city_view_style == "Heatmap":
+        HeatMap(
+            heatmap_layer(layers, hour, weather),
+            name=f"Congestion {hour:02d}:00",
+            min_opacity=0.3,
+            radius=25,
+        ).add_to(city_map)
+    else:
+        cluster = MarkerCluster(name=f"Congestion {hour:02d}:00").add_to(city_map)
+        for location, (lat, lon), probability, count in zip(
+            layers['locations'], layers['coords'], city_probabilities,
+            layers['vehicle_counts'][weather_index, hour]
+        ):
+            folium.CircleMarker(
+                location=[float(lat), float(lon)],
+                radius=8,
+                color='red' if probability >= 0.5 else 'green',
+                fill=True,
+                fill_opacity=0.7,
+                popup=f"{location}: {probability:.0%} high traffic risk, ~{count} vehicles",
+            ).add_to(cluster)
+    folium.LayerControl().add_to(city_map)
+    
+    city_col1, city_col2 = st.columns([3, 1])
+    with city_col1:
+        st_folium(city_map, width=800, height=500, returned_objects=[])
+    with city_col2:
+        st.metric("🔴 Congested Locations", f"{int((city_probabilities >= 0.5).sum())} / {len(city_probabilities)}")
+        st.markdown("**Most congested**")
+        for index in np.argsort(-city_probabilities)[:5]:
+            st.write(f"{layers['locations'][index]} · {city_probabilities[index]:.0%}")
+
+# Reachability Section
+if show_isochrone:
+    st.header(f"⏱️ Reachable from {from_location} within {isochrone_minutes} min")
+
+    travel_times = engine.travel_times_matrix
+    matrix_locations = travel_times['locations']
+    origin_match = reconcile([from_location], engine.location_index(tuple(matrix_locations)))[from_location]
+    if origin_match is None:
+        st.warning(f"No travel times for '{from_location}'")
+    else:
+        iso_start = time.perf_counter()
+        origin = list(matrix_locations).index(origin_match.name)
+        layers = engine.congestion_layers(model, model_version)
+        factors = congestion_factors(layers, matrix_locations, hour, weather, CONGESTION_DELAY_FACTOR)
+        minutes = reachable_minutes(travel_times['durations'], factors, origin)
+
+        iso_map = folium.Map(location=list(travel_times['coords'][origin]), zoom_start=12, tiles='OpenStreetMap')
+        isochrone_layer(
+            matrix_locations, travel_times['coords'], minutes, isochrone_minutes, origin,
+            name=f"Within {isochrone_minutes} min at {hour:02d}:00"
+        ).add_to(iso_map)
+        iso_ms = (time.perf_counter() - iso_start) * 1000
+
+        reachable = np.flatnonzero(minutes <= isochrone_minutes)
+        reachable = reachable[reachable != origin]
+        iso_col1, iso_col2 = st.columns([3, 1])
+        with iso_col1:
+            st_folium(iso_map, width=800, height=500, returned_objects=[])
+        with iso_col2:
+            st.metric("📍 Reachable", f"{len(reachable)} / {len(matrix_locations) - 1}")
+            st.metric("⚡ Computed In", f"{iso_ms:.0f} ms")
+            st.caption(f"Travel times: {travel_times['source']}, scaled by predicted congestion")
+            for index in reachable[np.argsort(minutes[reachable])][:10]:
+                st.write(f"{matrix_locations[index]} · {minutes[index]:.0f} min")
+
 # Route Planning Section
 st.header("🗺️ Route Planning & Navigation")
 
-coords_map = get_location_coordinates()
+# Filled in at the end of the script, once the route fetch returns
+route_container = st.container()
+if route_request is not None:
+    eta, eta_low, eta_high = route_eta
+    route_status = route_container.info(
+        f"🔄 Calculating optimal routes... estimated {eta:.0f} mins ({eta_low:.0f}–{eta_high:.0f}) "
+        f"at {hour:02d}:00 in {weather.lower()} weather"
+    )
 
 # Debug information
-with st.expander("🔧 Debug Information", expanded=False):
+debug_expander = st.expander("🔧 Debug Information", expanded=False)
+with debug_expander:
     st.write(f"From location: {from_location}")
     st.write(f"To location: {to_location}")
     st.write(f"From location in coords_map: {from_location in coords_map}")
     st.write(f"To location in coords_map: {to_location in coords_map}")
     st.write(f"Locations same? {from_location == to_location}")
     st.write(f"Total locations in coords_map: {len(coords_map)}")
+    if vehicle_stats.attached:
+        st.write("Traffic data: not loaded in this worker, statistics attached from shared memory")
+    else:
+        frame_report = memory_report(engine.traffic_data)
+        st.write(
+            f"Traffic data: {frame_report['rows']:,} records, {frame_report['optimized_mb']:.1f} MB shared "
+            f"by all sessions (default dtypes: {frame_report['default_mb']:.1f} MB per session, "
+            f"{frame_report['saved_ratio']:.0%} saved)"
+        )
+    cache_stats = engine.route_cache.stats()
+    st.write(
+        f"Route cache: {cache_stats['entries']} entries, {cache_stats['hits']} fresh hits, "
+        f"{cache_stats['stale_hits']} stale hits, {cache_stats['misses']} misses, "
+        f"breaker {cache_stats['breaker']} ({cache_stats['rejected']} rejected)"
+    )
+    shared_stats = engine.shared_cache.stats()
+    st.write(
+        f"Shared cache ({shared_stats['backend']}): {shared_stats['hits']} hits, "
+        f"{shared_stats['misses']} misses, {shared_stats['sets']} writes, {shared_stats['errors']} errors"
+    )
+    model_stats = model_manager.stats()
+    st.write(
+        f"Model: version {model_stats['version']}, loaded {datetime.fromtimestamp(model_stats['loaded_at']):%H:%M:%S} "
+        f"in {model_stats['last_reload_seconds']:.2f}s, {model_stats['reloads']} reloads, "
+        f"{model_stats['failures']} failed"
+    )
+    if model_stats["last_error"]:
+        st.warning(f"Last model reload failed, still serving the previous model: {model_stats['last_error']}")
+    if engine.anomaly_detector is None:
+        st.write("Anomaly detector: unavailable, the traffic data has no dates")
+    else:
+        anomaly_stats = engine.anomaly_detector.stats()
+        st.write(
+            f"Anomaly detector: {anomaly_stats['observations']:,} readings from the last {ANOMALY_REPLAY_DAYS} days, "
+            f"{anomaly_stats['anomalies']} anomalies, {anomaly_stats['locations']} locations, "
+            f"{anomaly_stats['memory_kb']:.0f} KB"
+        )
+    flight_stats = route_flight.stats()
+    st.write(
+        f"Route requests: {flight_stats['calls']} calls, {flight_stats['executions']} sent to ORS, "
+        f"{flight_stats['coalesced']} coalesced, {flight_stats['in_flight']} in flight"
+    )
     if from_location not in coords_map:
         st.error(f"❌ '{from_location}' not found in coordinates map")
     if to_location not in coords_map:
         st.error(f"❌ '{to_location}' not found in coordinates map")
 
-if from_location != to_location and from_location in coords_map and to_location in coords_map:
-    with st.spinner("🔄 Calculating optimal routes..."):
-        route_map, route_details, best_route = create_route_map(from_location, to_location, coords_map)
+# Multi-Stop Trip Section
+if plan_trip:
+    st.header("🚚 Multi-Stop Trip Planner")
+    
+    trip_locations = sorted(coords_map)
+    trip_col1, trip_col2, trip_col3 = st.columns([3, 1, 1])
+    with trip_col1:
+        trip_stops = st.multiselect(
+            "Stops", trip_locations, help="The first stop is where the trip starts"
+        )
+    with trip_col2:
+        trip_start_hour = st.slider("Start Hour", 0, 23, hour, format="%d:00")
+    with trip_col3:
+        trip_return = st.checkbox("Return to start", value=False)
     
-    if route_map:
-        st.markdown("### 🗺 Interactive Route Map")
-        st_folium(route_map, width=800, height=500, returned_objects=[])
+    if len(trip_stops) < 2:
+        st.info("🔄 Select at least two stops to plan a trip.")
+    else:
+        with st.spinner("🔄 Optimizing stop order..."):
+            trip = engine.plan_multi_stop_trip(
+                model, trip_stops, coords_map,
+                weather, trip_start_hour, trip_return, count_percentile
+            )
+        legs = trip['legs']
+        ordered_stops = [trip_stops[i] for i in trip['tour']]
+        total_minutes = sum(leg['minutes'] for leg in legs)
+        
+        trip_m1, trip_m2, trip_m3, trip_m4 = st.columns(4)
+        trip_m1.metric("📍 Stops", len(trip_stops))
+        trip_m2.metric("⏱️ Total Time", f"{total_minutes:.0f} mins")
+        trip_m3.metric("🚦 Congestion Delay", f"{total_minutes - sum(leg['base_minutes'] for leg in legs):+.0f} mins")
+        trip_m4.metric("⚡ Solved In", f"{trip['solve_ms']:.0f} ms")
+        st.caption(f"Travel times: {trip['source']}")
         
-        st.markdown("### 📊 Detailed Route Analysis & Comparison")
+        trip_map = folium.Map(location=coords_map[ordered_stops[0]], zoom_start=12, tiles='OpenStreetMap')
+        waypoints = [coords_map[stop][::-1] for stop in ordered_stops]
+        if trip_return:
+            waypoints.append(waypoints[0])
+        try:
+            for feature in engine.fetch_route_through(tuple(waypoints)):
+                folium.GeoJson(
+                    feature,
+                    style_function=lambda x: {'color': 'blue', 'weight': 4, 'opacity': 0.8}
+                ).add_to(trip_map)
+        except Exception as e:
+            logger.error(f"Error fetching trip geometry: {e}")
+            folium.PolyLine([point[::-1] for point in waypoints], color='blue', weight=3, dash_array='6').add_to(trip_map)
         
-        if route_details:
-            # First, show a summary table
-            st.markdown("#### 📋 Quick Route Summary")
+        for number, stop in enumerate(ordered_stops, start=1):
+            folium.Marker(
+                location=coords_map[stop],
+                popup=f"{number}. {stop}",
+                icon=folium.Icon(color="green" if number == 1 else "blue", icon="play" if number == 1 else "flag")
+            ).add_to(trip_map)
+        st_folium(trip_map, width=800, height=500, returned_objects=[])
+        
+        st.dataframe(
+            pd.DataFrame({
+                'Leg': range(1, len(legs) + 1),
+                'From': [trip_stops[leg['from']] for leg in legs],
+                'To': [trip_stops[leg['to']] for leg in legs],
+                'Depart': [f"{int(leg['depart_minute'] // 60) % 24:02d}:{int(leg['depart_minute'] % 60):02d}" for leg in legs],
+                'Free-flow (mins)': [f"{leg['base_minutes']:.0f}" for leg in legs],
+                'With Traffic (mins)': [f"{leg['minutes']:.0f}" for leg in legs],
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+# Footer
+st.markdown("---")
+st.markdown("""
+<div style='text-align: center; color: #666; margin-top: 2rem;'>
+    <p>🚦 Smart Traffic Management System | Powered by AI & Real-time Data</p>
+    <p>Made with ❤️ for Bangalore Traffic Management</p>
+</div>
+""", unsafe_allow_html=True)
+
+# Routes render last, into their place above, so the network never holds up local sections
+with route_container:
+    if route_request is not None:
+        route_map, route_details, best_route, freshness = create_route_map(
+            from_location, to_location, coords_map, route_request, hour, weather
+        )
+        route_status.empty()
+    
+        if route_map:
+            st.markdown("### 🗺 Interactive Route Map")
+            age_minutes = freshness['age'] / 60
+            if not freshness['stale']:
+                st.caption(f"🟢 Live route · fetched {age_minutes:.0f} min ago")
+            elif freshness['refreshing']:
+                st.caption(f"🟡 Cached route from {age_minutes:.0f} min ago · refreshing in background")
+            else:
+                st.caption(f"🟠 Cached route from {age_minutes:.0f} min ago · routing service unavailable")
+            st_folium(route_map, width=800, height=500, returned_objects=[])
+        
+            st.markdown("### 📊 Detailed Route Analysis & Comparison")
+        
+            if route_details:
+                # First, show a summary table
+                st.markdown("#### 📋 Quick Route Summary")
             
-            # Create comparison table
-            comparison_df = pd.DataFrame({
-                'Route': [f"Route {detail['number']}" for detail in route_details],
-                'Distance (km)': [f"{detail['distance']:.1f}" for detail in route_details],
-                'Time (mins)': [f"{detail['duration']:.0f}" for detail in route_details],
-                'Speed (km/h)': [f"{(detail['distance'] / (detail['duration']/60)):.1f}" for detail in route_details],
-                'Status': ['🌟 RECOMMENDED' if detail == best_route else '⭐ Alternative' for detail in route_details]
-            })
+                # Create comparison table
+                comparison_df = pd.DataFrame({
+                    'Route': [f"Route {detail['number']}" for detail in route_details],
+                    'Distance (km)': [f"{detail['distance']:.1f}" for detail in route_details],
+                    'Time (mins)': [f"{detail['duration']:.0f}" for detail in route_details],
+                    'Speed (km/h)': [f"{(detail['distance'] / (detail['duration']/60)):.1f}" for detail in route_details],
+                    'Status': ['🌟 RECOMMENDED' if detail == best_route else '⭐ Alternative' for detail in route_details]
+                })
             
-            st.dataframe(
-                comparison_df,
-                use_container_width=True,
-                hide_index=True,
-                column_config={
-                    "Route": st.column_config.TextColumn("Route", width="small"),
-                    "Distance (km)": st.column_config.TextColumn("Distance", width="small"),
-                    "Time (mins)": st.column_config.TextColumn("Duration", width="small"),
-                    "Speed (km/h)": st.column_config.TextColumn("Avg Speed", width="small"),
-                    "Status": st.column_config.TextColumn("Recommendation", width="medium")
-                }
-            )
+                st.dataframe(
+                    comparison_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "Route": st.column_config.TextColumn("Route", width="small"),
+                        "Distance (km)": st.column_config.TextColumn("Distance", width="small"),
+                        "Time (mins)": st.column_config.TextColumn("Duration", width="small"),
+                        "Speed (km/h)": st.column_config.TextColumn("Avg Speed", width="small"),
+                        "Status": st.column_config.TextColumn("Recommendation", width="medium")
+                    }
+                )
             
-            st.markdown("#### 🎯 Detailed Route Cards")
+                st.markdown("#### 🎯 Detailed Route Cards")
             
-            # Enhanced route cards with cleaner approach
-            cols = st.columns(len(route_details))
-            for idx, detail in enumerate(route_details):
-                with cols[idx]:
-                    is_best = detail == best_route
+                # Enhanced route cards with cleaner approach
+                cols = st.columns(len(route_details))
+                for idx, detail in enumerate(route_details):
+                    with cols[idx]:
+                        is_best = detail == best_route
                     
-                    # Calculate additional metrics
-                    avg_speed = detail['distance'] / (detail['duration']/60)
-                    time_diff = detail['duration'] - best_route['duration'] if not is_best else 0
-                    distance_diff = detail['distance'] - best_route['distance'] if not is_best else 0
+                        # Calculate additional metrics
+                        avg_speed = detail['distance'] / (detail['duration']/60)
+                        time_diff = detail['duration'] - best_route['duration'] if not is_best else 0
+                        distance_diff = detail['distance'] - best_route['distance'] if not is_best else 0
                     
-                    # Route header
-                    if is_best:
-                        st.markdown(f"""
-                        <div style='text-align: center; padding: 15px; background: linear-gradient(135deg, #FFD700, #FFA500); 
-                                    border-radius: 15px; margin-bottom: 15px; color: white; font-weight: bold;'>
-                            <h2 style='margin: 0; color: white;'>🌟 Route {detail['number']}</h2>
-                            <div style='font-size: 14px; margin-top: 5px;'>⭐ RECOMMENDED ⭐</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                        <div style='text-align: center; padding: 15px; background: {detail['color']}; 
-                                    border-radius: 15px; margin-bottom: 15px; color: white; font-weight: bold;'>
-                            <h2 style='margin: 0; color: white;'>🔹 Route {detail['number']}</h2>
-                            <div style='font-size: 14px; margin-top: 5px; opacity: 0.9;'>Alternative Route</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        # Route header
+                        if is_best:
+                            st.markdown(f"""
+                            <div style='text-align: center; padding: 15px; background: linear-gradient(135deg, #FFD700, #FFA500); 
+                                        border-radius: 15px; margin-bottom: 15px; color: white; font-weight: bold;'>
+                                <h2 style='margin: 0; color: white;'>🌟 Route {detail['number']}</h2>
+                                <div style='font-size: 14px; margin-top: 5px;'>⭐ RECOMMENDED ⭐</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        else:
+                            st.markdown(f"""
+                            <div style='text-align: center; padding: 15px; background: {detail['color']}; 
+                                        border-radius: 15px; margin-bottom: 15px; color: white; font-weight: bold;'>
+                                <h2 style='margin: 0; color: white;'>🔹 Route {detail['number']}</h2>
+                                <div style='font-size: 14px; margin-top: 5px; opacity: 0.9;'>Alternative Route</div>
+                            </div>
+                            """, unsafe_allow_html=True)
                     
-                    # Main metrics using Streamlit metrics
-                    st.metric(
-                        label="🚗 Distance", 
-                        value=f"{detail['distance']:.1f} km",
-                        delta=f"{distance_diff:+.1f} km" if not is_best and distance_diff != 0 else None
-                    )
+                        # Main metrics using Streamlit metrics
+                        st.metric(
+                            label="🚗 Distance", 
+                            value=f"{detail['distance']:.1f} km",
+                            delta=f"{distance_diff:+.1f} km" if not is_best and distance_diff != 0 else None
+                        )
                     
-                    st.metric(
-                        label="⏱️ Duration", 
-                        value=f"{detail['duration']:.0f} mins",
-                        delta=f"{time_diff:+.0f} mins" if not is_best and time_diff != 0 else None
-                    )
+                        st.metric(
+                            label="⏱️ Duration", 
+                            value=f"{detail['duration']:.0f} mins",
+                            delta=f"{time_diff:+.0f} mins" if not is_best and time_diff != 0 else None,
+                            help=f"{detail['free_flow']:.0f} mins without traffic"
+                        )
                     
-                    st.metric(
-                        label="⚡ Avg Speed", 
-                        value=f"{avg_speed:.1f} km/h"
-                    )
+                        st.metric(
+                            label="⚡ Avg Speed", 
+                            value=f"{avg_speed:.1f} km/h"
+                        )
                     
-                    # Route color indicator
-                    if is_best:
-                        st.markdown(f"""
-                        <div style='text-align: center; margin: 15px 0; padding: 10px; 
-                                    background: #FFF8DC; border-radius: 8px; border: 2px solid #FFD700;'>
-                            <span style='color: #FF8C00; font-size: 24px;'>●</span><br>
-                            <small style='color: #666;'>Map Color: Orange</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                        <div style='text-align: center; margin: 15px 0; padding: 10px; 
-                                    background: #F8F9FA; border-radius: 8px; border: 2px solid {detail['color']};'>
-                            <span style='color: {detail['color']}; font-size: 24px;'>●</span><br>
-                            <small style='color: #666;'>Map Color</small>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        # Route color indicator
+                        if is_best:
+                            st.markdown(f"""
+                            <div style='text-align: center; margin: 15px 0; padding: 10px; 
+                                        background: #FFF8DC; border-radius: 8px; border: 2px solid #FFD700;'>
+                                <span style='color: #FF8C00; font-size: 24px;'>●</span><br>
+                                <small style='color: #666;'>Map Color: Orange</small>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        else:
+                            st.markdown(f"""
+                            <div style='text-align: center; margin: 15px 0; padding: 10px; 
+                                        background: #F8F9FA; border-radius: 8px; border: 2px solid {detail['color']};'>
+                                <span style='color: {detail['color']}; font-size: 24px;'>●</span><br>
+                                <small style='color: #666;'>Map Color</small>
+                            </div>
+                            """, unsafe_allow_html=True)
                     
-                    # Performance indicator
-                    if is_best:
-                        st.success("🏆 Fastest Route!")
-                    elif time_diff <= 5:
-                        st.info("⭐ Good Alternative")
-                    else:
-                        st.warning("⏳ Slower Option")
+                        # Performance indicator
+                        if is_best:
+                            st.success("🏆 Fastest Route!")
+                        elif time_diff <= 5:
+                            st.info("⭐ Good Alternative")
+                        else:
+                            st.warning("⏳ Slower Option")
             
-            # Enhanced recommendation section
-            st.markdown("#### 🏆 Smart Recommendation")
+                # Enhanced recommendation section
+                st.markdown("#### 🏆 Smart Recommendation")
             
-            # Calculate savings and benefits
-            if len(route_details) > 1:
-                slowest_route = max(route_details, key=lambda x: x['duration'])
-                time_saved = slowest_route['duration'] - best_route['duration']
+                # Calculate savings and benefits
+                if len(route_details) > 1:
+                    slowest_route = max(route_details, key=lambda x: x['duration'])
+                    time_saved = slowest_route['duration'] - best_route['duration']
                 
-                longest_route = max(route_details, key=lambda x: x['distance'])
-                distance_saved = longest_route['distance'] - best_route['distance']
+                    longest_route = max(route_details, key=lambda x: x['distance'])
+                    distance_saved = longest_route['distance'] - best_route['distance']
                 
-                col1, col2 = st.columns(2)
+                    col1, col2 = st.columns(2)
                 
-                with col1:
-                    st.success(f"""
-                    ### � **Optimal Choice: Route {best_route['number']}**
+                    with col1:
+                        st.success(f"""
+                        ### � **Optimal Choice: Route {best_route['number']}**
                     
-                    **Why this route is best:**
-                    - ⚡ **Fastest**: {best_route['duration']:.0f} minutes
-                    - �️ **Distance**: {best_route['distance']:.1f} km  
-                    - 🚗 **Speed**: {(best_route['distance'] / (best_route['duration']/60)):.1f} km/h
-                    - ⏰ **Time Saved**: Up to {time_saved:.0f} minutes
-                    - 📏 **Distance Saved**: Up to {distance_saved:.1f} km
-                    """)
+                        **Why this route is best:**
+                        - ⚡ **Fastest**: {best_route['duration']:.0f} minutes
+                        - �️ **Distance**: {best_route['distance']:.1f} km  
+                        - 🚗 **Speed**: {(best_route['distance'] / (best_route['duration']/60)):.1f} km/h
+                        - ⏰ **Time Saved**: Up to {time_saved:.0f} minutes
+                        - 🚦 **Traffic Delay**: {best_route['duration'] - best_route['free_flow']:.0f} minutes included
+                        - 📏 **Distance Saved**: Up to {distance_saved:.1f} km
+                        """)
                 
-                with col2:
-                    st.info(f"""
-                    ### 📊 **Journey Context**
+                    with col2:
+                        st.info(f"""
+                        ### 📊 **Journey Context**
                     
-                    **Current Conditions:**
-                    - �️ **Weather**: {weather}
-                    - 🕐 **Time**: {hour}:00
-                    - 🚦 **Traffic**: {traffic_status}
-                    - 🎯 **Confidence**: {confidence:.0%}
+                        **Current Conditions:**
+                        - �️ **Weather**: {weather}
+                        - 🕐 **Time**: {hour}:00
+                        - 🚦 **Traffic**: {traffic_status}
+                        - 🎯 **Confidence**: {confidence:.0%}
                     
-                    **Trip Summary:**
-                    - 📍 **From**: {from_location}
-                    - 📍 **To**: {to_location}
-                    """)
+                        **Trip Summary:**
+                        - 📍 **From**: {from_location}
+                        - 📍 **To**: {to_location}
+                        """)
             
-            # Traffic-aware insights
-            st.markdown("#### 💡 Smart Insights")
-            insights_col1, insights_col2, insights_col3 = st.columns(3)
+                # Traffic-aware insights
+                st.markdown("#### 💡 Smart Insights")
+                insights_col1, insights_col2, insights_col3 = st.columns(3)
             
-            with insights_col1:
-                if best_route['duration'] < 20:
-                    st.success("🚀 **Quick Journey** - Under 20 minutes!")
-                elif best_route['duration'] < 45:
-                    st.info("⏱️ **Moderate Journey** - Good timing")
-                else:
-                    st.warning("🐌 **Longer Journey** - Consider alternative timing")
+                with insights_col1:
+                    if best_route['duration'] < 20:
+                        st.success("🚀 **Quick Journey** - Under 20 minutes!")
+                    elif best_route['duration'] < 45:
+                        st.info("⏱️ **Moderate Journey** - Good timing")
+                    else:
+                        st.warning("🐌 **Longer Journey** - Consider alternative timing")
             
-            with insights_col2:
-                if prediction == 0:
-                    st.success("✅ **Low Traffic** - Perfect time to travel!")
-                else:
-                    st.warning("⚠️ **High Traffic** - Extra time recommended")
+                with insights_col2:
+                    if prediction == 0:
+                        st.success("✅ **Low Traffic** - Perfect time to travel!")
+                    else:
+                        st.warning("⚠️ **High Traffic** - Extra time recommended")
             
-            with insights_col3:
-                if weather == "Clear":
-                    st.success("☀️ **Clear Weather** - Smooth driving conditions")
-                elif weather == "Rainy":
-                    st.warning("🌧️ **Rainy Weather** - Drive carefully!")
-                else:
-                    st.info(f"🌤️ **{weather} Weather** - Moderate conditions")
+                with insights_col3:
+                    if weather == "Clear":
+                        st.success("☀️ **Clear Weather** - Smooth driving conditions")
+                    elif weather == "Rainy":
+                        st.warning("🌧️ **Rainy Weather** - Drive carefully!")
+                    else:
+                        st.info(f"🌤️ **{weather} Weather** - Moderate conditions")
                     
+            else:
+                st.warning("⚠️ No route details available")
+        elif engine.ors_breaker.state != "closed":
+            st.error("❌ Routing service is temporarily unavailable. Retrying automatically - traffic prediction is still available.")
+        elif engine.route_cache.stats()['refreshing']:
+            st.info("⏳ Routes are still loading and will appear on the next refresh.")
         else:
-            st.warning("⚠️ No route details available")
-    else:
-        st.error("❌ Unable to fetch route information. Please check your internet connection or try again later.")
-
-elif from_location == to_location:
-    st.info("🔄 Please select different start and destination locations to view routes.")
-else:
-    st.warning("⚠️ Route mapping not available for selected locations. Showing traffic prediction only.")
+            st.error("❌ Unable to fetch route information. Please check your internet connection or try again later.")
+        if not route_map:
+            eta, eta_low, eta_high = route_eta
+            eta_stats = engine.eta_estimator.stats()
+            st.metric("⏱️ Estimated Travel Time", f"{eta:.0f} mins", help="Estimated without the routing service")
+            st.caption(
+                f"Likely {eta_low:.0f}–{eta_high:.0f} mins at {hour:02d}:00 in {weather.lower()} weather · "
+                f"{eta_stats['source']}"
+            )
 
-# Footer
-st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #666; margin-top: 2rem;'>
-    <p>🚦 Smart Traffic Management System | Powered by AI & Real-time Data</p>
-    <p>Made with ❤️ for Bangalore Traffic Management</p>
-</div>
-""", unsafe_allow_html=True)
+    elif from_location == to_location:
+        st.info("🔄 Please select different start and destination locations to view routes.")
+    else:
+        st.warning("⚠️ Route mapping not available for selected locations. Showing traffic prediction only.")
+
+if profiler is not None:
+    profiler.stop()
+    profile_path = profiler.save(PROFILE_DIR, profile_name, {
+        "from": from_location,
+        "to": to_location,
+        "hour": hour,
+        "weather": weather,
+        "vehicle_counts": count_source,
+        "plan_trip": plan_trip,
+        "city_view": show_city_view,
+        "reachability": show_isochrone,
+        "departure_planner": find_departure,
+        "model_version": model_version,
+    }, PROFILE_MAX_FILES)
+    with debug_expander:
+        st.subheader("⏱️ Profile of This Rerun")
+        st.caption(
+            f"{profiler.duration * 1000:.0f} ms, {sum(profiler.samples.values())} samples; "
+            f"collapsed stacks saved to {profile_path}"
+        )
+        st.dataframe(pd.DataFrame(profiler.top_functions(PROFILE_TOP_N)), use_container_width=True, hide_index=True)
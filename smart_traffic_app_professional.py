@@ -7,17 +7,15 @@ Version: 2.0
 """
 
 import streamlit as st
-import pandas as pd
-import joblib
-import openrouteservice
 import folium
 from streamlit_folium import folium_static
-from config import ORS_API_KEY
 from openrouteservice.exceptions import ApiError
 import logging
-import time
 from datetime import datetime
 import plotly.graph_objects as go
+from traffic_engine import WARMUP_ROUTE_PAIRS, get_engine, model_locations
+from traffic_scoring import WEATHER_OPTIONS
+from warmup import WARMUP_PARAM, warmup_requested
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -59,131 +57,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load and cache data for better performance"""
-    try:
-        traffic_data = pd.read_csv("bangalore_traffic.csv")
-        logger.info(f"Loaded traffic data with {len(traffic_data)} records")
-        return traffic_data
-    except Exception as e:
-        logger.error(f"Error loading traffic data: {e}")
-        st.error("Failed to load traffic data. Please check if the file exists.")
-        return None
+engine = get_engine()
 
-@st.cache_resource
-def load_model():
-    """Load and cache ML model"""
-    try:
-        model = joblib.load("traffic_classifier.pkl")
-        logger.info("ML model loaded successfully")
-        return model
-    except Exception as e:
-        logger.error(f"Error loading model: {e}")
-        st.error("Failed to load ML model. Please check if the file exists.")
-        return None
+def create_route_map(from_location, to_location, coords_map, hour, weather):
+    """Create interactive route map with multiple route options
 
-@st.cache_data
-def get_location_coordinates():
-    """Return comprehensive location coordinates for Bangalore"""
-    return {
-        "Brigade Road": (12.9754, 77.6045),
-        "Commercial Street": (12.9771, 77.6105),
-        "MG Road": (12.9765, 77.6045),
-        "Church Street": (12.9723, 77.6118),
-        "Electronic City": (12.8452, 77.6604),
-        "Whitefield": (12.9698, 77.7499),
-        "Koramangala": (12.9345, 77.6232),
-        "BTM Layout": (12.9162, 77.6101),
-        "Indiranagar": (12.9784, 77.6392),
-        "Marathahalli": (12.9592, 77.6974),
-        "Hebbal": (13.0358, 77.5970),
-        "Silk Board": (12.9172, 77.6237),
-        "Bannerghatta Road": (12.8913, 77.5979),
-        "Hosur Road": (12.9169, 77.6298),
-        "Outer Ring Road": (12.9345, 77.6891),
-        "Sarjapura Road": (12.9012, 77.6891),
-        "Mysore Road": (12.9563, 77.5132),
-        "Tumkur Road": (13.0287, 77.5619),
-        "Bellary Road": (13.0068, 77.5893),
-        "Old Airport Road": (12.9587, 77.6784),
-        "Double Road": (12.9632, 77.5841),
-        "Richmond Road": (12.9612, 77.6012),
-        "Residency Road": (12.9712, 77.6012),
-        "Cunningham Road": (12.9789, 77.6022),
-        "Lavelle Road": (12.9709, 77.6012),
-        "Infantry Road": (12.9812, 77.5998),
-        "Race Course Road": (12.9843, 77.5987),
-        "Palace Road": (12.9987, 77.5921),
-        "Majestic": (12.9763, 77.5715),
-        "City Railway Station": (12.9763, 77.5715)
-    }
-
-def get_vehicle_count(location, hour, weather, traffic_data):
-    """Calculate estimated vehicle count based on historical data"""
+    Durations are adjusted for the traffic expected at hour in weather.
+    """
     try:
-        filter_conditions = [
-            (traffic_data["LOCATION"] == location) &
-            (pd.to_datetime(traffic_data["TIME"], format="%H:%M").dt.hour == hour) &
-            (traffic_data["WEATHER"] == weather),
-            
-            (traffic_data["LOCATION"] == location) &
-            (pd.to_datetime(traffic_data["TIME"], format="%H:%M").dt.hour == hour),
-            
-            (traffic_data["LOCATION"] == location)
-        ]
-
-        vehicle_count = 75  # Default fallback value
-
-        for condition in filter_conditions:
-            filtered = traffic_data[condition]
-            if not filtered.empty:
-                vehicle_count = int(filtered["VEHICLE_COUNT"].mean())
-                break
-                
-        return vehicle_count
-    except Exception as e:
-        logger.error(f"Error calculating vehicle count: {e}")
-        return 75
-
-def predict_traffic(model, location, hour, weather, vehicle_count):
-    """Predict traffic conditions using ML model"""
-    try:
-        input_data = pd.DataFrame(columns=model.feature_names_in_)
-        input_data.loc[0] = 0
-        input_data.at[0, "HOUR"] = hour
-        input_data.at[0, "VEHICLE_COUNT"] = vehicle_count
-
-        weather_col = f"WEATHER_{weather}"
-        location_col = f"LOCATION_{location}"
-        
-        if weather_col in input_data.columns:
-            input_data.at[0, weather_col] = 1
-        if location_col in input_data.columns:
-            input_data.at[0, location_col] = 1
-
-        prediction = model.predict(input_data)[0]
-        confidence = model.predict_proba(input_data)[0].max()
-        
-        return prediction, confidence
-    except Exception as e:
-        logger.error(f"Error predicting traffic: {e}")
-        return 1, 0.5
-
-def create_route_map(from_location, to_location, coords_map):
-    """Create interactive route map with multiple route options"""
-    try:
-        client = openrouteservice.Client(key=ORS_API_KEY)
-        from_coords = coords_map[from_location][::-1]
-        to_coords = coords_map[to_location][::-1]
-
-        route = client.directions(
-            coordinates=[from_coords, to_coords],
-            profile='driving-car',
-            format='geojson',
-            validate=True,
-            alternative_routes={"share_factor": 0.5, "target_count": 3},
-        )
+        route = engine.fetch_routes(coords_map[from_location][::-1], coords_map[to_location][::-1]).value
+        if route is None:
+            return None, [], {}
 
         midpoint = [
             (coords_map[from_location][0] + coords_map[to_location][0])/2,
@@ -193,13 +77,15 @@ def create_route_map(from_location, to_location, coords_map):
         m = folium.Map(location=midpoint, zoom_start=13, tiles='OpenStreetMap')
         colors = ['blue', 'green', 'purple']
         route_details = []
+        free_flow, durations = engine.route_durations(route, hour, weather)
         
         for i, feature in enumerate(route['features']):
             summary = feature['properties']['summary']
             route_details.append({
                 "number": i+1,
                 "distance": summary['distance']/1000,
-                "duration": summary['duration']/60,
+                "duration": durations[i],
+                "free_flow": free_flow[i],
                 "color": colors[i % len(colors)]
             })
 
@@ -240,10 +126,17 @@ def create_route_map(from_location, to_location, coords_map):
         return None, [], {}
 
 # Initialize data
-traffic_data = load_data()
-model = load_model()
-
-if traffic_data is None or model is None:
+try:
+    vehicle_stats = engine.vehicle_stats
+except Exception as e:
+    logger.error(f"Error loading traffic data: {e}")
+    st.error("Failed to load traffic data. Please check if the file exists.")
+    st.stop()
+try:
+    model, model_version = engine.model_manager.snapshot()
+except Exception as e:
+    logger.error(f"Error loading model: {e}")
+    st.error("Failed to load ML model. Please check if the file exists.")
     st.stop()
 
 # Main header
@@ -255,8 +148,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Extract location list from model features
-location_list = sorted({col.split("LOCATION_")[-1] for col in model.feature_names_in_ if col.startswith("LOCATION_")})
-weather_options = ["Clear", "Rainy", "Cloudy", "Foggy"]
+location_list = model_locations(model)
+weather_options = WEATHER_OPTIONS
+
+# Headless warm-up run from warmup.py before this worker takes traffic
+if warmup_requested(st.query_params.get(WARMUP_PARAM)):
+    engine.warm_up(location_list, WARMUP_ROUTE_PAIRS)
 
 # Sidebar for input controls
 with st.sidebar:
@@ -282,8 +179,8 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.header("📊 Traffic Analysis")
     
-    vehicle_count = get_vehicle_count(to_location, hour, weather, traffic_data)
-    prediction, confidence = predict_traffic(model, to_location, hour, weather, vehicle_count)
+    vehicle_count = engine.vehicle_counts(to_location, [hour], weather)[0]
+    prediction, confidence = engine.predict(model, to_location, hour, weather, vehicle_count)
     
     traffic_status = "Low Traffic" if prediction == 0 else "High Traffic"
     status_color = "🟢" if prediction == 0 else "🔴"
@@ -338,11 +235,11 @@ with col2:
 # Route Planning Section
 st.header("🗺️ Route Planning & Navigation")
 
-coords_map = get_location_coordinates()
+coords_map = engine.coords_map(location_list)
 
 if from_location != to_location and from_location in coords_map and to_location in coords_map:
     with st.spinner("🔄 Calculating optimal routes..."):
-        route_map, route_details, best_route = create_route_map(from_location, to_location, coords_map)
+        route_map, route_details, best_route = create_route_map(from_location, to_location, coords_map, hour, weather)
     
     if route_map:
         st.markdown("### 🗺 Interactive Route Map")
@@ -364,6 +261,7 @@ if from_location != to_location and from_location in coords_map and to_location
                         <h4>{emoji} Route {detail['number']}</h4>
                         📏 Distance: {detail['distance']:.1f} km<br>
                         ⏱ Time: {detail['duration']:.1f} mins<br>
+                        🚦 Without traffic: {detail['free_flow']:.1f} mins<br>
                         🎨 Color: <span style='color: {border_color}'>●</span>
                     </div>
                     """, unsafe_allow_html=True)
@@ -0,0 +1,16 @@
+"""
+Shared test setup
+Modules that read config.py get config_template.py's settings when no
+config.py has been created (setup.sh copies the template the same way)
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import importlib
+import sys
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    sys.modules["config"] = importlib.import_module("config_template")
@@ -0,0 +1,46 @@
+"""
+Tests for the hashed sketch in anomaly_detector.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+
+import anomaly_detector
+from anomaly_detector import AnomalyDetector, HashedEwmaSketch
+
+
+def test_a_locations_slots_never_share_a_cell():
+    sketch = HashedEwmaSketch()
+    for location in ("segment-1", "segment-2", 42):
+        cells = [sketch._cells(location, slot) for slot in range(24 * 5)]
+        for row in range(sketch.depth):
+            assert len({location_cells[row] for location_cells in cells}) == len(cells)
+            assert all(row * sketch.width <= location_cells[row] < (row + 1) * sketch.width for location_cells in cells)
+
+
+def test_cells_are_the_same_in_every_process():
+    code = "from anomaly_detector import HashedEwmaSketch; print(HashedEwmaSketch()._cells('segment-7', 13))"
+    directory = os.path.dirname(os.path.abspath(anomaly_detector.__file__))
+    printed = {
+        subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True, check=True).stdout
+        for _ in range(2)
+    }
+    assert printed == {f"{HashedEwmaSketch()._cells('segment-7', 13)}\n"}
+
+
+def test_sketched_locations_alert_like_exact_ones():
+    detector = AnomalyDetector(max_locations=1, warmup=20)
+    for day in range(40):
+        for location in ("exact", "sketched-a", "sketched-b"):
+            assert detector.update(location, 8, "Clear", 80 + day % 3, day) is None
+    assert detector.sketched == 80
+    event = detector.update("sketched-a", 8, "Clear", 250, 40)
+    assert event is not None and event.location == "sketched-a" and event.z > detector.threshold
+    restored = pickle.loads(pickle.dumps(detector))
+    assert restored.update("sketched-b", 8, "Clear", 250, 41) is not None
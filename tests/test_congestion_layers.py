@@ -0,0 +1,58 @@
+"""
+Tests for the city-wide congestion layers in congestion_layers.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from congestion_layers import score_city_grid
+from location_registry import LOCATION_COORDINATES
+from location_search import reconcile_coordinates
+from traffic_scoring import WEATHER_OPTIONS, aggregate_vehicle_stats, model_locations
+
+LOCATIONS = ["BTM Layout", "Brigade Road", "ORR (Outer Ring Road)", "Hosur Road"]
+
+
+class RecordingForest(RandomForestClassifier):
+    def predict_proba(self, X):
+        self.scored = X
+        return super().predict_proba(X)
+
+
+def _traffic_model():
+    rng = np.random.default_rng(0)
+    n_rows = 2000
+    records = pd.DataFrame({
+        "LOCATION": rng.choice(LOCATIONS, n_rows),
+        "HOUR": rng.integers(0, 24, n_rows),
+        "WEATHER": rng.choice(WEATHER_OPTIONS, n_rows),
+        "VEHICLE_COUNT": rng.poisson(80, n_rows),
+    })
+    features = pd.get_dummies(records[["HOUR", "VEHICLE_COUNT", "WEATHER", "LOCATION"]], dtype=float)
+    model = RecordingForest(n_estimators=5, max_depth=4, random_state=0)
+    model.fit(features, (records["VEHICLE_COUNT"] > 80).astype(int))
+    return model, aggregate_vehicle_stats(records)
+
+
+def test_every_scored_location_sets_a_location_feature():
+    model, vehicle_stats = _traffic_model()
+    coords_map = reconcile_coordinates(model_locations(model), LOCATION_COORDINATES)
+    layers = score_city_grid(model, vehicle_stats, coords_map)
+
+    assert sorted(layers["locations"]) == sorted(LOCATIONS)
+    location_columns = [column for column in model.scored.columns if column.startswith("LOCATION_")]
+    assert (model.scored[location_columns].sum(axis=1) == 1).all()
+    orr = list(layers["locations"]).index("ORR (Outer Ring Road)")
+    assert tuple(layers["coords"][orr]) == tuple(np.float32(LOCATION_COORDINATES["Outer Ring Road"]))
+
+
+def test_locations_without_coordinates_are_left_out():
+    model, vehicle_stats = _traffic_model()
+    layers = score_city_grid(model, vehicle_stats, LOCATION_COORDINATES)
+    assert "ORR (Outer Ring Road)" not in set(layers["locations"])
+    assert len(layers["locations"]) == len(LOCATIONS) - 1
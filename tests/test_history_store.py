@@ -0,0 +1,109 @@
+"""
+Tests for the partitioned history store in history_store.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from history_store import HistoryStore, read_manifest, write_history  # noqa: E402
+from traffic_frame import load_traffic_frame  # noqa: E402
+
+LOCATIONS = ["Silk Board", "Hebbal", "BTM Layout", "Whitefield", "Majestic"]
+WEATHERS = ["Clear", "Rainy", "Cloudy"]
+
+
+def _records(days=20, rows_per_day=60, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-03-01", periods=days).repeat(rows_per_day)
+    return pd.DataFrame({
+        "DATE": dates.strftime("%Y-%m-%d"),
+        "TIME": [f"{hour:02d}:{minute:02d}" for hour, minute in
+                 zip(rng.integers(0, 24, len(dates)), rng.integers(0, 60, len(dates)))],
+        "LOCATION": rng.choice(LOCATIONS, len(dates)),
+        "WEATHER": rng.choice(WEATHERS, len(dates)),
+        "VEHICLE_COUNT": rng.poisson(80, len(dates)),
+    })
+
+
+def _sorted(frame):
+    frame = frame[["DATE", "TIME", "LOCATION", "WEATHER", "VEHICLE_COUNT"]].astype(
+        {"DATE": str, "TIME": str, "LOCATION": str, "WEATHER": str, "VEHICLE_COUNT": int})
+    return frame.sort_values(list(frame.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("query", [
+    dict(),
+    dict(start="2025-03-05", end="2025-03-09"),
+    dict(days=3, locations=["Hebbal"]),
+    dict(locations=["Silk Board", "Majestic"], hours=[8, 9, 10], weekdays=range(5)),
+    dict(weathers=["Rainy"], start="2025-03-18"),
+])
+def test_query_matches_a_pandas_filter(tmp_path, query):
+    records = _records()
+    write_history(records, tmp_path, buckets=4)
+    result = HistoryStore(tmp_path).query(**query)
+
+    dates = pd.to_datetime(records["DATE"])
+    hours = pd.to_datetime(records["TIME"], format="%H:%M").dt.hour
+    mask = np.ones(len(records), dtype=bool)
+    if "days" in query:
+        mask &= dates > dates.max() - pd.Timedelta(days=query["days"])
+    if "start" in query:
+        mask &= dates >= pd.Timestamp(query["start"])
+    if "end" in query:
+        mask &= dates <= pd.Timestamp(query["end"])
+    if "locations" in query:
+        mask &= records["LOCATION"].isin(query["locations"])
+    if "hours" in query:
+        mask &= hours.isin(query["hours"])
+    if "weekdays" in query:
+        mask &= dates.dt.dayofweek.isin(list(query["weekdays"]))
+    if "weathers" in query:
+        mask &= records["WEATHER"].isin(query["weathers"])
+    pd.testing.assert_frame_equal(_sorted(result), _sorted(records[mask]))
+
+
+def test_partition_counts(tmp_path):
+    records = _records(days=10)
+    write_history(records, tmp_path, buckets=4)
+    buckets, partitions = read_manifest(tmp_path)
+    assert buckets == 4 and len(partitions) == 10
+
+    store = HistoryStore(tmp_path)
+    total = sum(len(files) for files in partitions.values())
+    store.query()
+    assert store.last_query["total_partitions"] == total
+    store.query(start="2025-03-03", end="2025-03-04", locations=["Hebbal"])
+    assert store.last_query["partitions"] == 2
+
+    # Rewriting a day replaces only its partitions; a new bucket count rebuilds the store
+    write_history(records[records["DATE"] == "2025-03-10"].head(5), tmp_path, buckets=4)
+    assert len(store.query(start="2025-03-10")) == 5
+    assert len(store.query(end="2025-03-09")) == (records["DATE"] < "2025-03-10").sum()
+    write_history(records, tmp_path, buckets=2)
+    buckets, partitions = read_manifest(tmp_path)
+    assert buckets == 2 and all(set(files) <= {0, 1} for files in partitions.values())
+    assert len(HistoryStore(tmp_path).query()) == len(records)
+
+
+def test_day_first_dates(tmp_path):
+    records = _records(days=15)
+    day_first = records.assign(DATE=pd.to_datetime(records["DATE"]).dt.strftime("%d/%m/%Y"))
+    path = tmp_path / "day_first.csv"
+    day_first.to_csv(path, index=False)
+
+    write_history(pd.read_csv(path), tmp_path / "store", date_format="%d/%m/%Y")
+    _, partitions = read_manifest(tmp_path / "store")
+    assert sorted(partitions) == sorted(records["DATE"].unique())
+    # 03/04 is the 3rd of April, not the 4th of March
+    frame = load_traffic_frame(path, date_format="%d/%m/%Y")
+    assert list(frame["DATE"].astype(str)) == list(records["DATE"])
+    with pytest.raises(ValueError):
+        write_history(pd.read_csv(path), tmp_path / "guessed")
@@ -0,0 +1,102 @@
+"""
+Tests for the fuzzy location search and name reconciliation in location_search.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import pytest
+
+from location_registry import LOCATION_COORDINATES
+from location_search import LocationIndex, mismatch_report, normalize, reconcile, reconcile_coordinates
+
+NAMES = [
+    "Whitefield",
+    "Whitefield Main Road",
+    "Mahatma Gandhi Road",
+    "Outer Ring Road",
+    "Koramangala 5th Block",
+    "Indiranagar 100 Feet Road",
+    "Silk Board",
+    "Electronic City",
+    "Electronic City Phase 1",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LocationIndex(NAMES)
+
+
+def test_normalize_spells_out_abbreviations():
+    assert normalize("MG Rd.") == "mahatma gandhi road"
+    assert normalize("ORR") == "outer ring road"
+    assert normalize("Church St & Brigade") == "church street and brigade"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("whitefeild", "Whitefield"),
+    ("koramangla", "Koramangala 5th Block"),
+    ("MG Rd", "Mahatma Gandhi Road"),
+    ("orr", "Outer Ring Road"),
+    ("SILK BOARD", "Silk Board"),
+    ("indira", "Indiranagar 100 Feet Road"),
+])
+def test_misspelled_and_abbreviated_queries_rank_the_location_first(index, query, expected):
+    assert index.search(query, limit=3)[0].name == expected
+
+
+def test_exact_name_outranks_longer_names_it_prefixes(index):
+    matches = index.search("Electronic City", limit=3)
+    assert [match.name for match in matches[:2]] == ["Electronic City", "Electronic City Phase 1"]
+    assert matches[0].score > matches[1].score
+
+
+def test_scores_are_sorted_and_limited(index):
+    matches = index.search("road", limit=2)
+    assert len(matches) == 2
+    assert matches[0].score >= matches[1].score
+    assert index.search("xyzzy") == []
+    assert index.search("  ") == []
+
+
+def test_parenthesized_names_are_found_by_each_part():
+    index = LocationIndex(["ORR (Outer Ring Road)", "Hosur Road"])
+    assert index.best_match("ORR").name == "ORR (Outer Ring Road)"
+    assert index.best_match("Outer Ring Road").name == "ORR (Outer Ring Road)"
+
+
+def test_reconcile_maps_names_to_exact_or_closest_counterparts():
+    resolved = reconcile(["Silk Board", "Whitefeild", "ORR (Outer Ring Road)", "Nowhere Junction 99"], NAMES)
+    assert resolved["Silk Board"].name == "Silk Board"
+    assert resolved["Silk Board"].score is None
+    assert resolved["ORR (Outer Ring Road)"].name == "Outer Ring Road"
+    assert resolved["Nowhere Junction 99"] is None
+    # A typo is only reconciled when the caller accepts weaker matches
+    assert resolved["Whitefeild"] is None
+    assert reconcile(["Whitefeild"], NAMES, min_score=0.4)["Whitefeild"].name == "Whitefield"
+
+
+def test_reconcile_coordinates_adds_matched_names_only():
+    names = ["ORR (Outer Ring Road)", "Silk Board", "Nowhere Junction 99"]
+    coords_map = reconcile_coordinates(names, LOCATION_COORDINATES)
+
+    assert coords_map["ORR (Outer Ring Road)"] == LOCATION_COORDINATES["Outer Ring Road"]
+    assert coords_map["Silk Board"] == LOCATION_COORDINATES["Silk Board"]
+    assert "Nowhere Junction 99" not in coords_map
+    assert set(coords_map) - set(LOCATION_COORDINATES) == {"ORR (Outer Ring Road)"}
+    assert "ORR (Outer Ring Road)" not in LOCATION_COORDINATES
+
+
+def test_mismatch_report_lists_names_missing_from_each_source():
+    rows = mismatch_report({"model": ["ORR (Outer Ring Road)", "Silk Board"], "registry": NAMES})
+    missing_from_registry = [row for row in rows if row["missing_from"] == "registry"]
+    assert missing_from_registry == [{
+        "location": "ORR (Outer Ring Road)",
+        "found_in": "model",
+        "missing_from": "registry",
+        "closest_match": "Outer Ring Road",
+        "score": 1.0,
+    }]
+    assert {row["location"] for row in rows if row["missing_from"] == "model"} == set(NAMES) - {"Silk Board"}
@@ -0,0 +1,40 @@
+"""
+Tests for timestamp bucketing in probe_ingest.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import numpy as np
+import pandas as pd
+
+from probe_ingest import hour_indexes
+
+# 2025-05-01 03:30 UTC, 09:00 IST
+EPOCH_SECONDS = 1746070200
+
+
+def test_epoch_and_iso_forms_of_an_instant_share_an_hour():
+    epoch = hour_indexes(pd.Series([EPOCH_SECONDS]))
+    for iso in ("2025-05-01T03:30:00Z", "2025-05-01T03:30:00+00:00", "2025-05-01T09:00:00+05:30",
+                "2025-04-30T23:30:00-04:00"):
+        assert hour_indexes(pd.Series([iso])).tolist() == epoch.tolist(), iso
+
+
+def test_local_date_times_are_not_shifted():
+    local = hour_indexes(pd.Series(["2025-05-01 09:00", "2025-05-01T09:59:59"]))
+    assert local.tolist() == hour_indexes(pd.Series([EPOCH_SECONDS] * 2)).tolist()
+
+
+def test_mixed_offsets_and_local_date_times():
+    mixed = pd.Series(["2025-05-01T03:30:00Z", "2025-05-01T09:00:00+05:30", "2025-05-01 09:15",
+                       "2025-05-01T05:00:00+00:00"], index=[7, 3, 9, 1])
+    expected = hour_indexes(pd.Series([EPOCH_SECONDS])).item()
+    assert hour_indexes(mixed).tolist() == [expected, expected, expected, expected + 1]
+
+
+def test_utc_offset_applies_to_both_forms():
+    for minutes in (0, -240, 330):
+        assert np.array_equal(hour_indexes(pd.Series([EPOCH_SECONDS]), minutes),
+                              hour_indexes(pd.Series(["2025-05-01T03:30:00Z"]), minutes))
@@ -0,0 +1,195 @@
+"""
+Tests for the stale-while-revalidate cache and circuit breaker in route_cache.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import threading
+import time
+
+import pytest
+
+from route_cache import CircuitBreaker, CircuitOpenError, StaleWhileRevalidateCache
+from shared_cache import create_cache_backend
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Service:
+    """Fetch function returning numbered responses, or failing on demand"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    def __call__(self, key):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("ORS unavailable")
+        return f"{key}#{self.calls}"
+
+
+def _wait_for_refresh(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache.stats()["refreshing"]:
+        assert time.monotonic() < deadline, "background refresh did not finish"
+        time.sleep(0.01)
+
+
+def _failing():
+    raise ConnectionError("ORS unavailable")
+
+
+def test_fresh_entries_are_served_from_the_cache():
+    clock = FakeClock()
+    service = Service()
+    cache = StaleWhileRevalidateCache(ttl=60, clock=clock)
+
+    first = cache.get("route", service, "route")
+    clock.advance(30)
+    second = cache.get("route", service, "route")
+
+    assert first.value == second.value == "route#1"
+    assert (second.age, second.stale, second.refreshing) == (30, False, False)
+    assert service.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_served_stale_while_refreshing():
+    clock = FakeClock()
+    service = Service()
+    cache = StaleWhileRevalidateCache(ttl=60, clock=clock)
+    cache.get("route", service, "route")
+
+    clock.advance(90)
+    stale = cache.get("route", service, "route")
+    assert stale.value == "route#1"
+    assert stale.stale and stale.refreshing
+    assert stale.age == 90
+
+    _wait_for_refresh(cache)
+    refreshed = cache.get("route", service, "route")
+    assert refreshed.value == "route#2"
+    assert not refreshed.stale
+    assert service.calls == 2
+
+
+def test_failed_refresh_keeps_serving_the_stale_entry():
+    clock = FakeClock()
+    service = Service()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=clock)
+    cache = StaleWhileRevalidateCache(ttl=60, breaker=breaker, clock=clock)
+    cache.get("route", service, "route")
+
+    service.failing = True
+    clock.advance(90)
+    assert cache.get("route", service, "route").refreshing
+    _wait_for_refresh(cache)
+    assert breaker.state == "open"
+
+    # While the breaker is open the stale entry is served without a refresh
+    stale = cache.get("route", service, "route")
+    assert stale.value == "route#1"
+    assert stale.stale and not stale.refreshing
+    assert service.calls == 2
+
+    # and a miss fails fast instead of calling the service
+    with pytest.raises(CircuitOpenError):
+        cache.get("other", service, "other")
+    assert service.calls == 2
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    clock = FakeClock()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(5)
+        return "fresh"
+
+    cache = StaleWhileRevalidateCache(ttl=60, clock=clock)
+    cache.get("route", lambda: "old")
+    clock.advance(90)
+
+    results = [cache.get("route", slow_fetch) for _ in range(3)]
+    release.set()
+    _wait_for_refresh(cache)
+
+    assert [result.value for result in results] == ["old"] * 3
+    assert all(result.refreshing for result in results)
+    assert len(calls) == 1
+    assert cache.get("route", slow_fetch).value == "fresh"
+
+
+def test_entries_are_shared_through_the_backend():
+    backend = create_cache_backend("memory://")
+    service = Service()
+    first = StaleWhileRevalidateCache(ttl=60, backend=backend)
+    second = StaleWhileRevalidateCache(ttl=60, backend=backend)
+
+    first.get("route", service, "route")
+    result = second.get("route", service, "route")
+
+    assert result.value == "route#1"
+    assert service.calls == 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30, clock=clock)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_failing)
+    assert breaker.state == "closed"
+    assert breaker.call(lambda: "ok") == "ok"
+
+    # A success resets the count, so three more failures are needed
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(_failing)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+    assert breaker.rejected == 1
+
+
+def test_half_open_probe_closes_or_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, clock=clock)
+    with pytest.raises(ConnectionError):
+        breaker.call(_failing)
+
+    clock.advance(29)
+    assert not breaker.allow_request()
+
+    # After the timeout one probe goes through; others wait for its outcome
+    clock.advance(1)
+    assert breaker.allow_request()
+    assert breaker.state == "half_open"
+    assert not breaker.allow_request()
+
+    # A failed probe re-opens the breaker for another recovery_timeout
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.advance(29)
+    assert not breaker.allow_request()
+
+    clock.advance(1)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
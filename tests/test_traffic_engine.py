@@ -0,0 +1,63 @@
+"""
+Tests for ORS calls made through the shared TrafficEngine
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import route_flight
+from traffic_engine import TrafficEngine
+
+CALLERS = 8
+
+
+class FailingClient:
+    """ORS client whose calls fail once every caller has joined the flight"""
+
+    def __init__(self, coalesced_before):
+        self.coalesced_before = coalesced_before
+        self.calls = 0
+
+    def _fail(self, **kwargs):
+        self.calls += 1
+        deadline = time.monotonic() + 5
+        while route_flight.stats()["coalesced"] - self.coalesced_before < CALLERS - 1:
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        raise RuntimeError("ORS unavailable")
+
+    directions = _fail
+    distance_matrix = _fail
+
+
+@pytest.mark.parametrize("call", [
+    lambda engine: engine.fetch_route_through([(77.59, 12.97), (77.62, 12.93)]),
+    lambda engine: engine.fetch_travel_time_matrix(((12.97, 77.59), (12.93, 77.62))),
+])
+def test_one_shared_ors_failure_counts_once(call):
+    engine = TrafficEngine(cache_backend_url="memory://", ors_api_key="test", ors_base_url="http://127.0.0.1:9")
+    client = FailingClient(route_flight.stats()["coalesced"])
+    engine.ors_client = lambda: client
+
+    def caller():
+        try:
+            call(engine)
+        except RuntimeError:
+            pass
+
+    threads = [threading.Thread(target=caller) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.calls == 1
+    assert engine.ors_breaker._failures == 1
+    assert engine.ors_breaker.state == "closed"
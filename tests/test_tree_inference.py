@@ -0,0 +1,77 @@
+"""
+Tests for the NumPy forest evaluator in tree_inference.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from tree_inference import CompiledForest
+
+N_FEATURES = 6
+
+
+def _training_data(seed=0, n_rows=2000):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    y = np.digitize(X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=n_rows), [-1.0, 0.0, 1.0])
+    return pd.DataFrame(X, columns=[f"f{i}" for i in range(N_FEATURES)]), y
+
+
+@pytest.mark.parametrize("estimator", [
+    DecisionTreeClassifier(max_depth=10, random_state=0),
+    RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0),
+    ExtraTreesClassifier(n_estimators=20, random_state=0),
+])
+def test_matches_sklearn_on_random_inputs(estimator):
+    X, y = _training_data()
+    model = estimator.fit(X, y)
+    compiled = CompiledForest(model, delegate_rows=None)
+    rng = np.random.default_rng(1)
+    for n_rows in (1, 7, 500):
+        inputs = pd.DataFrame(rng.normal(scale=2.0, size=(n_rows, N_FEATURES)), columns=X.columns)
+        assert np.allclose(compiled.predict_proba(inputs), model.predict_proba(inputs))
+        assert np.array_equal(compiled.predict(inputs), model.predict(inputs))
+
+
+def test_matches_sklearn_with_missing_values():
+    X, y = _training_data()
+    X = X.mask(np.random.default_rng(2).random(X.shape) < 0.1)
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    compiled = CompiledForest(model, delegate_rows=None)
+    inputs = X.sample(300, random_state=3)
+    assert np.allclose(compiled.predict_proba(inputs), model.predict_proba(inputs))
+
+
+def test_only_batches_from_delegate_rows_use_sklearn():
+    X, y = _training_data()
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+    calls = []
+
+    class Recording(RandomForestClassifier):
+        def predict_proba(self, X):
+            calls.append(len(X))
+            return super().predict_proba(X)
+
+    model.__class__ = Recording
+    compiled = CompiledForest(model, delegate_rows=100)
+    compiled.predict_proba(X.iloc[:99])
+    assert calls == []
+    compiled.predict_proba(X.iloc[:100])
+    compiled.predict(X.iloc[:500])
+    assert calls == [100, 500]
+
+
+def test_calibrated_threshold():
+    X, y = _training_data()
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    crossover = CompiledForest(model, delegate_rows=None).calibrate(sizes=(64, 256), repeats=1)
+    assert crossover is None or (isinstance(crossover, int) and crossover >= 1)
+    delegate_rows = CompiledForest(model).delegate_rows
+    assert delegate_rows is None or delegate_rows >= 1
@@ -0,0 +1,79 @@
+"""
+Tests for the multi-stop tour heuristics in trip_optimizer.py
+Run from the repository root with: python -m pytest -q tests
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from trip_optimizer import estimate_travel_times, solve_tour, tour_cost
+
+
+def _city_times(seed, n_stops):
+    """Straight-line travel times between random stops in a 10 km square"""
+    rng = np.random.default_rng(seed)
+    coords = np.column_stack([12.9 + rng.random(n_stops) * 0.1, 77.5 + rng.random(n_stops) * 0.1])
+    return estimate_travel_times(coords)
+
+
+def _brute_force(times, start, return_to_start):
+    others = [stop for stop in range(len(times)) if stop != start]
+    return min(
+        tour_cost([start, *order], times, return_to_start) for order in itertools.permutations(others)
+    )
+
+
+@pytest.mark.parametrize("return_to_start", [True, False])
+def test_tours_are_close_to_brute_force_optimum(return_to_start):
+    optimal = 0
+    cases = [(seed, n_stops, start) for seed in range(40) for n_stops in range(3, 9) for start in (0, n_stops - 1)]
+    for seed, n_stops, start in cases:
+        times = _city_times(seed, n_stops)
+        tour, cost = solve_tour(times, start, return_to_start)
+
+        assert tour[0] == start
+        assert sorted(tour) == list(range(n_stops))
+        assert cost == pytest.approx(tour_cost(tour, times, return_to_start))
+        best = _brute_force(times, start, return_to_start)
+        assert cost <= best * 1.15
+        optimal += cost <= best + 1e-9
+    assert optimal >= 0.9 * len(cases)
+
+
+def test_open_path_does_not_return_through_the_start():
+    # Stops on a line: the best open path from the middle visits the nearer
+    # end first, while a closed tour costs the same either way round
+    positions = np.array([0.0, 1.0, 2.0, 3.0, 5.0, 8.0])
+    times = np.abs(positions[:, None] - positions[None, :])
+
+    tour, cost = solve_tour(times, start=2, return_to_start=False)
+
+    assert set(tour[1:3]) == {0, 1}
+    assert list(tour[3:]) == [3, 4, 5]
+    assert cost == pytest.approx(10.0)
+    assert cost == pytest.approx(_brute_force(times, 2, False))
+    assert solve_tour(times, start=2, return_to_start=True)[1] == pytest.approx(16.0)
+
+
+def test_open_path_from_an_end_runs_straight_through():
+    positions = np.array([4.0, 0.0, 7.0, 1.0, 2.0])
+    times = np.abs(positions[:, None] - positions[None, :])
+
+    tour, cost = solve_tour(times, start=1, return_to_start=False)
+
+    assert list(tour) == [1, 3, 4, 0, 2]
+    assert cost == pytest.approx(7.0)
+
+
+@pytest.mark.parametrize("n_stops", [1, 2])
+def test_tiny_trips(n_stops):
+    times = _city_times(0, n_stops)
+    tour, cost = solve_tour(times, start=n_stops - 1)
+    assert sorted(tour) == list(range(n_stops))
+    assert tour[0] == n_stops - 1
+    assert cost == pytest.approx(tour_cost(tour, times))
@@ -0,0 +1,589 @@
+"""
+Traffic engine
+Data, model, statistics, caches and routing shared by every frontend in a
+process: smart_traffic_app.py, smart_traffic_app_professional.py,
+streamlit_route_app.py and the command line
+
+get_engine() returns the process-wide engine. Each resource (traffic frame,
+model manager, vehicle statistics, forecaster, route cache, ...) is built
+on first use by whichever session needs it first and then reused by every
+session and frontend, so no rerun reloads an artifact. Settings come from
+config.py.
+
+Usage:
+    python traffic_engine.py --from "Silk Board" --to "Hebbal" [--hour 9] [--weather Clear] [--route]
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import openrouteservice
+
+import config
+import trip_optimizer
+from anomaly_detector import SKETCH_HASH, Z_THRESHOLD, build_detector
+from congestion_layers import LAYERS_FILE, layers_match, load_layers, score_city_grid
+from eta_estimator import (
+    FIT_WINDOW_ROWS,
+    ROUTE_LOG_FILE,
+    ROUTE_LOG_MAX_BYTES,
+    EtaEstimator,
+    log_route,
+    read_route_log,
+)
+from isochrones import TRAVEL_TIMES_FILE, estimate_travel_times_matrix, load_travel_times
+from location_registry import LOCATION_COORDINATES
+from location_search import LocationIndex, reconcile_coordinates
+from model_manager import ModelManager
+from route_cache import CircuitBreaker, StaleWhileRevalidateCache
+from route_calibration import (
+    SLOWDOWN_TABLE_FILE,
+    RouteCalibrator,
+    calibration_match,
+    fit_slowdowns,
+    load_calibration,
+)
+from shared_cache import create_cache_backend, file_version, make_key
+from shared_stats import load_shared_stats
+from single_flight import route_flight
+from traffic_frame import DATE_FORMAT, load_traffic_frame, memory_report
+from traffic_scoring import (
+    WEATHER_OPTIONS,
+    get_vehicle_counts,
+    model_locations,
+    predict_traffic_batch,
+    score_departure_hours,
+)
+from tree_inference import load_model
+from vehicle_forecast import STATE_VERSION, build_forecaster
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_DATA_FILE = getattr(config, "TRAFFIC_DATA_FILE", "bangalore_traffic.csv")
+DATE_FORMAT = getattr(config, "DATE_FORMAT", DATE_FORMAT)
+MODEL_FILE = getattr(config, "MODEL_FILE", "traffic_classifier.pkl")
+ORS_API_KEY = getattr(config, "ORS_API_KEY", None)
+ORS_BASE_URL = getattr(config, "ORS_BASE_URL", "https://api.openrouteservice.org")
+ROUTE_CACHE_TTL = getattr(config, "ROUTE_CACHE_TTL", 3600)
+CONGESTION_DELAY_FACTOR = getattr(config, "CONGESTION_DELAY_FACTOR", 0.5)
+ROUTE_FETCH_TIMEOUT = getattr(config, "ROUTE_FETCH_TIMEOUT", 5)
+ROUTE_FETCH_WORKERS = getattr(config, "ROUTE_FETCH_WORKERS", 8)
+ORS_FAILURE_THRESHOLD = getattr(config, "ORS_FAILURE_THRESHOLD", 5)
+ORS_RECOVERY_TIMEOUT = getattr(config, "ORS_RECOVERY_TIMEOUT", 30)
+CONGESTION_LAYERS_FILE = getattr(config, "CONGESTION_LAYERS_FILE", LAYERS_FILE)
+TRAVEL_TIMES_FILE = getattr(config, "TRAVEL_TIMES_FILE", TRAVEL_TIMES_FILE)
+SLOWDOWN_TABLE_FILE = getattr(config, "SLOWDOWN_TABLE_FILE", SLOWDOWN_TABLE_FILE)
+CACHE_BACKEND_URL = getattr(config, "CACHE_BACKEND_URL", "sqlite:///traffic_cache.db")
+SHARED_STATS_DIR = getattr(config, "SHARED_STATS_DIR", None)
+FORECAST_HISTORY_DAYS = getattr(config, "FORECAST_HISTORY_DAYS", 7)
+MODEL_CHECK_INTERVAL = getattr(config, "MODEL_CHECK_INTERVAL", 10)
+INFERENCE_BACKEND = getattr(config, "INFERENCE_BACKEND", "sklearn")
+ROUTE_LOG_FILE = getattr(config, "ROUTE_LOG_FILE", ROUTE_LOG_FILE)
+ROUTE_LOG_MAX_BYTES = getattr(config, "ROUTE_LOG_MAX_BYTES", ROUTE_LOG_MAX_BYTES)
+ETA_FIT_WINDOW = getattr(config, "ETA_FIT_WINDOW", FIT_WINDOW_ROWS)
+ETA_REFIT_INTERVAL = getattr(config, "ETA_REFIT_INTERVAL", 3600)
+ANOMALY_REPLAY_DAYS = getattr(config, "ANOMALY_REPLAY_DAYS", 7)
+ANOMALY_Z_THRESHOLD = getattr(config, "ANOMALY_Z_THRESHOLD", Z_THRESHOLD)
+WARMUP_ROUTE_PAIRS = getattr(config, "WARMUP_ROUTE_PAIRS", [])
+
+
+class TrafficEngine:
+    """Lazily built, thread-safe resources and the operations frontends run on them
+
+    Resources are properties built once under a per-resource lock, so
+    concurrent sessions wait for one load instead of each starting their
+    own. Results that depend on the model take the model and version read
+    from one model_manager.snapshot(), so a rerun never mixes two models.
+    """
+
+    def __init__(self, data_file=TRAFFIC_DATA_FILE, model_file=MODEL_FILE, cache_backend_url=CACHE_BACKEND_URL,
+                 ors_api_key=ORS_API_KEY, ors_base_url=ORS_BASE_URL, route_log_file=ROUTE_LOG_FILE):
+        self.data_file = data_file
+        self.model_file = model_file
+        self.cache_backend_url = cache_backend_url
+        self.ors_api_key = ors_api_key
+        self.ors_base_url = ors_base_url
+        self.route_log_file = route_log_file
+        self._resources = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _resource(self, name, build):
+        """Return resource name, building it once even with concurrent callers"""
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+        with self._locks_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._resources:
+                self._resources[name] = build()
+            return self._resources[name]
+
+    # Data and model
+
+    @property
+    def traffic_data(self):
+        """Traffic records with memory-optimized dtypes, shared read-only by every session"""
+        return self._resource("traffic_data", self._load_traffic_data)
+
+    def _load_traffic_data(self):
+        traffic_data = load_traffic_frame(self.data_file, DATE_FORMAT)
+        report = memory_report(traffic_data)
+        logger.info(
+            f"Loaded traffic data with {report['rows']} records: {report['optimized_mb']:.1f} MB "
+            f"(default dtypes: {report['default_mb']:.1f} MB)"
+        )
+        return traffic_data
+
+    @property
+    def model_manager(self):
+        """Active model, reloaded in the background when the artifact is replaced"""
+        return self._resource(
+            "model_manager", lambda: ModelManager(
+                self.model_file, check_interval=MODEL_CHECK_INTERVAL,
+                loader=functools.partial(load_model, backend=INFERENCE_BACKEND),
+            )
+        )
+
+    @property
+    def vehicle_stats(self):
+        """Vehicle count statistics per location/hour/weather, shared across workers
+
+        The first worker on a host loads the CSV, aggregates it and
+        publishes the arrays in shared memory; later workers attach without
+        reading the CSV.
+        """
+        return self._resource(
+            "vehicle_stats",
+            lambda: load_shared_stats(self.data_file, SHARED_STATS_DIR, traffic_loader=lambda path: self.traffic_data),
+        )
+
+    @property
+    def shared_cache(self):
+        """Cache backend shared by every worker process (see CACHE_BACKEND_URL)"""
+        return self._resource("shared_cache", lambda: create_cache_backend(self.cache_backend_url))
+
+    def artifact_version(self, model_version):
+        """Version tag of the data file and active model, used to key shared cache entries"""
+        return f"{file_version(self.data_file)}|{model_version}"
+
+    def _dated_records(self):
+        """Traffic records for building time-ordered state; raises ValueError without a DATE column"""
+        if "DATE" not in self.traffic_data:
+            raise ValueError(f"{self.data_file} has no DATE column")
+        return self.traffic_data
+
+    @property
+    def forecaster(self):
+        """Rolling vehicle-count forecaster warmed with the most recent history
+
+        The warmed state is small and shared with other workers, so only one
+        worker reads the CSV for it. None when the data has no usable dates;
+        callers then use historical averages.
+        """
+        def build():
+            try:
+                return self.shared_cache.get_or_set(
+                    make_key("forecaster", STATE_VERSION, file_version(self.data_file), FORECAST_HISTORY_DAYS),
+                    lambda: build_forecaster(self._dated_records(), FORECAST_HISTORY_DAYS, self.vehicle_stats),
+                )
+            except Exception as e:
+                logger.error(f"Error building vehicle count forecaster, using historical averages: {e}")
+                return None
+
+        return self._resource("forecaster", build)
+
+    @property
+    def anomaly_detector(self):
+        """Streaming anomaly detector seeded on history and run over the most recent days
+
+        None when the data has no usable dates.
+        """
+        def build():
+            try:
+                return self.shared_cache.get_or_set(
+                    make_key(
+                        "anomalies", SKETCH_HASH, file_version(self.data_file), ANOMALY_REPLAY_DAYS,
+                        ANOMALY_Z_THRESHOLD,
+                    ),
+                    lambda: build_detector(self._dated_records(), ANOMALY_REPLAY_DAYS, threshold=ANOMALY_Z_THRESHOLD),
+                )
+            except Exception as e:
+                logger.error(f"Error building anomaly detector, anomaly alerts disabled: {e}")
+                return None
+
+        return self._resource("anomaly_detector", build)
+
+    def congestion_layers(self, model, model_version):
+        """Precomputed city-wide congestion layers
+
+        Falls back to scoring them once per model version in-process when the
+        offline job (congestion_layers.py) has not been run yet, or when its
+        layers were scored from another model or data file.
+        """
+        def build():
+            try:
+                layers = load_layers(CONGESTION_LAYERS_FILE)
+            except FileNotFoundError:
+                logger.warning(f"{CONGESTION_LAYERS_FILE} not found, scoring congestion layers in-process")
+                return score_city_grid(model, self.vehicle_stats, self.coords_map(model_locations(model)))
+            if not layers_match(layers, self.artifact_version(model_version)):
+                logger.warning(
+                    f"{CONGESTION_LAYERS_FILE} was scored for another model or data file, "
+                    f"scoring congestion layers in-process"
+                )
+                return score_city_grid(model, self.vehicle_stats, self.coords_map(model_locations(model)))
+            return layers
+
+        return self._resource(("congestion_layers", model_version), build)
+
+    @property
+    def travel_times_matrix(self):
+        """Precomputed location-to-location travel times, or straight-line estimates without them"""
+        def build():
+            try:
+                return load_travel_times(TRAVEL_TIMES_FILE)
+            except FileNotFoundError:
+                logger.warning(f"{TRAVEL_TIMES_FILE} not found, using straight-line travel time estimates")
+                return estimate_travel_times_matrix()
+
+        return self._resource("travel_times_matrix", build)
+
+    def coords_map(self, model_locations=()):
+        """Registry coordinates, plus model locations named differently in the registry
+
+        Model locations such as "ORR (Outer Ring Road)" get the coordinates
+        of their closest registry match.
+        """
+        return self._resource(
+            ("coords_map", tuple(model_locations)),
+            lambda: reconcile_coordinates(model_locations, LOCATION_COORDINATES),
+        )
+
+    def location_index(self, locations):
+        """Fuzzy search index over a tuple of locations"""
+        return self._resource(("location_index", tuple(locations)), lambda: LocationIndex(locations))
+
+    # Prediction
+
+    def vehicle_counts(self, location, hours, weather, percentile=None):
+        """Historical vehicle counts at several hours (means, or a percentile)"""
+        return get_vehicle_counts(location, hours, weather, self.vehicle_stats, percentile)
+
+    def predict(self, model, location, hour, weather, vehicle_count):
+        """(prediction, confidence) for one location, hour, weather and vehicle count"""
+        predictions, confidences, _ = predict_traffic_batch(model, [location], [hour], [weather], [vehicle_count])
+        return predictions[0], confidences[0]
+
+    def sweep_departure_hours(self, model, model_version, from_location, to_location, weather,
+                              route_minutes=None, percentile=None):
+        """Departure sweep, shared with other workers through the shared cache"""
+        return self.shared_cache.get_or_set(
+            make_key(
+                "departure_sweep", self.artifact_version(model_version), from_location, to_location, weather,
+                route_minutes, percentile,
+            ),
+            lambda: score_departure_hours(
+                model, self.vehicle_stats, from_location, to_location, weather, route_minutes, percentile
+            ),
+        )
+
+    # Routing
+
+    @property
+    def ors_breaker(self):
+        """Process-wide circuit breaker shared by every ORS call
+
+        Calls go through it inside route_flight, so an ORS request shared by
+        several sessions counts as one success or failure.
+        """
+        return self._resource("ors_breaker", lambda: CircuitBreaker(ORS_FAILURE_THRESHOLD, ORS_RECOVERY_TIMEOUT))
+
+    @property
+    def route_cache(self):
+        """Process-wide stale-while-revalidate cache for directions responses"""
+        return self._resource("route_cache", lambda: StaleWhileRevalidateCache(
+            ttl=ROUTE_CACHE_TTL,
+            breaker=self.ors_breaker,
+            fetch_timeout=ROUTE_FETCH_TIMEOUT,
+            backend=self.shared_cache,
+        ))
+
+    @property
+    def route_executor(self):
+        """Process-wide workers that fetch routes while pages render"""
+        return self._resource(
+            "route_executor",
+            lambda: ThreadPoolExecutor(max_workers=ROUTE_FETCH_WORKERS, thread_name_prefix="route-fetch"),
+        )
+
+    def ors_client(self):
+        """ORS client for the configured endpoint (ORS_BASE_URL)"""
+        return openrouteservice.Client(key=self.ors_api_key, base_url=self.ors_base_url)
+
+    def request_routes(self, from_coords, to_coords):
+        """Request alternative routes from ORS
+
+        Identical lookups already in flight in another session share one ORS
+        call. Each response is logged once for the ETA estimator.
+        """
+        client = self.ors_client()
+
+        def directions():
+            route = client.directions(
+                coordinates=[from_coords, to_coords],
+                profile='driving-car',
+                format='geojson',
+                validate=True,
+                alternative_routes={"share_factor": 0.5, "target_count": 3},
+            )
+            log_route(from_coords, to_coords, route, self.route_log_file, ROUTE_LOG_MAX_BYTES)
+            return route
+
+        return route_flight.do(("directions", from_coords, to_coords), directions)
+
+    def fetch_routes(self, from_coords, to_coords):
+        """Return cached alternative routes between two (lon, lat) points
+
+        Returns a CacheResult. Expired routes are served immediately while a
+        background refresh runs, and ORS is skipped while the breaker is open.
+        """
+        return self.route_cache.get(("directions", from_coords, to_coords), self.request_routes, from_coords, to_coords)
+
+    def start_route_fetch(self, from_coords, to_coords):
+        """Start fetching routes in the background; returns a Future of fetch_routes' CacheResult"""
+        return self.route_executor.submit(self.fetch_routes, from_coords, to_coords)
+
+    def route_calibrator(self, model, model_version):
+        """Slowdown multipliers per location/hour/weather for traffic-adjusted route durations
+
+        Uses the table written by route_calibration.py, or calibrates one
+        per model version in-process (fitted on the route log's driven trips
+        where it has enough) when it has not been run yet or was calibrated
+        for another model or data file.
+        """
+        def build():
+            coords_map = self.coords_map(tuple(self.vehicle_stats.locations))
+            try:
+                table = load_calibration(SLOWDOWN_TABLE_FILE)
+                if calibration_match(table, self.artifact_version(model_version)):
+                    return RouteCalibrator(table, self.coords_map(tuple(str(name) for name in table["locations"])))
+                logger.warning(
+                    f"{SLOWDOWN_TABLE_FILE} was calibrated for another model or data file, "
+                    f"calibrating route slowdowns in-process"
+                )
+            except FileNotFoundError:
+                logger.info(f"{SLOWDOWN_TABLE_FILE} not found, calibrating route slowdowns in-process")
+            table = fit_slowdowns(
+                self.vehicle_stats, read_route_log(self.route_log_file), model, coords_map,
+                delay_factor=CONGESTION_DELAY_FACTOR,
+            )
+            return RouteCalibrator(table, coords_map)
+
+        return self._resource(("route_calibrator", model_version), build)
+
+    def route_durations(self, route, hour, weather):
+        """(free-flow minutes, traffic-adjusted minutes) for each alternative in an ORS response"""
+        model, model_version = self.model_manager.snapshot()
+        return self.route_calibrator(model, model_version).adjust(route["features"], hour, weather)
+
+    @property
+    def eta_estimator(self):
+        """ETA estimator fitted on the recent route log, refitted every ETA_REFIT_INTERVAL seconds
+
+        Refits run in a background thread; the previous fit is served until
+        the new one is ready, so no page waits on reading the log.
+        """
+        fitted = self._resource(
+            "eta_estimator", lambda: [EtaEstimator.from_log(self.route_log_file, ETA_FIT_WINDOW), time.monotonic()]
+        )
+        if time.monotonic() - fitted[1] > ETA_REFIT_INTERVAL:
+            with self._locks_lock:
+                start_refit = time.monotonic() - fitted[1] > ETA_REFIT_INTERVAL
+                if start_refit:
+                    # Not due again until this refit has had time to finish
+                    fitted[1] = time.monotonic()
+            if start_refit:
+                threading.Thread(target=self._refit_eta_estimator, args=(fitted,), name="eta-refit",
+                                 daemon=True).start()
+        return fitted[0]
+
+    def _refit_eta_estimator(self, fitted):
+        try:
+            estimator = EtaEstimator.from_log(self.route_log_file, ETA_FIT_WINDOW)
+        except Exception as e:
+            logger.error(f"Error refitting ETA estimator, keeping the previous fit: {e}")
+            return
+        fitted[:] = [estimator, time.monotonic()]
+
+    def fetch_travel_time_matrix(self, stop_coords):
+        """Travel-time matrix in minutes for (lat, lon) stops, and its source
+
+        Uses the ORS matrix endpoint and falls back to a straight-line
+        estimate when it is unavailable (for example above the per-request
+        size limit).
+        """
+        try:
+            client = self.ors_client()
+            matrix = self.shared_cache.get_or_set(
+                make_key("matrix", stop_coords),
+                lambda: route_flight.do(
+                    ("matrix", stop_coords),
+                    self.ors_breaker.call,
+                    client.distance_matrix,
+                    locations=[coords[::-1] for coords in stop_coords],
+                    profile='driving-car',
+                    metrics=['duration'],
+                    validate=True,
+                ),
+                ttl=ROUTE_CACHE_TTL,
+            )
+            durations = np.array(matrix['durations'], dtype=float) / 60
+            if np.isfinite(durations).all():
+                return durations, "OpenRouteService"
+        except Exception as e:
+            logger.error(f"Error fetching travel time matrix: {e}")
+        return trip_optimizer.estimate_travel_times(stop_coords), "Straight-line estimate"
+
+    def fetch_route_through(self, waypoints):
+        """Route geometries through ordered (lon, lat) waypoints, fetched in bulk requests"""
+        client = self.ors_client()
+        features = []
+        for chunk in trip_optimizer.chunk_waypoints(waypoints):
+            route = self.shared_cache.get_or_set(
+                make_key("directions", tuple(chunk)),
+                lambda: route_flight.do(
+                    ("directions", tuple(chunk)),
+                    self.ors_breaker.call,
+                    client.directions,
+                    coordinates=chunk,
+                    profile='driving-car',
+                    format='geojson',
+                ),
+                ttl=ROUTE_CACHE_TTL,
+            )
+            features.extend(route['features'])
+        return features
+
+    def plan_multi_stop_trip(self, model, stops, coords_map, weather, start_hour, return_to_start=False,
+                             percentile=None):
+        """Order delivery stops and apply congestion predictions per leg
+
+        Congestion for every stop and hour is predicted in one batch; the
+        tour is solved at start-hour conditions and then each leg is scaled
+        by the prediction for the hour it is driven. percentile selects
+        pessimistic vehicle counts instead of means.
+        """
+        stop_coords = tuple(coords_map[stop] for stop in stops)
+        times, source = self.fetch_travel_time_matrix(stop_coords)
+
+        hours = np.tile(np.arange(24), len(stops))
+        locations = np.repeat(stops, 24)
+        counts = []
+        for stop in stops:
+            counts += self.vehicle_counts(stop, range(24), weather, percentile)
+        _, _, high_probabilities = predict_traffic_batch(
+            model, locations, hours, [weather] * len(locations), counts
+        )
+        congestion_factors = 1 + CONGESTION_DELAY_FACTOR * high_probabilities.reshape(len(stops), 24)
+
+        solve_start = time.perf_counter()
+        tour, _ = trip_optimizer.solve_tour(
+            times * congestion_factors[:, start_hour][None, :], start=0, return_to_start=return_to_start
+        )
+        solve_ms = (time.perf_counter() - solve_start) * 1000
+
+        legs = trip_optimizer.schedule_legs(tour, times, start_hour, congestion_factors, return_to_start)
+        return {"tour": tour, "legs": legs, "source": source, "solve_ms": solve_ms}
+
+    # Warm-up
+
+    def warm_up(self, locations, route_pairs=WARMUP_ROUTE_PAIRS):
+        """Build everything a first session would otherwise build (see warmup.py)
+
+        Builds every derived index, runs a prediction and a departure sweep,
+        and fetches the routes in route_pairs, waiting for them so the worker
+        is only reported ready once they are cached.
+        """
+        start = time.perf_counter()
+        model, model_version = self.model_manager.snapshot()
+        coords_map = self.coords_map(locations)
+        self.location_index(locations)
+        self.forecaster
+        self.anomaly_detector
+        self.congestion_layers(model, model_version)
+        self.travel_times_matrix
+        self.eta_estimator
+        self.route_calibrator(model, model_version)
+        vehicle_count = self.vehicle_counts(locations[0], [9], WEATHER_OPTIONS[0])[0]
+        self.predict(model, locations[0], 9, WEATHER_OPTIONS[0], vehicle_count)
+        self.sweep_departure_hours(model, model_version, locations[0], locations[-1], WEATHER_OPTIONS[0])
+
+        routes = [
+            self.start_route_fetch(coords_map[a][::-1], coords_map[b][::-1])
+            for a, b in route_pairs if a in coords_map and b in coords_map and a != b
+        ]
+        done, _ = wait(routes, timeout=ROUTE_FETCH_TIMEOUT * max(len(routes), 1))
+        fetched = sum(1 for future in done if future.exception() is None)
+        logger.info(
+            f"Warm-up filled caches in {time.perf_counter() - start:.1f}s "
+            f"({fetched} of {len(route_pairs)} routes fetched)"
+        )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, shared by every session and frontend"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TrafficEngine()
+    return _engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict traffic and fetch routes with the shared engine")
+    parser.add_argument("--from", dest="from_location", default="Brigade Road", help="Start location")
+    parser.add_argument("--to", dest="to_location", default="BTM Layout", help="Destination")
+    parser.add_argument("--hour", type=int, default=9, help="Hour of day (0-23)")
+    parser.add_argument("--weather", default="Clear", choices=WEATHER_OPTIONS, help="Weather")
+    parser.add_argument("--route", action="store_true", help="Also fetch routes from ORS")
+    parser.add_argument("--warm-up", action="store_true", help="Build every resource first and report the time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    start = time.perf_counter()
+    model, model_version = engine.model_manager.snapshot()
+    if args.warm_up:
+        engine.warm_up(model_locations(model), route_pairs=[])
+    vehicle_count = engine.vehicle_counts(args.to_location, [args.hour], args.weather)[0]
+    prediction, confidence = engine.predict(model, args.to_location, args.hour, args.weather, vehicle_count)
+    print(f"{args.to_location} at {args.hour:02d}:00 ({args.weather}): "
+          f"{'High' if prediction == 1 else 'Low'} traffic, {confidence:.0%} confidence, ~{vehicle_count} vehicles "
+          f"({time.perf_counter() - start:.2f}s)")
+
+    if args.route:
+        coords_map = engine.coords_map(model_locations(model))
+        result = engine.fetch_routes(coords_map[args.from_location][::-1], coords_map[args.to_location][::-1])
+        for number, feature in enumerate(result.value['features'], start=1):
+            summary = feature['properties']['summary']
+            print(f"Route {number}: {summary['distance'] / 1000:.1f} km, {summary['duration'] / 60:.0f} mins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Traffic data frame loading
+Reads bangalore_traffic.csv into a compact frame with categorical and narrow dtypes
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_COLUMNS = ["LOCATION", "WEATHER", "TIME", "DATE"]
+# Format of the DATE column: a strptime format such as "%d/%m/%Y" for day-first
+# exports, "ISO8601", or "mixed" to let pandas guess each value
+DATE_FORMAT = "%Y-%m-%d"
+
+# Rows read with default dtypes to measure the unoptimized per-row footprint
+BASELINE_SAMPLE_ROWS = 50000
+
+
+def date_days(dates, date_format=DATE_FORMAT):
+    """Days since the epoch (datetime64[D]) of DATE values, parsing each distinct value once"""
+    dates = pd.Series(dates).astype("category")
+    days = pd.to_datetime(dates.cat.categories, format=date_format).to_numpy("datetime64[D]")
+    return days[dates.cat.codes.to_numpy()]
+
+
+def iso_dates(dates, date_format=DATE_FORMAT):
+    """DATE values as YYYY-MM-DD strings"""
+    dates = pd.Series(dates)
+    return pd.Series(np.datetime_as_string(date_days(dates, date_format), unit="D"), index=dates.index)
+
+
+def load_traffic_frame(path="bangalore_traffic.csv", date_format=DATE_FORMAT):
+    """Load traffic records with memory-optimized dtypes
+
+    LOCATION, WEATHER and TIME become categoricals, HOUR is derived from TIME
+    as int8 and VEHICLE_COUNT is downcast to the narrowest integer type.
+    DATE, read in date_format, becomes categorical YYYY-MM-DD strings. The
+    frame is meant to be shared read-only between sessions.
+    """
+    sample = pd.read_csv(path, nrows=BASELINE_SAMPLE_ROWS)
+    dtypes = {column: "category" for column in CATEGORICAL_COLUMNS if column in sample}
+    traffic_data = pd.read_csv(path, dtype=dtypes)
+    if "DATE" in traffic_data:
+        traffic_data["DATE"] = iso_dates(traffic_data["DATE"], date_format)
+    traffic_data = optimize_traffic_frame(traffic_data)
+    if len(sample):
+        traffic_data.attrs["default_bytes_per_row"] = sample.memory_usage(deep=True).sum() / len(sample)
+    return traffic_data
+
+
+def optimize_traffic_frame(traffic_data):
+    """Convert a traffic frame to categorical and narrow dtypes in place"""
+    for column in CATEGORICAL_COLUMNS:
+        if column in traffic_data and traffic_data[column].dtype != "category":
+            traffic_data[column] = traffic_data[column].astype("category")
+
+    if "HOUR" not in traffic_data and "TIME" in traffic_data:
+        times = traffic_data["TIME"].cat.categories
+        category_hours = pd.to_datetime(pd.Series(times), format="%H:%M").dt.hour.to_numpy("int8")
+        traffic_data["HOUR"] = category_hours[traffic_data["TIME"].cat.codes.to_numpy()]
+    elif "HOUR" in traffic_data:
+        traffic_data["HOUR"] = traffic_data["HOUR"].astype("int8")
+
+    traffic_data["VEHICLE_COUNT"] = pd.to_numeric(traffic_data["VEHICLE_COUNT"], downcast="unsigned")
+    return traffic_data
+
+
+def memory_report(traffic_data):
+    """Return the frame's optimized memory and its default-dtype estimate in MB
+
+    The estimate extrapolates the per-row footprint of a sample read with
+    pandas' default dtypes, recorded by load_traffic_frame.
+    """
+    current = traffic_data.memory_usage(deep=True).sum()
+    baseline = traffic_data.attrs.get("default_bytes_per_row", 0) * len(traffic_data)
+    return {
+        "rows": len(traffic_data),
+        "optimized_mb": current / 1024 ** 2,
+        "default_mb": baseline / 1024 ** 2,
+        "saved_ratio": 1 - current / baseline if baseline else 0.0,
+    }
@@ -0,0 +1,268 @@
+"""
+Traffic scoring helpers
+Vectorized vehicle-count lookups and batched predictions shared by the app and offline jobs
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WEATHER_OPTIONS = ["Clear", "Rainy", "Cloudy", "Foggy"]
+DEFAULT_VEHICLE_COUNT = 75
+
+# Percentiles stored per cell, so any whole percentile is a table lookup
+QUANTILE_GRID = np.arange(101)
+# Cells per block when building quantile tables, to bound temporary memory
+QUANTILE_BLOCK = 4096
+
+
+class VehicleStats:
+    """Mean vehicle counts per location/hour/weather held in dense arrays
+
+    location_hour_weather[l, h, w] is NaN where no records exist. Lookups
+    fall back to the location/hour mean, then the location mean, then
+    DEFAULT_VEHICLE_COUNT, matching get_vehicle_count on the raw frame.
+    The *_quantiles arrays hold the same levels with a trailing axis of
+    percentiles 0-100 (see QUANTILE_GRID).
+    """
+
+    def __init__(self, locations, weathers, location_hour_weather, location_hour, location,
+                 location_hour_weather_quantiles=None, location_hour_quantiles=None, location_quantiles=None):
+        self.locations = list(locations)
+        self.weathers = list(weathers)
+        self.location_index = {name: i for i, name in enumerate(self.locations)}
+        self.weather_index = {name: i for i, name in enumerate(self.weathers)}
+        self.location_hour_weather = location_hour_weather
+        self.location_hour = location_hour
+        self.location = location
+        self.location_hour_weather_quantiles = location_hour_weather_quantiles
+        self.location_hour_quantiles = location_hour_quantiles
+        self.location_quantiles = location_quantiles
+
+    @property
+    def has_quantiles(self):
+        return self.location_hour_weather_quantiles is not None
+
+    def counts(self, location, hours, weather, percentile=None):
+        """Vehicle counts for one location and weather at several hours
+
+        Truncated means by default, or the given percentile (0-100, rounded
+        to a whole percentile) when the quantile tables are available.
+        """
+        hours = np.asarray(hours, dtype=int)
+        l = self.location_index.get(location)
+        if l is None:
+            return [DEFAULT_VEHICLE_COUNT] * len(hours)
+        if percentile is None or not self.has_quantiles:
+            by_weather, by_hour, overall = self.location_hour_weather, self.location_hour, self.location
+        else:
+            p = int(round(percentile))
+            by_weather = self.location_hour_weather_quantiles[..., p]
+            by_hour = self.location_hour_quantiles[..., p]
+            overall = self.location_quantiles[..., p]
+        means = by_hour[l, hours]
+        w = self.weather_index.get(weather)
+        if w is not None:
+            specific = by_weather[l, hours, w]
+            means = np.where(np.isnan(specific), means, specific)
+        means = np.where(np.isnan(means), overall[l], means)
+        means = np.where(np.isnan(means), DEFAULT_VEHICLE_COUNT, means)
+        return means.astype(int).tolist()
+
+    def percentiles(self, location, hour, weather, percentiles=(50, 90, 99)):
+        """Vehicle counts at several percentiles for one location, hour and weather
+
+        Returns a dict of percentile -> count with the same fallbacks as
+        counts(), or None without quantile tables or for unknown locations.
+        """
+        l = self.location_index.get(location)
+        if l is None or not self.has_quantiles:
+            return None
+        # Whole cells are either empty (all NaN) or filled, so checking p0 is enough
+        w = self.weather_index.get(weather)
+        row = self.location_hour_weather_quantiles[l, hour, w] if w is not None else None
+        if row is None or np.isnan(row[0]):
+            row = self.location_hour_quantiles[l, hour]
+        if np.isnan(row[0]):
+            row = self.location_quantiles[l]
+        if np.isnan(row[0]):
+            return None
+        return {p: int(row[int(round(p))]) for p in percentiles}
+
+    def arrays(self):
+        """The statistics arrays by name, in constructor order"""
+        arrays = {
+            "location_hour_weather": self.location_hour_weather,
+            "location_hour": self.location_hour,
+            "location": self.location,
+        }
+        if self.has_quantiles:
+            arrays["location_hour_weather_quantiles"] = self.location_hour_weather_quantiles
+            arrays["location_hour_quantiles"] = self.location_hour_quantiles
+            arrays["location_quantiles"] = self.location_quantiles
+        return arrays
+
+
+def quantile_table(cells, values, size):
+    """Percentiles 0-100 of values in each of size cells, NaN for empty cells
+
+    Values are sorted by cell once; each percentile is then read off the
+    sorted run with numpy's default linear interpolation.
+    """
+    order = np.lexsort((values, cells))
+    sorted_values = values[order]
+    counts = np.bincount(cells, minlength=size)
+    starts = np.cumsum(counts) - counts
+    table = np.full((size, len(QUANTILE_GRID)), np.nan)
+    fractions = QUANTILE_GRID / 100
+    for block in range(0, size, QUANTILE_BLOCK):
+        n = counts[block:block + QUANTILE_BLOCK, None]
+        filled = n[:, 0] > 0
+        positions = (n - 1) * fractions
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, n - 1)
+        weight = positions - lower
+        base = starts[block:block + QUANTILE_BLOCK, None]
+        low_values = sorted_values[(base + lower)[filled]]
+        high_values = sorted_values[(base + upper)[filled]]
+        table[block:block + QUANTILE_BLOCK][filled] = low_values + (high_values - low_values) * weight[filled]
+    return table
+
+
+def aggregate_vehicle_stats(traffic_data):
+    """Aggregate mean vehicle counts per location/hour/weather into a VehicleStats
+
+    Uses one bincount pass over integer codes instead of pandas groupbys.
+    """
+    if "HOUR" in traffic_data:
+        hours = traffic_data["HOUR"].to_numpy(dtype=np.int64)
+    else:
+        hours = pd.to_datetime(traffic_data["TIME"], format="%H:%M").dt.hour.to_numpy(dtype=np.int64)
+    location_codes, locations = pd.factorize(traffic_data["LOCATION"], sort=True)
+    weather_codes, weathers = pd.factorize(traffic_data["WEATHER"], sort=True)
+    valid = (location_codes >= 0) & (weather_codes >= 0)
+    n_locations, n_weathers = len(locations), len(weathers)
+
+    cells = ((location_codes * 24 + hours) * n_weathers + weather_codes)[valid]
+    size = n_locations * 24 * n_weathers
+    weights = traffic_data["VEHICLE_COUNT"].to_numpy(dtype=np.float64)[valid]
+    sums = np.bincount(cells, weights=weights, minlength=size).reshape(n_locations, 24, n_weathers)
+    records = np.bincount(cells, minlength=size).reshape(n_locations, 24, n_weathers)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        location_hour_weather = sums / records
+        location_hour = sums.sum(axis=2) / records.sum(axis=2)
+        location = sums.sum(axis=(1, 2)) / records.sum(axis=(1, 2))
+
+    location_hour_cells = (location_codes * 24 + hours)[valid]
+    quantiles = (
+        quantile_table(cells, weights, size).reshape(n_locations, 24, n_weathers, -1),
+        quantile_table(location_hour_cells, weights, n_locations * 24).reshape(n_locations, 24, -1),
+        quantile_table(location_codes[valid], weights, n_locations),
+    )
+
+    return VehicleStats(
+        [str(name) for name in locations],
+        [str(name) for name in weathers],
+        location_hour_weather,
+        location_hour,
+        location,
+        *quantiles,
+    )
+
+
+def model_locations(model):
+    """Locations the model has a feature for, sorted"""
+    return sorted({col.split("LOCATION_")[-1] for col in model.feature_names_in_ if col.startswith("LOCATION_")})
+
+
+def get_vehicle_counts(location, hours, weather, vehicle_stats, percentile=None):
+    """Estimate vehicle counts for several hours using pre-aggregated statistics
+
+    Follows the same fallback order as get_vehicle_count: location/hour/weather,
+    then location/hour, then location, then the default of 75. With a
+    percentile (e.g. 90 for pessimistic planning) that percentile of the
+    recorded counts is used instead of the mean.
+    """
+    return vehicle_stats.counts(location, hours, weather, percentile)
+
+
+def predict_traffic_batch(model, locations, hours, weathers, vehicle_counts):
+    """Predict traffic conditions for many inputs with a single model call
+
+    Returns arrays of predictions, confidences and probabilities of high traffic.
+    """
+    n_rows = len(locations)
+    try:
+        feature_names = list(model.feature_names_in_)
+        column_index = {name: i for i, name in enumerate(feature_names)}
+        matrix = np.zeros((n_rows, len(feature_names)))
+        matrix[:, column_index["HOUR"]] = hours
+        matrix[:, column_index["VEHICLE_COUNT"]] = vehicle_counts
+
+        for row, (location, weather) in enumerate(zip(locations, weathers)):
+            weather_col = column_index.get(f"WEATHER_{weather}")
+            location_col = column_index.get(f"LOCATION_{location}")
+            if weather_col is not None:
+                matrix[row, weather_col] = 1
+            if location_col is not None:
+                matrix[row, location_col] = 1
+
+        probabilities = model.predict_proba(pd.DataFrame(matrix, columns=feature_names))
+        classes = list(model.classes_)
+        predictions = np.asarray(model.classes_)[probabilities.argmax(axis=1)]
+        confidences = probabilities.max(axis=1)
+        # Anything other than class 0 is reported as high traffic
+        low_index = classes.index(0) if 0 in classes else 0
+        high_probabilities = 1 - probabilities[:, low_index]
+
+        return predictions, confidences, high_probabilities
+    except Exception as e:
+        logger.error(f"Error predicting traffic batch: {e}")
+        return np.ones(n_rows, dtype=int), np.full(n_rows, 0.5), np.full(n_rows, 0.5)
+
+
+def score_departure_hours(model, vehicle_stats, from_location, to_location, weather, route_minutes=None,
+                          percentile=None):
+    """Score all 24 departure hours for an origin-destination pair
+
+    Destination (and, when a route duration is given, origin) conditions for
+    every hour are predicted in one batch. With a route, the destination is
+    scored at the estimated arrival hour. Lower scores are better. Vehicle
+    counts are means, or the given percentile for pessimistic planning.
+    """
+    hours = np.arange(24)
+    arrival_hours = hours if route_minutes is None else (hours + int(round(route_minutes / 60))) % 24
+
+    locations = [to_location] * 24
+    batch_hours = list(arrival_hours)
+    counts = get_vehicle_counts(to_location, arrival_hours, weather, vehicle_stats, percentile)
+    if route_minutes is not None:
+        locations += [from_location] * 24
+        batch_hours += list(hours)
+        counts += get_vehicle_counts(from_location, hours, weather, vehicle_stats, percentile)
+
+    predictions, confidences, high_probabilities = predict_traffic_batch(
+        model, locations, batch_hours, [weather] * len(locations), counts
+    )
+
+    score = high_probabilities[:24]
+    if route_minutes is not None:
+        score = (score + high_probabilities[24:]) / 2
+
+    sweep = pd.DataFrame({
+        "HOUR": hours,
+        "PREDICTION": predictions[:24],
+        "CONFIDENCE": confidences[:24],
+        "VEHICLE_COUNT": counts[:24],
+        "SCORE": score,
+    })
+    sweep = sweep.sort_values(["SCORE", "VEHICLE_COUNT", "HOUR"]).reset_index(drop=True)
+    sweep.insert(0, "RANK", np.arange(1, 25))
+    return sweep
@@ -0,0 +1,210 @@
+"""
+Multi-stop trip optimizer for delivery routes
+Orders a set of registry locations with fast tour heuristics over a NumPy travel-time matrix
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Used to estimate travel times when no routed matrix is available
+DEFAULT_SPEED_KMH = 25.0
+DEFAULT_DETOUR_FACTOR = 1.3
+
+# ORS accepts at most 50 waypoints in a single directions request
+MAX_WAYPOINTS_PER_REQUEST = 50
+
+
+def haversine_matrix(coords):
+    """Return the pairwise great-circle distance matrix in km for (lat, lon) pairs"""
+    points = np.radians(np.asarray(coords, dtype=float))
+    lat = points[:, 0][:, None]
+    lon = points[:, 1][:, None]
+    a = (np.sin((lat - lat.T) / 2) ** 2
+         + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def estimate_travel_times(coords, speed_kmh=DEFAULT_SPEED_KMH, detour_factor=DEFAULT_DETOUR_FACTOR):
+    """Estimate a travel-time matrix in minutes from straight-line distances"""
+    return haversine_matrix(coords) * detour_factor / speed_kmh * 60
+
+
+def tour_cost(tour, times, return_to_start=False):
+    """Total travel time of visiting the stops in tour order"""
+    tour = np.asarray(tour)
+    cost = times[tour[:-1], tour[1:]].sum()
+    if return_to_start and len(tour) > 1:
+        cost += times[tour[-1], tour[0]]
+    return float(cost)
+
+
+def nearest_neighbour_tour(times, start=0):
+    """Build a tour by always driving to the closest unvisited stop"""
+    n_stops = len(times)
+    visited = np.zeros(n_stops, dtype=bool)
+    tour = np.empty(n_stops, dtype=int)
+    tour[0] = start
+    visited[start] = True
+    for position in range(1, n_stops):
+        distances = np.where(visited, np.inf, times[tour[position - 1]])
+        tour[position] = int(distances.argmin())
+        visited[tour[position]] = True
+    return tour
+
+
+def two_opt(tour, times, tolerance=1e-9):
+    """Improve a closed tour by reversing segments (best-improvement 2-opt)
+
+    The first stop never moves. All candidate moves are scored in one
+    vectorized pass per improvement, assuming a symmetric matrix.
+    """
+    tour = np.array(tour)
+    n_stops = len(tour)
+    if n_stops < 4:
+        return tour
+
+    positions = np.arange(n_stops)
+    valid = positions[None, :] >= positions[:, None] + 2
+    valid[0, n_stops - 1] = False
+
+    while True:
+        a = tour
+        b = np.roll(tour, -1)
+        delta = (times[a[:, None], a[None, :]] + times[b[:, None], b[None, :]]
+                 - times[a, b][:, None] - times[a, b][None, :])
+        delta = np.where(valid, delta, 0)
+        i, j = np.unravel_index(delta.argmin(), delta.shape)
+        if delta[i, j] >= -tolerance:
+            return tour
+        tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+
+
+def or_opt(tour, times, max_segment=3, tolerance=1e-9):
+    """Improve a closed tour by relocating short segments of 1 to max_segment stops
+
+    Segments may be reinserted in either direction. The first stop never moves.
+    Returns the improved tour and whether any move was made.
+    """
+    tour = np.array(tour)
+    n_stops = len(tour)
+    improved = False
+    moved = True
+
+    while moved:
+        moved = False
+        for length in range(1, max_segment + 1):
+            if n_stops - length < 3:
+                break
+            i = 1
+            while i + length <= n_stops:
+                segment = tour[i:i + length]
+                rest = np.concatenate([tour[:i], tour[i + length:]])
+                prev_stop = tour[i - 1]
+                next_stop = tour[(i + length) % n_stops]
+                first, last = segment[0], segment[-1]
+
+                removal_gain = (times[prev_stop, first] + times[last, next_stop]
+                                - times[prev_stop, next_stop])
+                u = rest
+                v = np.roll(rest, -1)
+                forward = times[u, first] + times[last, v] - times[u, v]
+                backward = times[u, last] + times[first, v] - times[u, v]
+                # Reinserting at the gap it came from is not a move
+                forward[i - 1] = np.inf
+                backward[i - 1] = np.inf
+
+                best_forward = int(forward.argmin())
+                best_backward = int(backward.argmin())
+                if forward[best_forward] <= backward[best_backward]:
+                    position, insertion, insert = best_forward, forward[best_forward], segment
+                else:
+                    position, insertion, insert = best_backward, backward[best_backward], segment[::-1]
+
+                if insertion - removal_gain < -tolerance:
+                    tour = np.concatenate([rest[:position + 1], insert, rest[position + 1:]])
+                    moved = improved = True
+                else:
+                    i += 1
+    return tour, improved
+
+
+def solve_tour(times, start=0, return_to_start=False, max_rounds=50):
+    """Find a short visiting order over a travel-time matrix
+
+    Seeds with nearest-neighbour, then alternates 2-opt and Or-opt until
+    neither improves. Asymmetric matrices are symmetrized for the search;
+    the returned cost always uses the original matrix.
+
+    Returns (tour, cost) where tour is an array of stop indices starting at start.
+    """
+    times = np.asarray(times, dtype=float)
+    n_stops = len(times)
+    if n_stops <= 2:
+        tour = np.array([start] + [i for i in range(n_stops) if i != start], dtype=int)
+        return tour, tour_cost(tour, times, return_to_start)
+
+    search = (times + times.T) / 2
+    if not return_to_start:
+        # A dummy stop tied to the start closes the path so closed-tour moves
+        # apply. Every other edge to it costs the same large constant, so
+        # exactly one is used and it never biases the order.
+        penalty = search.max() * n_stops + 1
+        search = np.pad(search, ((0, 1), (0, 1)), constant_values=penalty)
+        search[n_stops, start] = search[start, n_stops] = 0
+        search[n_stops, n_stops] = 0
+
+    tour = nearest_neighbour_tour(search, start)
+    for _ in range(max_rounds):
+        tour = two_opt(tour, search)
+        tour, improved = or_opt(tour, search)
+        if not improved:
+            break
+
+    if not return_to_start:
+        # Cut the cycle at the dummy, which sits right before or after the start
+        dummy = n_stops
+        if tour[1] == dummy:
+            tour = np.concatenate([tour[:1], tour[2:][::-1]])
+        else:
+            tour = tour[tour != dummy]
+
+    return tour, tour_cost(tour, times, return_to_start)
+
+
+def schedule_legs(tour, times, start_hour, congestion_factors, return_to_start=False):
+    """Walk a tour and apply per-leg congestion at the hour each leg starts
+
+    congestion_factors is a (stops, 24) array of multipliers for arriving at a
+    stop during a given hour. Returns a list of leg dicts with base and
+    adjusted minutes and the departure clock time in minutes since midnight.
+    """
+    stops = list(tour) + ([tour[0]] if return_to_start else [])
+    clock = start_hour * 60.0
+    legs = []
+    for origin, destination in zip(stops[:-1], stops[1:]):
+        hour = int(clock // 60) % 24
+        base = float(times[origin, destination])
+        adjusted = base * float(congestion_factors[destination, hour])
+        legs.append({
+            "from": int(origin),
+            "to": int(destination),
+            "depart_minute": clock,
+            "hour": hour,
+            "base_minutes": base,
+            "minutes": adjusted,
+        })
+        clock += adjusted
+    return legs
+
+
+def chunk_waypoints(waypoints, max_waypoints=MAX_WAYPOINTS_PER_REQUEST):
+    """Split an ordered waypoint list into overlapping chunks for bulk route requests"""
+    waypoints = list(waypoints)
+    if len(waypoints) <= max_waypoints:
+        return [waypoints]
+    step = max_waypoints - 1
+    return [waypoints[i:i + max_waypoints] for i in range(0, len(waypoints) - 1, step)]
@@ -0,0 +1,244 @@
+"""
+Short-horizon vehicle-count forecasting
+Rolling per-location statistics updated in O(1) per observation, used to
+forecast vehicle counts for the next hours from recent trends
+
+For each location the forecaster keeps:
+    - the same-hour means of the last N days (a 24 x N ring buffer with running sums)
+    - a Holt level and trend (EWMAs) of how far recent hours ran above or
+      below their same-hour norm
+
+A forecast is the same-hour norm of each upcoming hour plus the current
+deviation, with the trend damped so it fades over the horizon. State is
+constant-size per location, so the forecaster can follow a streaming feed
+without re-scanning history.
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from traffic_frame import DATE_FORMAT, date_days
+from traffic_scoring import DEFAULT_VEHICLE_COUNT
+
+logger = logging.getLogger(__name__)
+
+FORECAST_HORIZON = 6
+HISTORY_DAYS = 7
+LEVEL_ALPHA = 0.3
+TREND_BETA = 0.1
+TREND_DAMPING = 0.8
+# Changes whenever the pickled forecaster state changes, so cached forecasters are rebuilt
+STATE_VERSION = 2
+
+
+class RollingForecaster:
+    """Hourly vehicle-count state and forecasts for one location
+
+    Observations are grouped into hourly buckets (hours since the epoch).
+    A bucket is folded into the statistics when the first observation of a
+    later hour arrives; observations for already-closed hours are counted
+    as late and ignored. baseline optionally gives 24 prior same-hour means
+    used until the location has its own history for an hour.
+    """
+
+    def __init__(self, days=HISTORY_DAYS, alpha=LEVEL_ALPHA, beta=TREND_BETA,
+                 damping=TREND_DAMPING, baseline=None):
+        self.days = days
+        self.alpha = alpha
+        self.beta = beta
+        self.damping = damping
+        self.baseline = None if baseline is None else np.asarray(baseline, dtype=float)
+        self.same_hour = np.full((24, days), np.nan)
+        self.same_hour_sum = np.zeros(24)
+        self.same_hour_count = np.zeros(24, dtype=int)
+        self._slots = np.zeros(24, dtype=int)
+        self.level = 0.0
+        self.trend = 0.0
+        self.last_hour = None
+        self.bucket = None
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+        self.observations = 0
+        self.late = 0
+
+    def update(self, hour_index, count):
+        """Add one observation for the hour hour_index (hours since the epoch)"""
+        if self.bucket is None:
+            self.bucket = hour_index
+        elif hour_index < self.bucket:
+            self.late += 1
+            return
+        elif hour_index > self.bucket:
+            self._close_bucket()
+            self.bucket = hour_index
+        self._bucket_sum += count
+        self._bucket_count += 1
+        self.observations += 1
+
+    def _close_bucket(self):
+        if not self._bucket_count:
+            return
+        mean = self._bucket_sum / self._bucket_count
+        hour = self.bucket % 24
+        norm = self.norms()[hour]
+        deviation = 0.0 if np.isnan(norm) else mean - norm
+
+        if self.last_hour is None:
+            self.level, self.trend = deviation, 0.0
+        else:
+            steps = self.bucket - self.last_hour
+            level = self.alpha * deviation + (1 - self.alpha) * (self.level + self.trend * steps)
+            self.trend = self.beta * (level - self.level) / steps + (1 - self.beta) * self.trend
+            self.level = level
+
+        slot = self._slots[hour]
+        oldest = self.same_hour[hour, slot]
+        if not np.isnan(oldest):
+            self.same_hour_sum[hour] -= oldest
+            self.same_hour_count[hour] -= 1
+        self.same_hour[hour, slot] = mean
+        self.same_hour_sum[hour] += mean
+        self.same_hour_count[hour] += 1
+        self._slots[hour] = (slot + 1) % self.days
+
+        self.last_hour = self.bucket
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+
+    def norms(self):
+        """Same-hour means of the last N days, falling back to the baseline (NaN if neither)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            norms = self.same_hour_sum / self.same_hour_count
+        if self.baseline is not None:
+            norms = np.where(self.same_hour_count > 0, norms, self.baseline)
+        return norms
+
+    def forecast(self, hours=FORECAST_HORIZON):
+        """Forecast the hours after the current one
+
+        Returns (hour_indexes, counts) as arrays. The open bucket is treated
+        as observed so far; the trend is damped over the horizon.
+        """
+        if self.bucket is None:
+            return np.array([], dtype=np.int64), np.array([], dtype=int)
+        origin = self.last_hour if self.last_hour is not None else self.bucket
+        targets = self.bucket + np.arange(1, hours + 1)
+        steps = targets - origin
+        if self.damping == 1:
+            damped_steps = steps.astype(float)
+        else:
+            damped_steps = self.damping * (1 - self.damping ** steps) / (1 - self.damping)
+        deviation = self.level + self.trend * damped_steps
+
+        norms = self.norms()[targets % 24]
+        counts = np.where(np.isnan(norms), DEFAULT_VEHICLE_COUNT, norms + deviation)
+        return targets, np.maximum(counts, 0).astype(int)
+
+
+class VehicleCountForecaster:
+    """RollingForecaster per location for a stream of traffic records
+
+    baselines optionally maps locations to their 24 historical same-hour
+    means (see location_baselines). Only these small arrays are kept, so
+    pickling the forecaster for other workers never copies the full
+    vehicle statistics.
+    """
+
+    def __init__(self, days=HISTORY_DAYS, alpha=LEVEL_ALPHA, beta=TREND_BETA,
+                 damping=TREND_DAMPING, baselines=None):
+        self.days = days
+        self.alpha = alpha
+        self.beta = beta
+        self.damping = damping
+        self.baselines = baselines or {}
+        self.locations = {}
+
+    def _location(self, location):
+        forecaster = self.locations.get(location)
+        if forecaster is None:
+            baseline = self.baselines.get(location)
+            forecaster = RollingForecaster(self.days, self.alpha, self.beta, self.damping, baseline)
+            self.locations[location] = forecaster
+        return forecaster
+
+    def update(self, location, timestamp, count):
+        """Add one observation; timestamp is anything pandas can parse"""
+        self._location(location).update(hour_index(timestamp), count)
+
+    def update_frame(self, records):
+        """Add traffic records (DATE, TIME or HOUR, LOCATION, VEHICLE_COUNT) in time order"""
+        hours = record_hour_indexes(records)
+        order = np.argsort(hours, kind="stable")
+        locations = records["LOCATION"].to_numpy()[order]
+        counts = records["VEHICLE_COUNT"].to_numpy()[order]
+        for location, hour, count in zip(locations, hours[order].tolist(), counts.tolist()):
+            self._location(location).update(hour, count)
+
+    def latest_hour(self):
+        """Most recent hour bucket seen for any location, or None"""
+        buckets = [f.bucket for f in self.locations.values() if f.bucket is not None]
+        return max(buckets) if buckets else None
+
+    def forecast(self, location, hours=FORECAST_HORIZON):
+        """Forecast counts for the hours after the latest observed hour
+
+        Locations are aligned to the feed's latest hour, so a location that
+        has gone quiet still forecasts the same upcoming hours. Returns a
+        DataFrame with TIMESTAMP, HOUR and VEHICLE_COUNT, or None when the
+        location has never been observed.
+        """
+        forecaster = self.locations.get(location)
+        latest = self.latest_hour()
+        if forecaster is None or latest is None:
+            return None
+        lag = latest - forecaster.bucket
+        targets, counts = forecaster.forecast(hours + lag)
+        targets, counts = targets[lag:], counts[lag:]
+        return pd.DataFrame({
+            "TIMESTAMP": pd.to_datetime(targets, unit="h"),
+            "HOUR": targets % 24,
+            "VEHICLE_COUNT": counts,
+        })
+
+
+def hour_index(timestamp):
+    """Hours since the epoch for a timestamp"""
+    return int(pd.Timestamp(timestamp).value // 3_600_000_000_000)
+
+
+def record_hour_indexes(records, date_format=DATE_FORMAT):
+    """Hours since the epoch for each traffic record, parsing each distinct date once in date_format"""
+    days = date_days(records["DATE"], date_format).astype(np.int64)
+    if "HOUR" in records:
+        hours = records["HOUR"].to_numpy(dtype=np.int64)
+    else:
+        hours = pd.to_datetime(records["TIME"], format="%H:%M").dt.hour.to_numpy(dtype=np.int64)
+    return days * 24 + hours
+
+
+def location_baselines(vehicle_stats):
+    """{location: 24 historical same-hour means}, copied out of VehicleStats"""
+    return {
+        location: np.array(vehicle_stats.location_hour[i], dtype=float)
+        for location, i in vehicle_stats.location_index.items()
+    }
+
+
+def build_forecaster(traffic_data, days=HISTORY_DAYS, vehicle_stats=None, **params):
+    """Warm a VehicleCountForecaster with the last days of recorded history
+
+    vehicle_stats supplies the per-location baselines.
+    """
+    if vehicle_stats is not None:
+        params["baselines"] = location_baselines(vehicle_stats)
+    forecaster = VehicleCountForecaster(days, **params)
+    hours = record_hour_indexes(traffic_data)
+    recent = hours >= hours.max() - days * 24
+    forecaster.update_frame(traffic_data[recent])
+    logger.info(f"Warmed forecaster with {recent.sum()} records from the last {days} days")
+    return forecaster
@@ -0,0 +1,244 @@
+"""
+Startup warm-up and readiness
+Starts a Streamlit worker, fills its caches with one headless session, and
+only then reports it ready, so no user pays for the cold start
+
+The warm-up session opens the app with ?warmup=<token> over Streamlit's
+own websocket, exactly like a browser would. The app then loads the data
+and model, builds its derived indexes, runs a prediction and prefetches
+routes for WARMUP_ROUTE_PAIRS (config.py) into the same process caches
+real sessions use. The token is generated per start and handed to the
+worker in TRAFFIC_WARMUP_TOKEN; requests without it are ignored, so
+visitors cannot make a worker warm up. Point the load balancer's readiness check at
+http://<host>:<readiness-port>/ready: it answers 503 until the warm-up
+session has finished without errors and 200 afterwards. /live answers 200
+while the worker process is running.
+
+Usage:
+    python warmup.py [--app smart_traffic_app.py] [--port 8501] [--readiness-port 8502] [-- <streamlit options>]
+    python warmup.py --url http://127.0.0.1:8501 --token <TRAFFIC_WARMUP_TOKEN of the worker>
+
+Author: Smart Traffic Team
+Version: 2.0
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PARAM = "warmup"
+WARMUP_TOKEN_ENV = "TRAFFIC_WARMUP_TOKEN"
+DEFAULT_PORT = 8501
+READINESS_PORT = 8502
+# Seconds allowed for the worker to start and the warm-up session to finish
+WARMUP_TIMEOUT = 600
+RETRY_INTERVAL = 10
+
+
+def warmup_requested(value, token=None):
+    """Whether a ?warmup= value carries this worker's warm-up token
+
+    token defaults to the TRAFFIC_WARMUP_TOKEN environment variable; a
+    worker started without one never warms up on request.
+    """
+    token = os.environ.get(WARMUP_TOKEN_ENV) if token is None else token
+    return bool(token) and value is not None and hmac.compare_digest(str(value), token)
+
+
+def wait_for_health(url, timeout=WARMUP_TIMEOUT, process=None):
+    """Poll the Streamlit health endpoint until it answers ok"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Streamlit exited with code {process.returncode} before becoming healthy")
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become healthy within {timeout}s")
+
+
+async def _run_session(url, query_string, timeout):
+    try:
+        import websockets
+    except ImportError as e:
+        raise ImportError("The websockets package is required for the warm-up session (pip install websockets)") from e
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    stream_url = url.replace("http", "ws", 1) + "/_stcore/stream"
+    exceptions = []
+    async with websockets.connect(stream_url, subprotocols=["streamlit"], max_size=None) as websocket:
+        request = BackMsg()
+        request.rerun_script.query_string = query_string
+        await websocket.send(request.SerializeToString())
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await asyncio.wait_for(websocket.recv(), timeout))
+            kind = message.WhichOneof("type")
+            if kind == "delta" and message.delta.new_element.WhichOneof("type") == "exception":
+                exceptions.append(message.delta.new_element.exception.message)
+            elif kind == "script_finished":
+                return message.script_finished, exceptions
+
+
+def run_session(url, token, timeout=WARMUP_TIMEOUT):
+    """Run the app once in a headless warm-up session; returns the seconds it took
+
+    Raises RuntimeError if the script raised or did not finish normally.
+    """
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    start = time.perf_counter()
+    query_string = urllib.parse.urlencode({WARMUP_PARAM: token})
+    status, exceptions = asyncio.run(_run_session(url, query_string, timeout))
+    if exceptions:
+        raise RuntimeError(f"Warm-up run raised: {exceptions[0]}")
+    if status != ForwardMsg.FINISHED_SUCCESSFULLY:
+        raise RuntimeError(f"Warm-up run did not finish ({ForwardMsg.ScriptFinishedStatus.Name(status)})")
+    return time.perf_counter() - start
+
+
+class ReadinessServer:
+    """HTTP readiness (/ready) and liveness (/live) endpoints for one worker"""
+
+    def __init__(self, port=READINESS_PORT, host="0.0.0.0", process=None):
+        self.process = process
+        self.state = "starting"
+        self.detail = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def set_state(self, state, **detail):
+        with self._lock:
+            self.state = state
+            self.detail = detail
+        logger.info(f"Worker {state} {detail or ''}")
+
+    def status(self):
+        with self._lock:
+            state, detail = self.state, dict(self.detail)
+        if self.process is not None and self.process.poll() is not None:
+            state = "exited"
+        return {"status": state, **detail}
+
+    def _handler_class(self):
+        readiness = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = readiness.status()
+                if self.path.startswith("/ready"):
+                    code = 200 if status["status"] == "ready" else 503
+                elif self.path.startswith("/live"):
+                    code = 200 if status["status"] != "exited" else 503
+                else:
+                    code, status = 404, {"error": f"Unknown path {self.path}"}
+                data = json.dumps(status).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="readiness", daemon=True)
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        logger.info(f"Readiness endpoint listening on http://{host}:{port}/ready")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def warm_up(url, token, readiness=None, timeout=WARMUP_TIMEOUT, process=None, retry_interval=RETRY_INTERVAL):
+    """Wait for the worker, then run warm-up sessions with its token until one succeeds"""
+    wait_for_health(url, timeout, process)
+    attempt = 0
+    while process is None or process.poll() is None:
+        attempt += 1
+        if readiness is not None:
+            readiness.set_state("warming", attempt=attempt)
+        try:
+            seconds = run_session(url, token, timeout)
+        except Exception as e:
+            logger.error(f"Warm-up attempt {attempt} failed: {e}")
+            if readiness is not None:
+                readiness.set_state("warmup_failed", attempt=attempt, error=str(e))
+            if process is None:
+                raise
+            time.sleep(retry_interval)
+            continue
+        if readiness is not None:
+            readiness.set_state("ready", warmup_seconds=round(seconds, 2))
+        logger.info(f"Warm-up finished in {seconds:.1f}s")
+        return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start a Streamlit worker and report it ready once warmed up")
+    parser.add_argument("--app", default="smart_traffic_app.py", help="Streamlit script to serve")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Streamlit server port")
+    parser.add_argument("--readiness-port", type=int, default=READINESS_PORT, help="Port of /ready and /live")
+    parser.add_argument("--timeout", type=float, default=WARMUP_TIMEOUT, help="Seconds allowed for start-up and warm-up")
+    parser.add_argument("--url", default=None, help="Warm an already running worker at this URL and exit")
+    parser.add_argument("--token", default=os.environ.get(WARMUP_TOKEN_ENV),
+                        help=f"With --url, the worker's {WARMUP_TOKEN_ENV} (default: this environment's)")
+    args, streamlit_args = parser.parse_known_args()
+    streamlit_args = [arg for arg in streamlit_args if arg != "--"]
+
+    logging.basicConfig(level=logging.INFO)
+    if args.url:
+        if not args.token:
+            parser.error(f"--url needs the worker's warm-up token (--token or {WARMUP_TOKEN_ENV})")
+        warm_up(args.url.rstrip("/"), args.token, timeout=args.timeout)
+        return
+
+    token = secrets.token_urlsafe(32)
+    process = subprocess.Popen([
+        sys.executable, "-m", "streamlit", "run", args.app,
+        "--server.port", str(args.port), "--server.headless", "true", *streamlit_args,
+    ], env={**os.environ, WARMUP_TOKEN_ENV: token})
+    readiness = ReadinessServer(args.readiness_port, process=process).start()
+
+    def shutdown(signum, frame):
+        process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        warm_up(f"http://127.0.0.1:{args.port}", token, readiness, args.timeout, process)
+    except Exception as e:
+        logger.error(f"Worker did not start: {e}")
+        process.terminate()
+    sys.exit(process.wait())
+
+
+if __name__ == "__main__":
+    main()